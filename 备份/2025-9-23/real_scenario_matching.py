@@ -24,64 +24,63 @@ def load_json_file(file_path: str) -> List[Dict]:
         return []
 
 def extract_all_chapters_recursive(chapter_data: Dict, file_name: str, section_name: str, document_prefix: str) -> List[Dict]:
-    """递归提取所有章节信息，包括children中的子章节"""
+    """
+    提取章节及其children中的全部子章节（前序顺序）
+    chapter_data 可以是 JSON 加载的 dict，也可以是 ChapterNode（同样支持 .get 读取字段，full_path 按需生成）
+    使用显式栈遍历，不再逐层递归拼接子列表
+    """
     chapters = []
     
-    chapter_id = chapter_data.get('chapter_id', '')
-    chapter_title = chapter_data.get('chapter_title', '')
-    raw_text = chapter_data.get('raw_text', '')
-    full_path = chapter_data.get('full_path', '')
-    
     # 构建文档ID
     document_id = f"{document_prefix}_{file_name}_{section_name}"
-    
-    # 提取条款数据
-    clause_data = {
-        "scope": chapter_data.get('scope', ''),
-        "parameters": chapter_data.get('parameters', []),
-        "topic_keywords": chapter_data.get('topic_keywords', []),
-        "context_keywords": chapter_data.get('context_keywords', []),
-        "table_headers": chapter_data.get('table_headers', [])
-    }
-    
-    # 添加原始文本到scope中以增加语义信息
-    
-    # if raw_text:
-    #     if clause_data['scope']:
-    #         clause_data['scope'] += f" | {raw_text[:200]}"  # 限制长度
-    #     else:
-    #         clause_data['scope'] = raw_text[:200]
-    
-    # # 如果chapter_title没有在scope中，将其添加到topic_keywords
-    # if chapter_title and chapter_title not in str(clause_data['scope']):
-    #     if not clause_data['topic_keywords']:
-    #         clause_data['topic_keywords'] = []
-    #     if isinstance(clause_data['topic_keywords'], list):
-    #         clause_data['topic_keywords'].append(chapter_title)
-    
-    # 添加当前章节
-    current_chapter = {
-        'document_id': document_id,
-        'file': file_name,
-        'section': section_name,
-        'chapter_id': chapter_id,
-        'chapter_title': chapter_title,
-        'full_path': full_path,
-        'raw_text': raw_text,
-        'clause_data': clause_data
-    }
-    chapters.append(current_chapter)
-    
-    # 递归处理children
-    children = chapter_data.get('children', [])
-    for child in children:
-        child_chapters = extract_all_chapters_recursive(child, file_name, section_name, document_prefix)
-        chapters.extend(child_chapters)
+
+    stack = [chapter_data]
+    while stack:
+        node = stack.pop()
+        
+        # 提取条款数据
+        clause_data = {
+            "scope": node.get('scope', ''),
+            "parameters": node.get('parameters', []),
+            "topic_keywords": node.get('topic_keywords', []),
+            "context_keywords": node.get('context_keywords', []),
+            "table_headers": node.get('table_headers', [])
+        }
+        
+        # 添加原始文本到scope中以增加语义信息
+        
+        # if raw_text:
+        #     if clause_data['scope']:
+        #         clause_data['scope'] += f" | {raw_text[:200]}"  # 限制长度
+        #     else:
+        #         clause_data['scope'] = raw_text[:200]
+        
+        # # 如果chapter_title没有在scope中，将其添加到topic_keywords
+        # if chapter_title and chapter_title not in str(clause_data['scope']):
+        #     if not clause_data['topic_keywords']:
+        #         clause_data['topic_keywords'] = []
+        #     if isinstance(clause_data['topic_keywords'], list):
+        #         clause_data['topic_keywords'].append(chapter_title)
+        
+        # 添加当前章节
+        chapters.append({
+            'document_id': document_id,
+            'file': file_name,
+            'section': section_name,
+            'chapter_id': node.get('chapter_id', ''),
+            'chapter_title': node.get('chapter_title', ''),
+            'full_path': node.get('full_path', ''),
+            'raw_text': node.get('raw_text', ''),
+            'clause_data': clause_data
+        })
+        
+        # children 逆序入栈，保证出栈顺序与原先的递归顺序一致
+        stack.extend(reversed(node.get('children', []) or []))
     
     return chapters
 
-def extract_chapters_from_json(data: List[Dict], document_prefix: str) -> List[Dict]:
-    """从JSON数据中递归提取所有章节信息"""
+def extract_chapters_from_json(data: List[Dict], document_prefix: str, debug: bool = False) -> List[Dict]:
+    """从JSON数据中递归提取所有章节信息，debug=True 时写出 extracted_chapters_debug.json"""
     all_chapters = []
 
     section = data[0].get('sections', [])[0] if data and 'sections' in data[0] and data[0]['sections'] else {}
@@ -96,8 +95,9 @@ def extract_chapters_from_json(data: List[Dict], document_prefix: str) -> List[D
         all_chapters.extend(chapter_list)
     
     # 存储提取到的all_chapters以便调试
-    with open('extracted_chapters_debug.json', 'w', encoding='utf-8') as debug_file:
-        json.dump(all_chapters, debug_file, indent=2, ensure_ascii=False)
+    if debug:
+        with open('extracted_chapters_debug.json', 'w', encoding='utf-8') as debug_file:
+            json.dump(all_chapters, debug_file, indent=2, ensure_ascii=False)
 
     return all_chapters
 
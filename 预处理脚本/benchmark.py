@@ -0,0 +1,573 @@
+"""
+解析流水线性能基准
+用法：
+    python benchmark.py normalize [--text_files a.txt b.txt] [--repeat 20]
+    python benchmark.py chain [--headings 20000] [--verify_headings 3000]
+    python benchmark.py fold [--table_rows 5000]
+    python benchmark.py tree [--nodes 50000] [--verify_nodes 5000]
+    python benchmark.py nodes [--documents 100] [--chapters 800] [--json_files a.json b.json]
+    python benchmark.py terms [--terms 2000] [--chars 200000]
+    python benchmark.py ocr_prep [--pdf_path a.pdf] [--pages 5] [--dpi 300]
+    python benchmark.py tables [--pdf_path GB+45672-2025.pdf]
+"""
+import re
+import copy
+import json
+import time
+import random
+import argparse
+import io
+import sys
+import contextlib
+import tracemalloc
+
+import test_en
+from chapter_node import ChapterNode, document_tree_from_dicts, document_tree_to_dicts
+from term_index import TermIndex
+
+
+# ---------------- 旧实现（仅用于对比） ----------------
+
+def legacy_fullwidth_to_halfwidth(text: str) -> str:
+    result = []
+    for char in text:
+        code = ord(char)
+        if 0xFF01 <= code <= 0xFF5E:
+            result.append(chr(code - 0xFEE0))
+        else:
+            result.append(char)
+    return ''.join(result)
+
+def legacy_normalize_chapter_spaces(s: str) -> str:
+    line = s.strip()
+    line = re.sub(r'\.\s+(?=\d)', '.', line)
+    line = re.sub(r'([A-Za-z0-9]+)\s+(\.\d+)', r'\1\2', line)
+    max_iterations = 10
+    iterations = 0
+    prev_line = ""
+    while prev_line != line and iterations < max_iterations:
+        prev_line = line
+        line = re.sub(r'([A-Za-z0-9]+)\s*\.\s*(\d+)', r'\1.\2', line)
+        iterations += 1
+    line = re.sub(r'(\d+\.\d+)\.\s*l\b', r'\1.1', line)
+    line = re.sub(r'([A-Za-z0-9]+)\.l\.(\d+)', r'\1.1.\2', line)
+    line = re.sub(r'^l\.(\d+)', r'1.\1', line)
+    line = re.sub(r'^([A-Z])\.l\b', r'\1.1', line)
+    line = re.sub(r'^([A-Z])\.l\.(\d+)', r'\1.1.\2', line)
+    line = re.sub(r'^([A-Z])\.O\.(\d+)', r'\1.0.\2', line)
+    line = re.sub(r'^([A-Z])\.I\.(\d+)', r'\1.1.\2', line)
+    line = re.sub(r'([A-Za-z0-9]+)\.O\.(\d+)', r'\1.0.\2', line)
+    line = re.sub(r'([A-Za-z0-9]+)\.I\.(\d+)', r'\1.1.\2', line)
+    return line
+
+
+def legacy_longest_chapter_chain(keys):
+    """原先 find_longest_chapter_chain_with_append 第三步的二次 DP"""
+    dp = [1] * len(keys)
+    next_link = [-1] * len(keys)
+    max_len = 0
+    max_idx = -1
+    for i in range(len(keys) - 1, -1, -1):
+        for j in range(i + 1, len(keys)):
+            if (test_en.is_chapter_a_before_b(keys[i], keys[j]) and
+                    test_en.is_reasonable_chapter_jump(keys[i], keys[j])):
+                if dp[j] + 1 > dp[i]:
+                    dp[i] = dp[j] + 1
+                    next_link[i] = j
+        if dp[i] > max_len:
+            max_len = dp[i]
+            max_idx = i
+    chain = []
+    idx = max_idx
+    while idx != -1:
+        chain.append(idx)
+        idx = next_link[idx]
+    return chain
+
+def legacy_fold_non_chain_chapters(chapters, chain_set, first_chain_idx):
+    """原先最终结果构建中的逐段 += 拼接"""
+    result = []
+    last_valid = None
+    for i, chap in enumerate(chapters):
+        if i in chain_set:
+            result.append(chap)
+            last_valid = chap
+        elif i >= first_chain_idx:
+            if last_valid:
+                content_to_add = "\n" + chap["chapter_id"] + chap["chapter_title"]
+                if chap.get("raw_text"):
+                    content_to_add += " " + chap["raw_text"]
+                last_valid["raw_text"] += content_to_add
+    return result
+
+def legacy_build_tree(chapter_list):
+    """原先的 build_tree：按点分段，创建的父节点靠列表成员扫描判断"""
+    id_map = {}
+    root = []
+    for chap in chapter_list:
+        chap["children"] = []
+        id_map[chap["chapter_id"].strip().rstrip('.-')] = chap
+    for chap in chapter_list:
+        parts = chap["chapter_id"].strip().rstrip('.').split('.')
+        if len(parts) >= 3:
+            for i in range(2, len(parts)):
+                parent_key = '.'.join(parts[:i])
+                if parent_key not in id_map:
+                    id_map[parent_key] = {"chapter_id": parent_key + ".", "chapter_title": "",
+                                          "raw_text": "", "children": []}
+    for chap in chapter_list:
+        chapter_id = chap["chapter_id"].strip()
+        parts = chapter_id.rstrip('.').split('.')
+        if chapter_id.startswith("APPENDIX") or chapter_id.startswith("附录") or len(parts) == 1:
+            root.append(chap)
+        else:
+            parent = id_map.get('.'.join(parts[:-1]))
+            if parent:
+                parent["children"].append(chap)
+            elif len(parts) == 2:
+                root.append(chap)
+    created_parents = []
+    for key, node in id_map.items():
+        if node not in chapter_list and len(node["children"]) > 0:
+            created_parents.append(node)
+    for parent in created_parents:
+        parts = parent["chapter_id"].rstrip('.').split('.')
+        grandparent = id_map.get('.'.join(parts[:-1]))
+        if grandparent and parent not in grandparent["children"]:
+            grandparent["children"].append(parent)
+    return root
+
+
+# ---------------- 基准 ----------------
+
+def _load_lines(text_files):
+    lines = []
+    for path in text_files:
+        with open(path, "r", encoding="utf-8") as f:
+            lines.extend(f.read().splitlines())
+    return lines
+
+def _lines_per_sec(func, lines, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for line in lines:
+            func(line)
+    elapsed = time.perf_counter() - start
+    return len(lines) * repeat / elapsed if elapsed > 0 else float('inf')
+
+def bench_normalize(text_files, repeat=20):
+    """全角转半角 + 章节编号修复：新旧实现的吞吐对比，并校验输出逐字节一致"""
+    lines = _load_lines(text_files)
+    print(f"样本行数: {len(lines)}，重复 {repeat} 次")
+
+    def legacy(line):
+        return legacy_normalize_chapter_spaces(legacy_fullwidth_to_halfwidth(line.strip()))
+
+    def current(line):
+        return test_en.normalize_chapter_spaces(test_en.fullwidth_to_halfwidth(line.strip()))
+
+    mismatched = [line for line in lines if legacy(line) != current(line)]
+    if mismatched:
+        print(f"❌ 输出不一致 {len(mismatched)} 行，例如: {mismatched[0]!r}")
+    else:
+        print("✅ 新旧实现输出一致")
+
+    for name, old_func, new_func in [
+        ("fullwidth_to_halfwidth", legacy_fullwidth_to_halfwidth, test_en.fullwidth_to_halfwidth),
+        ("normalize_chapter_spaces", legacy_normalize_chapter_spaces, test_en.normalize_chapter_spaces),
+        ("合计", legacy, current),
+    ]:
+        old = _lines_per_sec(old_func, lines, repeat)
+        new = _lines_per_sec(new_func, lines, repeat)
+        print(f"{name:<28} 旧: {old:>12,.0f} 行/秒   新: {new:>12,.0f} 行/秒   提升 {new / old:.1f}x")
+
+
+def synthetic_chapter_keys(count: int, seed: int = 0):
+    """
+    构造带噪声的章节编号序列：正常的多级章节之间穿插表格行、测量值列表、目录重复等误识别编号
+    """
+    rng = random.Random(seed)
+    keys = []
+    chapter = [1]
+    while len(keys) < count:
+        roll = rng.random()
+        if roll < 0.55:
+            # 正常推进：同级 +1、进入下一级或回到上一级
+            action = rng.random()
+            if action < 0.4 and len(chapter) < 4:
+                chapter = chapter + [1]
+            elif action < 0.6 and len(chapter) > 1:
+                chapter = chapter[:-1]
+                chapter[-1] += 1
+            else:
+                chapter[-1] += 1
+            keys.append(tuple(chapter))
+        elif roll < 0.8:
+            # 表格行 / 测量值：随机的一级或二级数字
+            keys.append((rng.randint(1, 60),) if rng.random() < 0.5 else (rng.randint(1, 60), rng.randint(0, 30)))
+        elif roll < 0.9:
+            # 附录字母章节
+            keys.append((rng.randint(101, 110),) + tuple(rng.randint(1, 9) for _ in range(rng.randint(0, 2))))
+        else:
+            # 目录或交叉引用里重复出现的旧编号
+            keys.append(keys[rng.randrange(len(keys))] if keys else (1,))
+    return keys
+
+def bench_chain(headings=20000, verify_headings=3000):
+    """最长章节链：在可承受规模上校验新旧结果一致，再测 O(n log n) 实现在大规模输入上的耗时"""
+    for seed in range(5):
+        keys = synthetic_chapter_keys(verify_headings, seed)
+        start = time.perf_counter()
+        old = legacy_longest_chapter_chain(keys)
+        old_time = time.perf_counter() - start
+        start = time.perf_counter()
+        new = test_en.longest_chapter_chain(keys)
+        new_time = time.perf_counter() - start
+        status = "✅ 一致" if old == new else "❌ 不一致"
+        print(f"{verify_headings} 个标题 seed={seed}: {status}，链长 {len(new)}，旧 {old_time:.2f}s，新 {new_time:.3f}s")
+
+    keys = synthetic_chapter_keys(headings, seed=42)
+    start = time.perf_counter()
+    chain = test_en.longest_chapter_chain(keys)
+    print(f"{headings} 个标题: 链长 {len(chain)}，耗时 {time.perf_counter() - start:.3f}s")
+
+
+def synthetic_annex_table_chapters(table_rows: int, seed: int = 0):
+    """
+    构造一个带长附录表格的章节列表：少量正常章节之后是 table_rows 行被识别成标题的表格行
+    """
+    rng = random.Random(seed)
+    chapters = [
+        {"chapter_id": "1", "chapter_title": "范围", "raw_text": "本标准规定了机动车的运行安全技术条件。"},
+        {"chapter_id": "2", "chapter_title": "规范性引用文件", "raw_text": "下列文件对于本文件的应用是必不可少的。"},
+        {"chapter_id": "3", "chapter_title": "术语和定义", "raw_text": "下列术语和定义适用于本文件。"},
+    ]
+    for _ in range(table_rows):
+        cells = [str(rng.randint(0, 999)) for _ in range(4)]
+        chapters.append({
+            "chapter_id": str(rng.randint(1, 40)),
+            "chapter_title": f"{cells[0]} {cells[1]} {rng.choice('ABCDEF')} {cells[2]} {cells[3]}",
+            "raw_text": " ".join(str(rng.randint(0, 9999)) for _ in range(30)),
+        })
+    return chapters
+
+def bench_fold(table_rows=5000):
+    """未入选章节折叠进上一章节：逐段 += 与 RawTextBuilder 的耗时对比"""
+    chapters = synthetic_annex_table_chapters(table_rows)
+    chain_set = {0, 1, 2}
+
+    legacy_chapters = copy.deepcopy(chapters)
+    start = time.perf_counter()
+    legacy_result = legacy_fold_non_chain_chapters(legacy_chapters, chain_set, 0)
+    legacy_time = time.perf_counter() - start
+
+    builder_chapters = copy.deepcopy(chapters)
+    start = time.perf_counter()
+    builder_result = []
+    builder = test_en.RawTextBuilder()
+    for i, chap in enumerate(builder_chapters):
+        if i in chain_set:
+            builder_result.append(chap)
+        elif builder_result:
+            builder.append_chapter(builder_result[-1], chap)
+    builder.flush()
+    builder_time = time.perf_counter() - start
+
+    same = [c["raw_text"] for c in legacy_result] == [c["raw_text"] for c in builder_result]
+    print(f"{table_rows} 行附录表格: {'✅ 结果一致' if same else '❌ 结果不一致'}，"
+          f"最后一章 raw_text {len(builder_result[-1]['raw_text']):,} 字符")
+    print(f"逐段 += 拼接: {legacy_time:.3f}s   RawTextBuilder: {builder_time:.3f}s")
+
+    start = time.perf_counter()
+    result, _ = test_en.find_longest_chapter_chain_with_append(copy.deepcopy(chapters), language='zh')
+    print(f"find_longest_chapter_chain_with_append 全流程: {time.perf_counter() - start:.3f}s，保留 {len(result)} 个章节")
+
+
+def synthetic_chapter_list(count: int, seed: int = 0):
+    """
+    构造建树用的章节列表：多级编号，约一成跳过中间层级（需要补建父节点），并带有正文
+    """
+    rng = random.Random(seed)
+    chapters = []
+    chapter = [1]
+    while len(chapters) < count:
+        action = rng.random()
+        if action < 0.35 and len(chapter) < 5:
+            chapter = chapter + [1]
+        elif action < 0.55 and len(chapter) > 1:
+            chapter = chapter[:-1]
+            chapter[-1] += 1
+        else:
+            chapter[-1] += 1
+        if len(chapter) >= 3 and rng.random() < 0.1:
+            # 跳过中间层级，例如 5.3 缺失时直接出现 5.3.1.1
+            chapter = chapter[:-1] + [chapter[-1] + 1, 1, 1]
+        chapters.append({
+            "chapter_id": ".".join(map(str, chapter)) + ".",
+            "chapter_title": f"标题 {len(chapters)}",
+            "raw_text": " ".join(str(rng.randint(0, 9999)) for _ in range(20)),
+        })
+    return chapters
+
+def bench_tree(nodes=50000, verify_nodes=5000):
+    """建树：在可承受规模上校验新旧结果一致，再测索引实现在大规模输入上的耗时"""
+    chapters = synthetic_chapter_list(verify_nodes)
+    start = time.perf_counter()
+    old = legacy_build_tree(copy.deepcopy(chapters))
+    old_time = time.perf_counter() - start
+    start = time.perf_counter()
+    new = test_en.build_tree(copy.deepcopy(chapters))
+    new_time = time.perf_counter() - start
+    old = [node.to_dict() for node in ChapterNode.from_dicts(old)]
+    new = [node.to_dict() for node in new]
+    same = json.dumps(old, ensure_ascii=False) == json.dumps(new, ensure_ascii=False)
+    print(f"{verify_nodes} 个章节: {'✅ 结果一致' if same else '❌ 结果不一致'}，旧 {old_time:.2f}s，新 {new_time:.3f}s")
+
+    for count in (nodes // 10, nodes):
+        chapters = synthetic_chapter_list(count, seed=42)
+        start = time.perf_counter()
+        tree = test_en.build_tree(chapters)
+        print(f"{count} 个章节: 根节点 {len(tree)} 个，耗时 {time.perf_counter() - start:.3f}s")
+
+
+def synthetic_document_json(chapters: int, seed: int = 0) -> str:
+    """构造一份解析结果 JSON：单个 regulation/MAIN 分节，章节树带 full_path"""
+    tree = [node.to_dict() for node in test_en.build_tree(synthetic_chapter_list(chapters, seed))]
+    return json.dumps([{"file": "regulation", "sections": [{"section": "MAIN", "context": "", "chapters": tree}]}],
+                      ensure_ascii=False)
+
+def _count_chapters(tree):
+    count = 0
+    for file_sec in tree:
+        for sec in file_sec["sections"]:
+            stack = list(sec["chapters"])
+            while stack:
+                chap = stack.pop()
+                count += 1
+                stack.extend(chap.get("children", []))
+    return count
+
+def _traced_size(build):
+    """build() 构造的对象常驻内存大小（字节），不含构造过程中的临时对象"""
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+def bench_nodes(documents=100, chapters=800, json_files=None):
+    """章节树内存：嵌套 dict 与 ChapterNode 在多文档语料上的常驻内存、以及 to_dict / from_dict 耗时"""
+    if json_files:
+        texts = []
+        for path in json_files:
+            with open(path, "r", encoding="utf-8") as f:
+                texts.append(f.read())
+    else:
+        texts = [synthetic_document_json(chapters, seed) for seed in range(documents)]
+
+    dict_corpus, dict_size = _traced_size(lambda: [json.loads(text) for text in texts])
+    node_corpus, node_size = _traced_size(lambda: [document_tree_from_dicts(json.loads(text)) for text in texts])
+    total = sum(_count_chapters(tree) for tree in dict_corpus)
+
+    same = all(document_tree_to_dicts(nodes) == tree for nodes, tree in zip(node_corpus, dict_corpus))
+    print(f"{len(texts)} 份文档，共 {total} 个章节: {'✅ 往返转换一致' if same else '❌ 往返转换不一致'}")
+    print(f"嵌套 dict: {dict_size / 1e6:.1f} MB（{dict_size / total:.0f} 字节/章节）   "
+          f"ChapterNode: {node_size / 1e6:.1f} MB（{node_size / total:.0f} 字节/章节）   "
+          f"节省 {1 - node_size / dict_size:.0%}")
+
+    start = time.perf_counter()
+    node_corpus = [document_tree_from_dicts(tree) for tree in dict_corpus]
+    from_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for nodes in node_corpus:
+        document_tree_to_dicts(nodes)
+    to_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for tree in dict_corpus:
+        copy.deepcopy(tree)
+    deepcopy_time = time.perf_counter() - start
+    print(f"from_dict: {from_time:.3f}s   to_dict: {to_time:.3f}s   （对照 copy.deepcopy: {deepcopy_time:.3f}s）")
+
+
+_CJK_SAMPLE = "车载事故紧急呼叫系统通信模块定位服务平台终端数据传输信号天线电源"
+
+def synthetic_term_map(count: int, seed: int = 0):
+    """构造术语映射：中文术语 + 英文术语 + 大写缩写"""
+    rng = random.Random(seed)
+    term_map = {}
+    while len(term_map) < count:
+        cn = "".join(rng.choice(_CJK_SAMPLE) for _ in range(rng.randint(3, 8)))
+        words = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9)))
+                 for _ in range(rng.randint(1, 4))]
+        term_map[cn] = {"en": " ".join(words), "abbr": "".join(w[0] for w in words).upper() + str(len(term_map))}
+    return term_map
+
+def legacy_count_terms(term_map, text):
+    """逐个术语写法扫描全文（对照实现，每个写法一遍）"""
+    lowered = text.lower()
+    counts = {}
+    for cn, info in term_map.items():
+        for surface in (cn, info.get("en", ""), info.get("abbr", "")):
+            if len(surface) >= 2:
+                hits = lowered.count(surface.lower())
+                if hits:
+                    counts[cn] = counts.get(cn, 0) + hits
+    return counts
+
+def bench_terms(terms=2000, chars=200000):
+    """术语命中：自动机单遍扫描与逐术语扫描在不同术语规模下的耗时"""
+    for count in (terms // 10, terms):
+        term_map = synthetic_term_map(count)
+        rng = random.Random(1)
+        surfaces = [s for cn, info in term_map.items() for s in (cn, info["en"], info["abbr"])]
+        pieces = []
+        while sum(map(len, pieces)) < chars:
+            pieces.append(rng.choice(surfaces) if rng.random() < 0.2 else rng.choice(_CJK_SAMPLE) * rng.randint(1, 5))
+            pieces.append("，")
+        text = "".join(pieces)
+
+        start = time.perf_counter()
+        index = TermIndex.from_term_map(term_map)
+        build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        new = index.count_terms(text)
+        new_time = time.perf_counter() - start
+        start = time.perf_counter()
+        old = legacy_count_terms(term_map, text)
+        old_time = time.perf_counter() - start
+        print(f"{count} 个术语 / {len(text)} 字符: 命中 {sum(new.values())} 次（逐术语扫描 {sum(old.values())} 次），"
+              f"自动机构建 {build_time:.3f}s + 扫描 {new_time:.3f}s，逐术语扫描 {old_time:.3f}s")
+
+
+def legacy_ocr_image(page, dpi):
+    """旧版 OCR 预处理（对照实现）：RGB 渲染 -> PPM 编码 -> PIL 解码 -> 转灰度 -> 逐像素 lambda 二值化"""
+    from PIL import Image
+    pix = page.get_pixmap(dpi=dpi, colorspace="rgb", alpha=False)
+    img = Image.open(io.BytesIO(pix.tobytes("ppm")))
+    img = img.convert('L')
+    return img.point(lambda x: 0 if x < 140 else 255)
+
+def bench_ocr_prep(pdf_path, pages=5, dpi=300):
+    """OCR 图像预处理：旧版 PIL 流程与灰度直接渲染 + numpy 原地二值化的耗时和峰值内存（不调用 tesseract）"""
+    import fitz
+    import numpy as np
+    import file_extract_OCR
+
+    def current(page, dpi):
+        pix, gray = file_extract_OCR.render_gray(page, dpi)
+        bands = file_extract_OCR.watermark_bands(page.get_text("dict"))
+        file_extract_OCR.preprocess_gray(gray, dpi, bands)
+        return pix, file_extract_OCR.to_tesseract_image(gray)
+
+    def current_otsu(page, dpi):
+        pix, gray = file_extract_OCR.render_gray(page, dpi)
+        file_extract_OCR.preprocess_gray(gray, dpi, otsu=True)
+        return pix, file_extract_OCR.to_tesseract_image(gray)
+
+    with fitz.open(pdf_path) as doc:
+        page_list = [doc[i] for i in range(min(pages, len(doc)))]
+        for name, func in (("旧版 PIL", legacy_ocr_image), ("numpy 固定阈值", current), ("numpy Otsu", current_otsu)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            for page in page_list:
+                func(page, dpi)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{name:<14} {len(page_list)} 页 @ {dpi}dpi: {elapsed / len(page_list) * 1000:8.1f}ms/页  "
+                  f"Python 堆峰值 {peak / 1e6:6.1f}MB")
+
+        # 两种流程的二值图应基本一致（灰度直接渲染与 RGB 转灰度的舍入差异）
+        page = page_list[0]
+        old = np.asarray(legacy_ocr_image(page, dpi))
+        _, new = current(page, dpi)
+        print(f"首页二值图差异像素占比: {(old != np.asarray(new)).mean():.5%}（含水印行涂白）")
+
+
+# GB+45672-2025.pdf 每张表（按标题编号）应关联到的章节；表格行号取错时会落到相邻章节
+GB45672_TABLE_CHAPTERS = {
+    "表A.1": "A.1.1", "表A.2": "A.2", "表A.3": "A.2",
+    "表B.1": "B.2.1.1.2", "表B.2": "B.2.2.1.2", "表B.3": "B.2.3.1", "表B.4": "B.2.4.1",
+    "表D.1": "D.1", "表E.1": "E.2", "表F.1": "ALL",
+}
+
+def check_tables(pdf_path="GB+45672-2025.pdf", expected=None):
+    """表格定位回归检查：解析 PDF 的表格，逐张比对关联到的章节，有不一致时以非 0 状态退出"""
+    expected = expected or GB45672_TABLE_CHAPTERS
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, _, tables = test_en.parse_pdf_to_chapter_tree_and_tables(pdf_path)
+    elapsed = time.perf_counter() - start
+    linked = {table["table_id"].split()[0]: table for table in tables}
+    failed = 0
+    for table_id, chapter_id in expected.items():
+        table = linked.get(table_id)
+        actual = table["chapter_id"] if table else None
+        ok = actual == chapter_id
+        failed += not ok
+        line = table["line"] if table else None
+        print(f"{'✅' if ok else '❌'} {table_id}: 行 {line}，章节 {actual}（期望 {chapter_id}）")
+    print(f"{len(tables)} 张表，{failed} 张关联错误，耗时 {elapsed:.2f}s")
+    if failed:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="bench", required=True)
+
+    p_norm = subparsers.add_parser("normalize", help="行预处理吞吐（行/秒）")
+    p_norm.add_argument("--text_files", nargs="+",
+                        default=["extracted_full_text.txt", "full_text.txt", "DAO2016-23-1.txt", "ECE.txt"])
+    p_norm.add_argument("--repeat", type=int, default=20)
+
+    p_chain = subparsers.add_parser("chain", help="最长章节链规模测试")
+    p_chain.add_argument("--headings", type=int, default=20000)
+    p_chain.add_argument("--verify_headings", type=int, default=3000)
+
+    p_fold = subparsers.add_parser("fold", help="长附录表格的 raw_text 折叠")
+    p_fold.add_argument("--table_rows", type=int, default=5000)
+
+    p_tree = subparsers.add_parser("tree", help="章节建树规模测试")
+    p_tree.add_argument("--nodes", type=int, default=50000)
+    p_tree.add_argument("--verify_nodes", type=int, default=5000)
+
+    p_nodes = subparsers.add_parser("nodes", help="章节树对象模型的内存与转换耗时")
+    p_nodes.add_argument("--documents", type=int, default=100)
+    p_nodes.add_argument("--chapters", type=int, default=800)
+    p_nodes.add_argument("--json_files", nargs="+", default=None)
+
+    p_terms = subparsers.add_parser("terms", help="术语命中标注：自动机与逐术语扫描")
+    p_terms.add_argument("--terms", type=int, default=2000)
+    p_terms.add_argument("--chars", type=int, default=200000)
+
+    p_ocr = subparsers.add_parser("ocr_prep", help="OCR 图像预处理：PIL 流程与 numpy 原地处理")
+    p_ocr.add_argument("--pdf_path", default="GB+45672-2025.pdf")
+    p_ocr.add_argument("--pages", type=int, default=5)
+    p_ocr.add_argument("--dpi", type=int, default=300)
+
+    p_tables = subparsers.add_parser("tables", help="表格拼接与章节关联的回归检查")
+    p_tables.add_argument("--pdf_path", default="GB+45672-2025.pdf")
+
+    args = parser.parse_args()
+
+    if args.bench == "normalize":
+        bench_normalize(args.text_files, args.repeat)
+    elif args.bench == "chain":
+        bench_chain(args.headings, args.verify_headings)
+    elif args.bench == "fold":
+        bench_fold(args.table_rows)
+    elif args.bench == "tree":
+        bench_tree(args.nodes, args.verify_nodes)
+    elif args.bench == "nodes":
+        bench_nodes(args.documents, args.chapters, args.json_files)
+    elif args.bench == "terms":
+        bench_terms(args.terms, args.chars)
+    elif args.bench == "ocr_prep":
+        bench_ocr_prep(args.pdf_path, args.pages, args.dpi)
+    elif args.bench == "tables":
+        check_tables(args.pdf_path)
+
+
+if __name__ == "__main__":
+    main()
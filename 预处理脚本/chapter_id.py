@@ -0,0 +1,92 @@
+"""
+章节编号值类型：解析一次，之后比较、排序、建索引都直接用预先算好的元组键
+"""
+import re
+import sys
+from functools import lru_cache
+from typing import Tuple
+
+# 字母章节：A, A.1, A.1.2., A-1-
+_ALPHA_ID_RE = re.compile(r'[A-Z](?:[.\-]\d+)*[.\-]?')
+# 数字章节：1, 1.1, 1.1.2., 1-2-
+_NUMERIC_ID_RE = re.compile(r'\d+(?:[.\-]\d+)*[.\-]?')
+_SEPARATORS_RE = re.compile(r'[.\-]+')
+
+
+class ChapterId:
+    """
+    不可变、可哈希的章节编号
+    - text: 去掉首尾空白后的原始编号（已 intern）
+    - kind: 'alpha' / 'numeric' / None（附录、ANNEX 等无法按数字排序的编号）
+    - path: 建树用的层级分段，点和横线都视为分隔符，如 "7.1.2." -> ("7", "1", "2")，"1-2-" -> ("1", "2")
+    - key: 建树用的索引键，层级分段用点连接，"1.2."、"1-2-" 都是 "1.2"
+    - separator: 编号使用的分隔符，补建父节点时沿用
+    - numeric_first_key / alpha_first_key: 两种文档模式下的排序键，与原 parse_chapter_id 的结果一致
+    """
+    __slots__ = ("text", "kind", "path", "key", "separator", "numeric_first_key", "alpha_first_key", "_hash")
+
+    def __init__(self, text: str):
+        text = sys.intern(text.strip())
+        kind = None
+        numeric_first_key = ()
+        alpha_first_key = ()
+
+        if _ALPHA_ID_RE.fullmatch(text):
+            kind = 'alpha'
+            parts = _SEPARATORS_RE.sub('.', text).rstrip('.').split('.')
+            rest = tuple(int(p) for p in parts[1:])
+            letter_index = ord(parts[0]) - ord('A')
+            # 字母在前模式：A=1, B=2, ...；数字在前模式：字母章节排在数字章节之后，从101开始
+            alpha_first_key = (letter_index + 1,) + rest
+            numeric_first_key = (letter_index + 101,) + rest
+        elif _NUMERIC_ID_RE.fullmatch(text):
+            kind = 'numeric'
+            numbers = tuple(int(p) for p in _SEPARATORS_RE.sub('.', text).rstrip('.').split('.'))
+            numeric_first_key = numbers
+            # 字母在前模式：数字章节排在字母章节之后，从27开始
+            alpha_first_key = (numbers[0] + 26,) + numbers[1:]
+
+        set_attr = object.__setattr__
+        set_attr(self, "text", text)
+        set_attr(self, "kind", kind)
+        path = tuple(_SEPARATORS_RE.split(text.rstrip('.-')))
+        set_attr(self, "path", path)
+        set_attr(self, "key", sys.intern('.'.join(path)))
+        set_attr(self, "separator", '-' if '-' in text and '.' not in text else '.')
+        set_attr(self, "numeric_first_key", numeric_first_key)
+        set_attr(self, "alpha_first_key", alpha_first_key)
+        set_attr(self, "_hash", hash(text))
+
+    @staticmethod
+    def parse(text: str) -> "ChapterId":
+        """解析章节编号，相同的编号字符串只解析一次"""
+        return _parse_cached(text)
+
+    def sort_key(self, pattern: str = 'numeric_first') -> Tuple[int, ...]:
+        """按文档模式（'alpha_first' / 'numeric_first'）返回排序键，无法解析时为空元组"""
+        return self.alpha_first_key if pattern == 'alpha_first' else self.numeric_first_key
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ChapterId 是不可变对象")
+
+    def __eq__(self, other):
+        if isinstance(other, ChapterId):
+            return self.text is other.text or self.text == other.text
+        return NotImplemented
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        return (ChapterId.parse, (self.text,))
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"ChapterId({self.text!r})"
+
+
+@lru_cache(maxsize=65536)
+def _parse_cached(text: str) -> ChapterId:
+    return ChapterId(text)
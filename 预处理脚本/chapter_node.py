@@ -0,0 +1,169 @@
+"""
+章节树节点：用 __slots__ 对象代替嵌套 dict，子节点带父指针，full_path 按需由父链拼出
+与现有 JSON 结构（chapter_id / chapter_title / raw_text / children / full_path）双向转换
+"""
+from typing import Dict, Iterator, List, Optional
+
+# JSON 中由节点字段直接表示的键，其余键原样保存在 extra 中
+_NODE_KEYS = frozenset(("chapter_id", "chapter_title", "raw_text", "children", "full_path"))
+# 解析过程中使用、不写入 JSON 的键：line 为章节标题在全文行中的行号
+_TRANSIENT_KEYS = frozenset(("line",))
+
+
+class ChapterNode:
+    """
+    章节树节点
+    - full_path 不预先存储：读取时由父节点路径 + "编号 标题" 拼出，各级之间用 "/" 连接；
+      只有与推导结果不同的路径（如虚拟章节 "ALL"）才单独保存
+    - extra 保存 scope、parameters 等附加字段，没有时为 None，不额外占用字典
+    - line 为标题所在行号，只在解析过程中用于按行号定位表格等内容，不写入 JSON；补建的父节点、虚拟章节为 None
+    """
+    __slots__ = ("chapter_id", "chapter_title", "raw_text", "children", "parent", "extra", "_full_path", "line")
+
+    def __init__(self, chapter_id: str = "", chapter_title: str = "", raw_text: str = "",
+                 parent: "ChapterNode" = None, extra: Optional[Dict] = None, full_path: Optional[str] = None,
+                 line: Optional[int] = None):
+        self.chapter_id = chapter_id
+        self.chapter_title = chapter_title
+        self.raw_text = raw_text
+        self.children: List["ChapterNode"] = []
+        self.parent = parent
+        self.extra = extra
+        self._full_path = full_path
+        self.line = line
+
+    # ---------------- 树结构 ----------------
+
+    def add_child(self, child: "ChapterNode") -> "ChapterNode":
+        child.parent = self
+        self.children.append(child)
+        return child
+
+    @property
+    def label(self) -> str:
+        """路径中本节点的一段："编号 标题" """
+        return f"{self.chapter_id} {self.chapter_title}"
+
+    @property
+    def full_path(self) -> str:
+        if self._full_path is not None:
+            return self._full_path
+        if self.parent is None:
+            return self.label
+        return self._path_under(self.parent.full_path)
+
+    @full_path.setter
+    def full_path(self, value: Optional[str]):
+        """显式指定路径；设为 None 恢复按父链推导"""
+        self._full_path = value
+
+    def _path_under(self, parent_path: str) -> str:
+        if self._full_path is not None:
+            return self._full_path
+        return f"{parent_path}/{self.label}" if parent_path else self.label
+
+    def iter_subtree(self) -> Iterator["ChapterNode"]:
+        """前序遍历本节点及全部后代，不使用递归"""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def get(self, key: str, default=None):
+        """按 JSON 键名读取字段，便于原先按 dict 读取章节的代码直接使用节点"""
+        if key in _NODE_KEYS:
+            return getattr(self, key)
+        if self.extra is not None:
+            return self.extra.get(key, default)
+        return default
+
+    def __repr__(self):
+        return f"ChapterNode({self.chapter_id!r}, {self.chapter_title!r}, children={len(self.children)})"
+
+    # ---------------- 与 JSON 结构互转 ----------------
+
+    def _as_dict(self, full_path: str) -> Dict:
+        data = {
+            "chapter_id": self.chapter_id,
+            "chapter_title": self.chapter_title,
+            "raw_text": self.raw_text,
+        }
+        if self.extra:
+            data.update(self.extra)
+        data["children"] = []
+        data["full_path"] = full_path
+        return data
+
+    def to_dict(self) -> Dict:
+        """转换为现有 JSON 结构；路径自顶向下一次拼出，每个节点只拼接一次"""
+        root = self._as_dict(self.full_path)
+        stack = [(self, root)]
+        while stack:
+            node, data = stack.pop()
+            parent_path = data["full_path"]
+            for child in node.children:
+                child_data = child._as_dict(child._path_under(parent_path))
+                data["children"].append(child_data)
+                stack.append((child, child_data))
+        return root
+
+    @classmethod
+    def from_dict(cls, data: Dict, parent: "ChapterNode" = None) -> "ChapterNode":
+        """
+        从现有 JSON 结构构建节点树
+        与父链推导结果相同的 full_path 不保存，读取时再拼出
+        :param parent: 新节点的父节点，只设置父指针，不加入 parent.children
+        """
+        root, root_path = cls._node_from_dict(data, parent, parent.full_path if parent is not None else "")
+        stack = [(data, root, root_path)]
+        while stack:
+            node_data, node, path = stack.pop()
+            for child_data in node_data.get("children", ()):
+                child, child_path = cls._node_from_dict(child_data, node, path)
+                node.children.append(child)
+                stack.append((child_data, child, child_path))
+        return root
+
+    @classmethod
+    def from_chapter(cls, data: Dict, parent: "ChapterNode" = None) -> "ChapterNode":
+        """由单个章节 dict 创建节点，不处理 children 和 full_path，line 单独保存，其余键放入 extra"""
+        extra = {k: v for k, v in data.items() if k not in _NODE_KEYS and k not in _TRANSIENT_KEYS} or None
+        return cls(data.get("chapter_id", ""), data.get("chapter_title", ""), data.get("raw_text", ""),
+                   parent=parent, extra=extra, line=data.get("line"))
+
+    @classmethod
+    def _node_from_dict(cls, data: Dict, parent: Optional["ChapterNode"], parent_path: str):
+        node = cls.from_chapter(data, parent)
+        derived = node._path_under(parent_path)
+        stored = data.get("full_path")
+        if stored is not None and stored != derived:
+            node._full_path = stored
+            return node, stored
+        return node, derived
+
+    @classmethod
+    def from_dicts(cls, chapters: List[Dict]) -> List["ChapterNode"]:
+        return [cls.from_dict(chapter) for chapter in chapters]
+
+
+def document_tree_from_dicts(tree: List[Dict]) -> List[Dict]:
+    """
+    把解析结果 [{"file", "sections": [{"section", "context", "chapters"}]}] 中的章节转换为 ChapterNode
+    file / section 层保持 dict，不修改传入的数据
+    """
+    return [
+        {**file_sec, "sections": [{**sec, "chapters": ChapterNode.from_dicts(sec.get("chapters", []))}
+                                  for sec in file_sec.get("sections", [])]}
+        for file_sec in tree
+    ]
+
+
+def document_tree_to_dicts(tree: List[Dict]) -> List[Dict]:
+    """document_tree_from_dicts 的逆操作，章节已经是 dict 的保持不变"""
+    return [
+        {**file_sec, "sections": [{**sec, "chapters": [chap.to_dict() if isinstance(chap, ChapterNode) else chap
+                                                       for chap in sec.get("chapters", [])]}
+                                  for sec in file_sec.get("sections", [])]}
+        for file_sec in tree
+    ]
@@ -0,0 +1,198 @@
+"""
+章节误识别过滤规则：规则以表格形式声明，正则预先编译，按成本从低到高执行，遇到第一条拒绝即返回
+每条规则记录执行次数和命中次数，开启计时后另记耗时，一次解析结束后可以输出统计，看哪些规则真正起作用
+"""
+import re
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+
+class Rule(NamedTuple):
+    """一条拒绝规则：reject(*args) 返回真值表示该行/章节是误识别"""
+    name: str
+    cost: int                       # 相对成本，决定执行顺序：1 纯字符串/长度判断，2 锚定正则，3 含回溯的正则或分词，5 大型交替正则
+    reject: Callable[..., bool]
+    description: str = ""
+
+
+class RuleSet:
+    """
+    按成本排序的规则表，成本相同的规则保持声明顺序
+    规则之间是"任一拒绝即拒绝"的关系，执行顺序只影响耗时和命中归属，不影响结果
+    """
+
+    def __init__(self, name: str, args: str, rules: List[Rule]):
+        """
+        :param name: 规则表名称，输出统计时使用
+        :param args: reject 接收的参数说明
+        """
+        self.name = name
+        self.args = args
+        self.rules = tuple(sorted(rules, key=lambda rule: rule.cost))
+        self.timing = False
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.calls = 0
+        self.hits = [0] * len(self.rules)
+        self.seconds = [0.0] * len(self.rules)
+
+    def first_rejection(self, *args) -> Optional[str]:
+        """
+        依次执行规则，返回第一条拒绝的规则名；全部通过时返回 None
+        """
+        self.calls += 1
+        if self.timing:
+            return self._first_rejection_timed(args)
+        for i, rule in enumerate(self.rules):
+            if rule.reject(*args):
+                self.hits[i] += 1
+                return rule.name
+        return None
+
+    def _first_rejection_timed(self, args) -> Optional[str]:
+        perf_counter = time.perf_counter
+        for i, rule in enumerate(self.rules):
+            start = perf_counter()
+            rejected = rule.reject(*args)
+            self.seconds[i] += perf_counter() - start
+            if rejected:
+                self.hits[i] += 1
+                return rule.name
+        return None
+
+    def stats(self) -> List[Dict]:
+        """
+        每条规则的统计：执行次数由总调用数减去排在它之前的规则的命中数得到，不需要单独计数
+        """
+        result = []
+        evaluated = self.calls
+        for rule, hits, seconds in zip(self.rules, self.hits, self.seconds):
+            result.append({"rule": rule.name, "cost": rule.cost, "evaluated": evaluated, "hits": hits,
+                           "seconds": seconds})
+            evaluated -= hits
+        return result
+
+
+# ---------------- match_chapter_line：单行章节匹配后的内容特征过滤 ----------------
+
+_TITLE_LETTER_RE = re.compile(r'[A-Za-z\u4e00-\u9fff]')
+_NUMERIC_ROW_RE = re.compile(r'[\d\s\.\-]+')
+_TABLE_DATA_ROW_RE = re.compile(r'\d+\s+\d+.*[A-Z]\s+\d+\s+\d+')
+_LETTER_NUMBER_ROW_RE = re.compile(r'[A-Z]\s*\d+.*')
+_LETTER_COORDINATE_ROW_RE = re.compile(r'[A-Z]\d+\s+\d+\s+[A-Z]\s+\d+\s+\d+')
+_TWO_NUMBERS_RE = re.compile(r'\d+.*\d+')
+_UPPERCASE_LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def _is_letter_number_row(chapter_id: str, chapter_title: str, clean_line: str) -> bool:
+    """标题是 "A 10 0" 这样的单个字母 + 数字组合，很可能是表格数据"""
+    if not _LETTER_NUMBER_ROW_RE.fullmatch(chapter_title):
+        return False
+    parts = chapter_title.split()
+    return len(parts) >= 3 and all(part.isdigit() or part in _UPPERCASE_LETTERS for part in parts[:3])
+
+
+LINE_RULES = RuleSet("match_chapter_line", "(chapter_id, chapter_title, clean_line)", [
+    Rule("too_short", 1,
+         lambda chapter_id, chapter_title, clean_line: (
+             len(clean_line) < 4 and not chapter_id.upper().startswith("APPENDIX")
+             and not chapter_id.startswith("附录")),
+         "整行太短（附录编号除外）"),
+    Rule("single_letter_table_title", 1,
+         lambda chapter_id, chapter_title, clean_line: (
+             len(chapter_id) == 1 and chapter_id.isupper()
+             and _TWO_NUMBERS_RE.search(chapter_title) is not None and len(chapter_title.split()) <= 6),
+         "单个大写字母编号 + 含多个数字的短标题，表格标题组合"),
+    Rule("no_letters", 2,
+         lambda chapter_id, chapter_title, clean_line: _TITLE_LETTER_RE.search(chapter_title) is None,
+         "标题不含字母或中文"),
+    Rule("numeric_row", 2,
+         lambda chapter_id, chapter_title, clean_line: _NUMERIC_ROW_RE.fullmatch(chapter_title) is not None,
+         "纯数字表格行"),
+    Rule("letter_coordinate_row", 2,
+         lambda chapter_id, chapter_title, clean_line: _LETTER_COORDINATE_ROW_RE.match(chapter_title) is not None,
+         "坐标点或参数表格，如 \"A15 0 E 0 3\""),
+    Rule("table_data_row", 3,
+         lambda chapter_id, chapter_title, clean_line: _TABLE_DATA_ROW_RE.match(chapter_title) is not None,
+         "表格数据行，如 \"10 0 E 0 16\""),
+    Rule("letter_number_row", 3, _is_letter_number_row,
+         "单个字母 + 数字组合的表格行"),
+])
+
+
+# ---------------- find_longest_chapter_chain_with_append 第一步：章节合理性过滤 ----------------
+
+_MEASUREMENT_UNIT_RE = re.compile(
+    r'\b\d+\s*(MHz|GHz|Hz|kHz|dB|V|mV|µV|A|mA|µA|W|mW|Ω|%|°C|°F|mm|cm|m|km|kg|g|mg|ms|s|min|h|rpm|bar|Pa|kPa|MPa)\b',
+    re.I)
+_FREQUENCY_RANGE_RE = re.compile(r'\d+\s*MHz\s*[~-]\s*\d+\s*MHz', re.I)
+_DIGITS_ONLY_RE = re.compile(r'\d+\s*$')
+_COORDINATE_ROW_RE = re.compile(r'\d+\s+\d+\s+[A-Z]\s+\d+\s+\d+')
+_NUMBER_SPAN_RE = re.compile(r'\d+.*\d+')
+
+
+def _is_parameter_table_row(chapter_text: str, chapter_id: str, chapter_title: str) -> bool:
+    """参数表格格式，如 "34 65 F 25 77"：至少4段，其中至少3段纯数字、1段单个大写字母"""
+    title_parts = chapter_title.split()
+    return (len(title_parts) >= 4 and
+            sum(1 for part in title_parts if part.isdigit()) >= 3 and
+            sum(1 for part in title_parts if len(part) == 1 and part.isupper()) >= 1)
+
+
+CHAIN_RULES = RuleSet("find_longest_chapter_chain", "(chapter_text, chapter_id, chapter_title)", [
+    Rule("short_title", 1,
+         lambda chapter_text, chapter_id, chapter_title: len(chapter_title) < 2,
+         "标题太短"),
+    Rule("dash_legend", 1,
+         lambda chapter_text, chapter_id, chapter_title: (
+             len(chapter_id) == 1 and chapter_id.isupper() and chapter_title.startswith('———')),
+         "图表标注说明：单个字母 + 以破折号开头的标题"),
+    Rule("letter_id_numeric_title", 1,
+         lambda chapter_text, chapter_id, chapter_title: (
+             len(chapter_id) == 1 and chapter_id.isupper()
+             and _NUMBER_SPAN_RE.match(chapter_title) is not None
+             and len([x for x in chapter_title.split() if x.isdigit()]) >= 2),
+         "表格行：单个字母 + 主要是数字的标题"),
+    Rule("numeric_title", 2,
+         lambda chapter_text, chapter_id, chapter_title: _DIGITS_ONLY_RE.match(chapter_title) is not None,
+         "标题是纯数字"),
+    Rule("coordinate_row", 2,
+         lambda chapter_text, chapter_id, chapter_title: _COORDINATE_ROW_RE.match(chapter_title) is not None,
+         "坐标点格式，如 \"10 0 E 0 16\""),
+    Rule("parameter_table", 3, _is_parameter_table_row,
+         "参数表格格式，如 \"34 65 F 25 77\""),
+    Rule("frequency_range", 4,
+         lambda chapter_text, chapter_id, chapter_title: _FREQUENCY_RANGE_RE.search(chapter_text) is not None,
+         "频率范围"),
+    Rule("measurement_unit", 5,
+         lambda chapter_text, chapter_id, chapter_title: _MEASUREMENT_UNIT_RE.search(chapter_text) is not None,
+         "数字 + 测量单位"),
+])
+
+
+RULE_SETS = (LINE_RULES, CHAIN_RULES)
+
+
+def set_rule_timing(enabled: bool) -> None:
+    """开启/关闭所有规则表的逐规则计时（计时本身有开销，默认关闭，只统计命中）"""
+    for rule_set in RULE_SETS:
+        rule_set.timing = enabled
+
+def reset_rule_stats() -> None:
+    for rule_set in RULE_SETS:
+        rule_set.reset_stats()
+
+def dump_rule_stats(file=None) -> None:
+    """
+    输出各规则表的执行次数、命中次数和耗时
+    统计只包含当前进程：分节处理使用进程池时，子进程中的章节链过滤不计入
+    """
+    file = file or sys.stdout
+    for rule_set in RULE_SETS:
+        print(f"📏 规则表 {rule_set.name}{rule_set.args}: 调用 {rule_set.calls} 次", file=file)
+        for row in rule_set.stats():
+            timing = f"  耗时 {row['seconds'] * 1000:8.2f}ms" if rule_set.timing else ""
+            print(f"    {row['rule']:<26} 成本 {row['cost']}  执行 {row['evaluated']:>7}  命中 {row['hits']:>6}{timing}",
+                  file=file)
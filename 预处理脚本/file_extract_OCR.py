@@ -1,100 +1,509 @@
 import fitz  # PyMuPDF
 import pytesseract
 from PIL import Image
-import io
+import numpy as np
+import hashlib
+import json
+import time
 import re
 import os
 
-def extract_pdf_with_ocr(pdf_path, output_txt_path):
+# Windows 默认安装路径；不存在时使用 PATH 中的 tesseract
+TESSERACT_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+OCR_LANG = 'chi_sim+eng'
+OCR_CONFIG = '--psm 6 --oem 3'  # 页面分段模式为"假设统一的文本块"
+
+# 自适应分辨率：先渲染低分辨率预览估计字高，再选择让字高接近 TARGET_GLYPH_PX 像素的 DPI
+PREVIEW_DPI = 96
+TARGET_GLYPH_PX = 32
+MIN_DPI = 200
+MAX_DPI = 400
+# 平均置信度低于 LOW_CONFIDENCE 的页面提高分辨率重试一次，最高 RETRY_MAX_DPI
+LOW_CONFIDENCE = 60
+RETRY_DPI_FACTOR = 1.5
+RETRY_MAX_DPI = 600
+
+# 二值化阈值：小于该灰度的像素视为文字；otsu=True 时按页面灰度直方图自动选择
+BINARY_THRESHOLD = 140
+# 水印行区域四周各外扩的宽度（pt）
+WATERMARK_BAND_MARGIN = 2
+
+# 缓存内容或预处理方式变化时递增
+OCR_CACHE_VERSION = "6"
+
+# 增强的水印过滤正则
+watermark_re = re.compile(
+    r'上海机动车检测认证技术研究中心有限公司内部文件，不得外传！|'
+    r'下载者：.*?批准者：.*?\d{1,2}:\d{2}:\d{2}|'
+    r'犌犅／犜[\d—]+'
+)
+
+
+def configure_tesseract():
+    """Windows 默认路径存在时使用它，否则沿用 PATH 中的 tesseract"""
+    if os.path.exists(TESSERACT_CMD):
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+
+def fix_ocr_text(text):
+    """替换常见乱码字符"""
+    return (text.replace('犌犅', 'GB')
+            .replace('／', '/')
+            .replace('犜', 'T')
+            .replace('犃', 'A'))
+
+def clean_ocr_line(line):
+    """去掉水印行、替换常见乱码字符；空行和水印行返回 None"""
+    line = line.strip()
+    if not line or watermark_re.search(line):
+        return None
+    return fix_ocr_text(line)
+
+def clean_ocr_lines(lines):
+    """去掉空行和水印行，替换常见乱码字符"""
+    return [line for line in map(clean_ocr_line, lines) if line is not None]
+
+_tesseract_available = None
+
+def tesseract_available():
+    """tesseract 是否可用（每个进程只检查一次）"""
+    global _tesseract_available
+    if _tesseract_available is None:
+        configure_tesseract()
+        try:
+            pytesseract.get_tesseract_version()
+            _tesseract_available = True
+        except Exception:
+            _tesseract_available = False
+    return _tesseract_available
+
+
+# ---------------- 自适应分辨率 ----------------
+
+def render_gray(page, dpi):
+    """
+    由 fitz 直接渲染单通道灰度图
+    :return: (pixmap, 二维 uint8 数组)；数组通过 samples_mv 与 pixmap 共享像素内存，不做拷贝，
+             调用方需要持有 pixmap 直到数组不再使用
+    """
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    gray = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    return pix, gray
+
+def render_preview(page):
+    """
+    渲染低分辨率灰度预览，用于估计字高和计算页面图像哈希
+    :return: (pixmap, 二维 uint8 数组)
+    """
+    return render_gray(page, PREVIEW_DPI)
+
+def _span_in_bands(bbox, bands):
+    cx, cy = (bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2
+    return any(x0 <= cx <= x1 and y0 <= cy <= y1 for x0, y0, x1, y1 in bands)
+
+def estimate_glyph_height(page, preview_gray, page_dict=None, bands=None):
+    """
+    估计页面正文字高（pt）
+    - 有文本层时取各文本片段字号的中位数；水印行区域内、不可见（alpha 为 0）和非水平方向的片段不计入，
+      否则只有水印的页会按水印大字选择 DPI
+    - 扫描页或文本层只剩上述片段时用预览图的水平投影：涂白水印行区域后，连续有墨迹的像素行构成一个文字行，取行高中位数
+    :param page_dict: 已有的 page.get_text("dict") 结果，None 时重新提取
+    :param bands: 已有的 watermark_bands(page_dict) 结果，None 时重新计算
+    :return: 字高（pt），页面没有文字时为 None
+    """
+    if page_dict is None:
+        page_dict = page.get_text("dict")
+    if bands is None:
+        bands = watermark_bands(page_dict)
+    sizes = [span["size"] for block in page_dict["blocks"] if block.get("type") == 0
+             for line in block["lines"] if abs(line["dir"][1]) <= 0.05
+             for span in line["spans"]
+             if span["text"].strip() and span.get("alpha", 255) > 0 and not _span_in_bands(span["bbox"], bands)]
+    if sizes:
+        return float(np.median(sizes))
+
+    if bands:
+        # 预览数组与 pixmap 共享内存，涂白前先拷贝，页面图像哈希不受影响
+        preview_gray = whiten_bands(preview_gray.copy(), bands, PREVIEW_DPI)
+    ink_rows = (preview_gray < 128).mean(axis=1) > 0.002
+    if not ink_rows.any():
+        return None
+    # 墨迹行的起止位置：相邻行状态变化处
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], ink_rows.astype(np.int8), [0]))))
+    heights = edges[1::2] - edges[0::2]
+    heights = heights[heights >= 3]  # 去掉表格线、噪点
+    if not len(heights):
+        return None
+    return float(np.median(heights)) * 72 / PREVIEW_DPI
+
+def choose_dpi(glyph_pt):
+    """让字高约为 TARGET_GLYPH_PX 像素，限制在 [MIN_DPI, MAX_DPI]"""
+    if not glyph_pt:
+        return MIN_DPI
+    dpi = TARGET_GLYPH_PX * 72 / glyph_pt
+    return int(min(MAX_DPI, max(MIN_DPI, round(dpi / 10) * 10)))
+
+
+# ---------------- 图像预处理 ----------------
+
+_HISTOGRAM_ROWS = 256
+
+def otsu_threshold(gray):
+    """Otsu 法：选择使前景/背景类间方差最大的灰度阈值，像素小于返回值视为文字"""
+    # bincount 会把输入转成 intp，按行分块统计，避免整页 8 倍大小的临时数组
+    hist = np.zeros(256, dtype=np.float64)
+    for top in range(0, gray.shape[0], _HISTOGRAM_ROWS):
+        hist += np.bincount(gray[top:top + _HISTOGRAM_ROWS].ravel(), minlength=256)
+    weight0 = np.cumsum(hist)
+    weight1 = weight0[-1] - weight0
+    mean_sum = np.cumsum(hist * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean0 = mean_sum / weight0
+        mean1 = (mean_sum[-1] - mean_sum) / weight1
+        between = np.nan_to_num(weight0 * weight1 * (mean0 - mean1) ** 2)
+    if not between.any():
+        # 纯色页面没有可分的两类
+        return BINARY_THRESHOLD
+    return int(np.argmax(between)) + 1
+
+def binarize(gray, threshold=BINARY_THRESHOLD):
+    """原地二值化：小于阈值的像素置 0，其余置 255"""
+    np.multiply(gray >= threshold, 255, out=gray, casting="unsafe")
+    return gray
+
+def watermark_bands(page_dict):
+    """
+    文本层中水印行所在的区域 [(x0, y0, x1, y1), ...]（pt），四周外扩 WATERMARK_BAND_MARGIN
+    只取水平方向的水印行；斜向水印的外接框几乎覆盖整页，涂白会把正文一起抹掉
+    """
+    bands = []
+    for block in page_dict["blocks"]:
+        if block.get("type") != 0:
+            continue
+        for line in block["lines"]:
+            if abs(line["dir"][1]) > 0.05:
+                continue
+            text = "".join(span["text"] for span in line["spans"])
+            if watermark_re.search(text):
+                x0, y0, x1, y1 = line["bbox"]
+                bands.append((x0 - WATERMARK_BAND_MARGIN, y0 - WATERMARK_BAND_MARGIN,
+                              x1 + WATERMARK_BAND_MARGIN, y1 + WATERMARK_BAND_MARGIN))
+    return bands
+
+def whiten_bands(gray, bands, dpi):
+    """
+    只把水印行自身的区域涂白，同一高度上水印左右两侧的正文保留；
+    图像尺寸不变，识别结果的坐标不需要偏移
+    """
+    scale = dpi / 72
+    height, width = gray.shape
+    for x0, y0, x1, y1 in bands:
+        top, bottom = max(0, int(y0 * scale)), min(height, int(np.ceil(y1 * scale)))
+        left, right = max(0, int(x0 * scale)), min(width, int(np.ceil(x1 * scale)))
+        if top < bottom and left < right:
+            gray[top:bottom, left:right] = 255
+    return gray
+
+def preprocess_gray(gray, dpi, bands=(), otsu=False):
+    """
+    OCR 前的原地预处理：涂白水印行区域，再按固定阈值或 Otsu 阈值二值化
+    :return: 使用的阈值
+    """
+    whiten_bands(gray, bands, dpi)
+    threshold = otsu_threshold(gray) if otsu else BINARY_THRESHOLD
+    binarize(gray, threshold)
+    return threshold
+
+def to_tesseract_image(gray):
+    """
+    把数组包装成 PIL 图像交给 pytesseract：frombuffer 共享数组内存；
+    标记为 PPM 格式后，pytesseract 写临时文件时直接输出原始像素（PGM），不做 PNG 压缩编码
+    """
+    gray = np.ascontiguousarray(gray)  # 灰度 pixmap 的行跨度等于宽度，这里不会发生拷贝
+    height, width = gray.shape
+    img = Image.frombuffer("L", (width, height), gray, "raw", "L", 0, 1)
+    img.format = "PPM"
+    return img
+
+
+# ---------------- 单页 OCR ----------------
+
+def _union_bbox(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+def ocr_image(img, scale=1.0):
+    """
+    识别一张图像，返回 (页面字典, 平均置信度)
+    页面字典与 page.get_text("dict") 结构相同：blocks -> lines -> spans，每个 tesseract 单词是一个 span，
+    block/line 按 tesseract 的 block_num 和 (block_num, par_num, line_num) 分组；
+    坐标乘以 scale，传入 72 / dpi 即得到页面坐标（pt）
+    """
+    data = pytesseract.image_to_data(img, lang=OCR_LANG, config=OCR_CONFIG, output_type=pytesseract.Output.DICT)
+    blocks = {}
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        word = word.strip()
+        if conf < 0 or not word:
+            continue
+        confidences.append(conf)
+        x0, y0 = data["left"][i] * scale, data["top"][i] * scale
+        bbox = (round(x0, 2), round(y0, 2),
+                round(x0 + data["width"][i] * scale, 2), round(y0 + data["height"][i] * scale, 2))
+        span = {"text": word, "bbox": bbox, "size": round(bbox[3] - bbox[1], 2), "font": "OCR", "flags": 0,
+                "color": 0, "origin": (bbox[0], bbox[3]), "conf": conf}
+
+        block_key = data["block_num"][i]
+        line_key = (block_key, data["par_num"][i], data["line_num"][i])
+        block = blocks.get(block_key)
+        if block is None:
+            block = blocks[block_key] = {"type": 0, "number": len(blocks), "bbox": bbox, "lines": []}
+        line = lines.get(line_key)
+        if line is None:
+            line = lines[line_key] = {"wmode": 0, "dir": (1.0, 0.0), "bbox": bbox, "spans": []}
+            block["lines"].append(line)
+        line["spans"].append(span)
+        line["bbox"] = _union_bbox(line["bbox"], bbox)
+        block["bbox"] = _union_bbox(block["bbox"], bbox)
+
+    page_dict = {"width": round(img.width * scale, 2), "height": round(img.height * scale, 2),
+                 "blocks": list(blocks.values())}
+    return page_dict, (sum(confidences) / len(confidences) if confidences else 0.0)
+
+def line_text(line):
     """
-    使用OCR提取PDF文本内容（最终修正版）
-    主要改进：
-    1. 修复了图像转换问题
-    2. 添加了Tesseract路径检查
-    3. 优化了图像预处理
-    4. 改进了水印过滤
+    拼接一行中各 span 的文字：与上一个 span 的间距超过半个字宽（至少 3pt）才加空格，
+    中文逐字识别时不会被空格隔开，英文单词之间保留空格
     """
-    # 检查Tesseract路径
+    text = ""
+    last_x = None
+    for span in sorted(line["spans"], key=lambda sp: sp["bbox"][0]):
+        x0, x1 = span["bbox"][0], span["bbox"][2]
+        avg_char_w = max(1.0, x1 - x0) / max(len(span["text"]), 1)
+        if last_x is not None and x0 - last_x > max(avg_char_w * 0.5, 3.0):
+            text += " "
+        text += span["text"]
+        last_x = x1
+    return text.strip()
+
+def clean_ocr_page_dict(page_dict):
+    """原地去掉水印行和空块，并替换 span 中的常见乱码字符"""
+    blocks = []
+    for block in page_dict["blocks"]:
+        block["lines"] = [line for line in block["lines"] if clean_ocr_line(line_text(line)) is not None]
+        if not block["lines"]:
+            continue
+        for line in block["lines"]:
+            for span in line["spans"]:
+                span["text"] = fix_ocr_text(span["text"])
+        blocks.append(block)
+    page_dict["blocks"] = blocks
+    return page_dict
+
+def page_dict_lines(page_dict):
+    """页面字典中各行的文字"""
+    return [line_text(line) for block in page_dict["blocks"] for line in block["lines"]]
+
+def _ocr_cache_path(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.ocr.json")
+
+def _load_ocr_cache(path):
+    """读取缓存的识别结果，不存在或损坏时返回 None（按未命中处理，重新识别后覆盖）"""
+    if not os.path.exists(path):
+        return None
     try:
-        pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'  # Windows默认路径
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ OCR 缓存读取失败，将重新识别: {path}, {e}")
+        return None
+
+def _save_ocr_cache(path, result):
+    """先写临时文件再原子替换，多进程或并发运行时不会留下/读到半截文件"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def page_image_key(preview_samples, preview_shape, otsu=False):
+    """页面图像哈希：预览像素 + OCR 参数，相同页面在不同文件中也能命中"""
+    h = hashlib.sha256(f"{OCR_CACHE_VERSION}|{OCR_LANG}|{OCR_CONFIG}|{preview_shape}|{otsu}".encode("utf-8"))
+    h.update(preview_samples)
+    return h.hexdigest()
+
+def _ocr_at_dpi(page, dpi, bands, otsu, timings):
+    """按指定 DPI 渲染、预处理并识别，各阶段耗时累加到 timings"""
+    start = time.perf_counter()
+    pix, gray = render_gray(page, dpi)
+    rendered = time.perf_counter()
+    preprocess_gray(gray, dpi, bands, otsu)
+    preprocessed = time.perf_counter()
+    result = ocr_image(to_tesseract_image(gray), 72 / dpi)
+    timings["render"] += rendered - start
+    timings["preprocess"] += preprocessed - rendered
+    timings["ocr"] += time.perf_counter() - preprocessed
+    return result
+
+def ocr_page(page, cache_dir=None, otsu=False):
+    """
+    OCR 一页：预览估计字高 -> 选择 DPI -> 灰度渲染、涂白水印行、二值化 -> 识别 -> 置信度低时提高 DPI 重试
+    :param cache_dir: 按页面图像哈希缓存识别结果的目录，None 表示不缓存
+    :param otsu: 二值化阈值按页面灰度直方图自动选择，False 时使用 BINARY_THRESHOLD
+    :return: {"page", "page_dict", "lines", "dpi", "confidence", "cached", "timings"}
+             page_dict 与 page.get_text("dict") 结构相同（页面坐标 pt），可以直接交给文本层的行解析逻辑；
+             lines 为各行文字；两者都已去除水印；timings 为本次处理各阶段耗时（秒），不写入缓存
+    """
+    timings = {"preview": 0.0, "render": 0.0, "preprocess": 0.0, "ocr": 0.0}
+    start = time.perf_counter()
+    preview_pix, preview_gray = render_preview(page)
+    key = None
+    if cache_dir:
+        key = page_image_key(preview_pix.samples_mv, preview_gray.shape, otsu)
+        cached = _load_ocr_cache(_ocr_cache_path(cache_dir, key))
+        if cached is not None:
+            timings["preview"] = time.perf_counter() - start
+            return dict(cached, page=page.number + 1, cached=True, timings=timings)
+
+    page_dict = page.get_text("dict")
+    bands = watermark_bands(page_dict)
+    glyph_pt = estimate_glyph_height(page, preview_gray, page_dict, bands)
+    timings["preview"] = time.perf_counter() - start
+    if glyph_pt is None:
+        # 空白页不做识别
+        result = {"page_dict": {"width": page.rect.width, "height": page.rect.height, "blocks": []},
+                  "lines": [], "dpi": 0, "confidence": 0.0}
+    else:
+        dpi = choose_dpi(glyph_pt)
+        ocr_dict, confidence = _ocr_at_dpi(page, dpi, bands, otsu, timings)
+        if confidence < LOW_CONFIDENCE and dpi < RETRY_MAX_DPI:
+            retry_dpi = int(min(RETRY_MAX_DPI, dpi * RETRY_DPI_FACTOR))
+            retry_dict, retry_confidence = _ocr_at_dpi(page, retry_dpi, bands, otsu, timings)
+            if retry_confidence > confidence:
+                ocr_dict, confidence, dpi = retry_dict, retry_confidence, retry_dpi
+        clean_ocr_page_dict(ocr_dict)
+        result = {"page_dict": ocr_dict, "lines": page_dict_lines(ocr_dict), "dpi": dpi,
+                  "confidence": round(confidence, 2)}
+
+    if key:
+        _save_ocr_cache(_ocr_cache_path(cache_dir, key), result)
+    return dict(result, page=page.number + 1, cached=False, timings=timings)
+
+
+# ---------------- 多进程 ----------------
+
+def _ocr_page_safe(doc, page_num, cache_dir, otsu=False):
+    """单页失败时返回带 error 的空结果，不中断整个文档"""
+    try:
+        return ocr_page(doc[page_num], cache_dir, otsu)
     except Exception as e:
-        print(f"⚠️ Tesseract未正确安装或路径错误: {e}")
-        print("请从 https://github.com/UB-Mannheim/tesseract/wiki 安装Tesseract")
+        return {"page": page_num + 1, "page_dict": {"blocks": []}, "lines": [], "dpi": 0, "confidence": 0.0,
+                "cached": False, "error": str(e)}
+
+# 工作进程内按路径复用已打开的文档
+_worker_docs = {}
+
+def _ocr_page_worker(task):
+    pdf_path, page_num, cache_dir, otsu = task
+    doc = _worker_docs.get(pdf_path)
+    if doc is None:
+        doc = _worker_docs[pdf_path] = fitz.open(pdf_path)
+    return _ocr_page_safe(doc, page_num, cache_dir, otsu)
+
+def iter_ocr_pages(pdf_path, page_numbers=None, workers=1, cache_dir=None, otsu=False):
+    """
+    按页顺序产出 ocr_page 的结果
+    workers > 1 时分发到进程池，同时在途的页数不超过 workers * 2，内存占用不随页数增长
+    :param page_numbers: 要识别的页码（从 0 开始），None 表示全部页
+    """
+    configure_tesseract()
+    if page_numbers is None:
+        with fitz.open(pdf_path) as doc:
+            page_numbers = list(range(len(doc)))
+
+    if workers is None or workers <= 1 or len(page_numbers) < 2:
+        with fitz.open(pdf_path) as doc:
+            for page_num in page_numbers:
+                yield _ocr_page_safe(doc, page_num, cache_dir, otsu)
         return
 
-    doc = fitz.open(pdf_path)
+    tasks = [(pdf_path, page_num, cache_dir, otsu) for page_num in page_numbers]
+
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=configure_tesseract) as executor:
+        pending = deque()
+        task_iter = iter(tasks)
+        for task in task_iter:
+            pending.append(executor.submit(_ocr_page_worker, task))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            # 按提交顺序取结果，取走一个再补一个
+            yield pending.popleft().result()
+            next_task = next(task_iter, None)
+            if next_task is not None:
+                pending.append(executor.submit(_ocr_page_worker, next_task))
+
+
+def extract_pdf_with_ocr(pdf_path, output_txt_path, workers=1, cache_dir=None, otsu=False, timing=False):
+    """
+    使用OCR提取PDF文本内容
+    1. 按页估计字高自适应选择 DPI，低置信度页面提高 DPI 重试
+    2. 灰度图直接由 fitz 渲染，在同一块像素内存上涂白水印行、二值化后交给 tesseract
+    3. workers > 1 时多进程并行识别，结果按页顺序拼接
+    4. cache_dir 按页面图像哈希缓存识别结果，重复处理同一文件时直接复用
+    5. 过滤水印并替换常见乱码字符
+    只输出纯文本；需要章节树时直接用 test_en.py --ocr 解析扫描件，OCR 结果按文本层同样的流程拼行、识别章节
+    :param otsu: 使用 Otsu 自动阈值二值化
+    :param timing: 输出每页各阶段耗时
+    """
     full_text = []
-    
-    # 增强的水印过滤正则
-    watermark_re = re.compile(
-        r'上海机动车检测认证技术研究中心有限公司内部文件，不得外传！|'
-        r'下载者：.*?批准者：.*?\d{1,2}:\d{2}:\d{2}|'
-        r'犌犅／犜[\d—]+'
-    )
-    
-    for page_num in range(len(doc)):
-        try:
-            # 将PDF页面转为高质量图像（600 DPI）
-            pix = doc[page_num].get_pixmap(
-                dpi=600,
-                matrix=fitz.Matrix(2.0, 2.0),  # 提高分辨率
-                colorspace="rgb",
-                alpha=False
-            )
-            
-            # 转换为PIL Image并进行预处理
-            img = Image.open(io.BytesIO(pix.tobytes("ppm")))
-            
-            # 图像增强处理
-            img = img.convert('L')  # 转为灰度
-            img = img.point(lambda x: 0 if x < 140 else 255)  # 二值化阈值调整
-            
-            # 使用Tesseract OCR识别（调整参数）
-            text = pytesseract.image_to_string(
-                img,
-                lang='chi_sim+eng',
-                config='--psm 6 --oem 3'  # 页面分段模式为"假设统一的文本块"
-            )
-            
-            # 高级过滤处理
-            cleaned_lines = []
-            for line in text.split('\n'):
-                line = line.strip()
-                if line and not watermark_re.search(line):
-                    # 替换常见乱码字符
-                    line = (line.replace('犌犅', 'GB')
-                          .replace('／', '/')
-                          .replace('犜', 'T')
-                          .replace('犃', 'A'))
-                    cleaned_lines.append(line)
-            
-            if cleaned_lines:
-                full_text.append("\n".join(cleaned_lines))
-            
-        except Exception as e:
-            print(f"⚠️ 第 {page_num+1} 页处理失败: {e}")
+    page_count = 0
+    totals = {}
+    for result in iter_ocr_pages(pdf_path, workers=workers, cache_dir=cache_dir, otsu=otsu):
+        page_count += 1
+        if result.get("error"):
+            print(f"⚠️ 第 {result['page']} 页处理失败: {result['error']}")
             continue
-    
+        timings = result.get("timings", {})
+        for stage, seconds in timings.items():
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        if timing:
+            stages = "，".join(f"{stage} {seconds * 1000:.1f}ms" for stage, seconds in timings.items())
+            print(f"⏱️ 第 {result['page']} 页 dpi={result['dpi']}{'（缓存）' if result['cached'] else ''}: {stages}")
+        if result["lines"]:
+            full_text.append("\n".join(result["lines"]))
+
     # 保存结果
     try:
         with open(output_txt_path, "w", encoding="utf-8", errors="replace") as f:
             f.write("\n\n".join(full_text))
-        
+
         print(f"✅ OCR提取完成，结果保存至 {output_txt_path}")
-        print(f"提取页数：{len(doc)}")
+        print(f"提取页数：{page_count}")
         print(f"有效文本页：{len(full_text)}")
-        # print(f"总文本行数：{sum(len(page.split('\n')) for page in full_text)}")
-        
+        if totals:
+            print("各阶段总耗时：" + "，".join(f"{stage} {seconds:.2f}s" for stage, seconds in totals.items()))
+
     except Exception as e:
         print(f"⚠️ 无法保存结果文件: {e}")
 
 if __name__ == "__main__":
-    # 配置参数
-    input_pdf = "GB∕T+38186-2019+商用车辆自动紧急制动系统（AEBS）性能要求及试验方法.pdf"
-    output_txt = "ocr_extracted_text_final.txt"
-    
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf_path", default="GB∕T+38186-2019+商用车辆自动紧急制动系统（AEBS）性能要求及试验方法.pdf")
+    parser.add_argument("--output", default="ocr_extracted_text_final.txt")
+    parser.add_argument("--workers", type=int, default=1, help="OCR 进程数")
+    parser.add_argument("--cache_dir", default=None, help="按页面图像哈希缓存 OCR 结果的目录")
+    parser.add_argument("--otsu", action="store_true", help="按页面灰度直方图自动选择二值化阈值（Otsu）")
+    parser.add_argument("--timing", action="store_true", help="输出每页渲染、预处理、识别耗时")
+    args = parser.parse_args()
+
     # 检查文件是否存在
-    if not os.path.exists(input_pdf):
-        print(f"⚠️ 输入文件不存在: {input_pdf}")
+    if not os.path.exists(args.pdf_path):
+        print(f"⚠️ 输入文件不存在: {args.pdf_path}")
     else:
-        extract_pdf_with_ocr(input_pdf, output_txt)
\ No newline at end of file
+        extract_pdf_with_ocr(args.pdf_path, args.output, args.workers, args.cache_dir, args.otsu, args.timing)
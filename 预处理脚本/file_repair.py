@@ -18,7 +18,46 @@
 #     repair_pdf(in_file, out_file)
 
 #!/usr/bin/env python3
+"""
+PDF 修复阶段：抽查几页判断文件是否需要修复，需要时用 pikepdf 重写一份，按源文件哈希缓存
+- 结构损坏（MuPDF 打开时重建了 xref、页面解析报错）或抽查页中无法解码的字符（U+FFFD、控制字符）过多时才修复
+- 字形映射错位（"犌犅"一类乱码）重写文件无法修复，抽查时只给出提示，由 test_en.py --ocr 按页改用 OCR 处理
+- 修复结果和"不需要修复"的判断都按源文件 sha256 缓存，同一文件不会重复抽查和重写
+"""
 import sys, pikepdf
+import os
+import re
+import json
+import hashlib
+import tempfile
+from typing import Dict, List, NamedTuple, Optional
+
+import fitz  # PyMuPDF
+
+from text_quality import GARBLED_RATIO, garbled_ratio
+
+# 抽查的页数：首页、末页和中间均匀分布的页
+PROBE_PAGES = 5
+# 抽查页中无法解码的字符占比达到该值时修复
+UNDECODABLE_RATIO = 0.01
+REPAIR_CACHE_DIR = os.path.join(tempfile.gettempdir(), "pdf_repair_cache")
+
+# 无法解码的字符：替换字符 U+FFFD 和除换行、制表外的控制字符
+_UNDECODABLE_RE = re.compile(r'[\ufffd\x00-\x08\x0b\x0c\x0e-\x1f]')
+_SPACE_RE = re.compile(r'\s+')
+
+
+class ProbeResult(NamedTuple):
+    """
+    抽查结果：reason 为需要修复的原因（'open_failed' / 'xref' / 'page_error' / 'undecodable'），None 表示不需要
+    garbled_ratio 为抽查页中乱码字符占比的最大值（text_quality.garbled_ratio，与 test_en.py 的 OCR 回退相同的判定），不作为修复原因
+    """
+    reason: Optional[str]
+    undecodable_ratio: float
+    pages: List[int]
+    garbled_ratio: float = 0.0
+
+
 # 修补文件，保存时强制重新嵌入字体
 def embed_unicode(src, dst):
     with pikepdf.open(src) as pdf:
@@ -31,8 +70,158 @@ def embed_unicode(src, dst):
                  stream_decode_level=pikepdf.StreamDecodeLevel.all)
     print("✅ 已重新嵌入字体并生成 Unicode 映射:", dst)
 
+def _probe_page_numbers(page_count, sample_pages=PROBE_PAGES):
+    if page_count <= sample_pages:
+        return list(range(page_count))
+    step = (page_count - 1) / (sample_pages - 1)
+    return sorted({round(i * step) for i in range(sample_pages)})
+
+def probe_pdf(pdf_path, sample_pages=PROBE_PAGES) -> ProbeResult:
+    """抽查 sample_pages 页的文本层，判断文件是否需要修复，同时检查字形映射错位"""
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception:
+        return ProbeResult('open_failed', 0.0, [])
+    with doc:
+        page_numbers = _probe_page_numbers(len(doc), sample_pages)
+        if doc.is_repaired:
+            return ProbeResult('xref', 0.0, page_numbers)
+        chars = bad = 0
+        garbled = 0.0
+        for page_num in page_numbers:
+            try:
+                text = _SPACE_RE.sub('', doc[page_num].get_text())
+            except Exception:
+                return ProbeResult('page_error', 0.0, page_numbers)
+            chars += len(text)
+            bad += len(_UNDECODABLE_RE.findall(text))
+            garbled = max(garbled, garbled_ratio(text))
+    ratio = bad / chars if chars else 0.0
+    return ProbeResult('undecodable' if ratio >= UNDECODABLE_RATIO else None, ratio, page_numbers, garbled)
+
+def _warn_garbled(pdf_path, ratio):
+    """字形映射错位重写无法修复，只提示改用 OCR"""
+    if ratio >= GARBLED_RATIO:
+        print(f"⚠️ 文本层字形映射错位（抽查页乱码占比 {ratio:.0%}），修复无效，请用 test_en.py --ocr 处理: {pdf_path}")
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _write_record(path, record):
+    """先写临时文件再原子替换，并行处理时不会读到半截文件"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def _load_record(path) -> Optional[Dict]:
+    """读取缓存记录；不存在、损坏或缺少 repaired 字段（如旧版本写入中断留下的半截文件）时返回 None，按未缓存处理"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            record = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 修复缓存记录无效，重新抽查: {path}: {e}")
+        return None
+    if not isinstance(record, dict) or not isinstance(record.get("repaired"), bool):
+        print(f"⚠️ 修复缓存记录不完整，重新抽查: {path}")
+        return None
+    return record
+
+def ensure_repaired(pdf_path, cache_dir=None, force=False) -> str:
+    """
+    需要时修复 PDF，返回后续解析应当使用的文件路径（修复后的缓存文件或原文件）
+    :param cache_dir: 修复缓存目录，None 时使用系统临时目录下的 pdf_repair_cache
+    :param force: 不抽查，直接修复
+    """
+    cache_dir = cache_dir or REPAIR_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    digest = file_sha256(pdf_path)
+    record_path = os.path.join(cache_dir, f"{digest}.json")
+    repaired_path = os.path.join(cache_dir, f"{digest}.pdf")
+
+    record = _load_record(record_path)
+    if record is not None:
+        if record["repaired"] and os.path.exists(repaired_path):
+            _warn_garbled(pdf_path, record.get("after_garbled_ratio", 0.0))
+            return repaired_path
+        if not record["repaired"] and not force:
+            _warn_garbled(pdf_path, record.get("garbled_ratio", 0.0))
+            return pdf_path
+
+    probe = ProbeResult('forced', 0.0, []) if force else probe_pdf(pdf_path)
+    record = {"source": os.path.abspath(pdf_path), "reason": probe.reason,
+              "undecodable_ratio": round(probe.undecodable_ratio, 4),
+              "garbled_ratio": round(probe.garbled_ratio, 4), "repaired": False}
+    garbled = probe.garbled_ratio
+    if probe.reason is not None:
+        tmp_path = f"{repaired_path}.{os.getpid()}.tmp"
+        try:
+            embed_unicode(pdf_path, tmp_path)
+            os.replace(tmp_path, repaired_path)
+            after = probe_pdf(repaired_path)
+            record.update(repaired=True, after_reason=after.reason,
+                          after_undecodable_ratio=round(after.undecodable_ratio, 4),
+                          after_garbled_ratio=round(after.garbled_ratio, 4))
+            garbled = after.garbled_ratio
+            if after.reason is not None:
+                print(f"⚠️ 修复后仍有问题（{after.reason}），乱码页可用 test_en.py --ocr 处理: {pdf_path}")
+        except Exception as e:
+            print(f"⚠️ 修复失败，使用原文件: {pdf_path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            record["error"] = str(e)
+    _write_record(record_path, record)
+    _warn_garbled(pdf_path, garbled)
+    return repaired_path if record["repaired"] else pdf_path
+
+def _ensure_repaired_worker(task):
+    pdf_path, cache_dir, force = task
+    try:
+        return pdf_path, ensure_repaired(pdf_path, cache_dir, force)
+    except Exception as e:
+        print(f"⚠️ 处理失败: {pdf_path}: {e}")
+        return pdf_path, pdf_path
+
+def repair_directory(src_dir, cache_dir=None, workers=1, force=False) -> Dict[str, str]:
+    """
+    处理目录下的全部 PDF（不递归），workers > 1 时多进程并行
+    :return: {原文件路径: 应使用的文件路径}
+    """
+    pdf_paths = sorted(os.path.join(src_dir, name) for name in os.listdir(src_dir) if name.lower().endswith(".pdf"))
+    tasks = [(path, cache_dir, force) for path in pdf_paths]
+    if workers is None or workers <= 1 or len(tasks) < 2:
+        results = dict(map(_ensure_repaired_worker, tasks))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            results = dict(executor.map(_ensure_repaired_worker, tasks))
+    repaired = sum(1 for src, dst in results.items() if src != dst)
+    print(f"📂 {len(results)} 个 PDF，{repaired} 个使用修复后的文件")
+    return results
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("用法: python embed_unicode.py input.pdf output.pdf")
-        sys.exit(1)
-    embed_unicode(sys.argv[1], sys.argv[2])
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="抽查 PDF 是否需要修复，需要时重写并按源文件哈希缓存")
+    parser.add_argument("src", help="PDF 文件或目录")
+    parser.add_argument("dst", nargs="?", default=None, help="指定时把（修复后的）文件复制到该路径，仅单个文件")
+    parser.add_argument("--cache_dir", default=None, help="修复缓存目录，默认使用系统临时目录")
+    parser.add_argument("--workers", type=int, default=1, help="处理目录时的进程数")
+    parser.add_argument("--force", action="store_true", help="不抽查，直接修复")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.src):
+        for src, dst in repair_directory(args.src, args.cache_dir, args.workers, args.force).items():
+            print(f"{src} -> {dst}")
+    else:
+        result_path = ensure_repaired(args.src, args.cache_dir, args.force)
+        if args.dst:
+            import shutil
+            shutil.copyfile(result_path, args.dst)
+            result_path = args.dst
+        print(result_path)
@@ -1,5 +1,6 @@
 import json
 import os
+from chapter_id import ChapterId
 
 def load_json_file(file_path):
     """加载JSON文件"""
@@ -30,6 +31,36 @@ def find_chapter_recursive(chapters, chapter_id):
             return found
     return None
 
+def build_chapter_index(data):
+    """
+    为整份文档建立章节索引，避免每次查找都递归遍历整棵树
+    返回 {(file, section): {ChapterId: chapter}}，查找结果与 find_chapter_by_path 一致：
+    同名 file/section 取第一个，同一 section 内按先序遍历取第一个同编号章节
+    """
+    index = {}
+    for file_data in data:
+        for section in file_data.get("sections", []):
+            path_key = (file_data.get("file"), section.get("section"))
+            if path_key in index:
+                continue
+            chapters_by_id = {}
+            stack = list(reversed(section.get("chapters", [])))
+            while stack:
+                chapter = stack.pop()
+                chapters_by_id.setdefault(ChapterId.parse(chapter.get("chapter_id", "")), chapter)
+                stack.extend(reversed(chapter.get("children", [])))
+            index[path_key] = chapters_by_id
+    return index
+
+def find_chapter_in_index(index, file_name, section_name, chapter_id):
+    """
+    在 build_chapter_index 的结果中按 file、section、chapter_id 查找章节
+    """
+    chapters_by_id = index.get((file_name, section_name))
+    if chapters_by_id is None:
+        return None
+    return chapters_by_id.get(ChapterId.parse(chapter_id))
+
 def extract_comparison_fields(chapter):
     """
     提取用于对比的字段
@@ -64,6 +95,10 @@ def process_matches():
     ece_data = load_json_file(ece_file)
     
     print(f"加载了 {len(match_data)} 个匹配项")
+
+    # 预先建立章节索引，每个候选只做一次字典查找
+    gso_index = build_chapter_index(gso_data)
+    ece_index = build_chapter_index(ece_data)
     
     # 处理每个匹配项
     comparison_results = []
@@ -72,8 +107,8 @@ def process_matches():
         print(f"处理匹配项 {i+1}/{len(match_data)}: {match_item.get('chapter_id', '')}")
         
         # 获取GSO源章节
-        gso_chapter = find_chapter_by_path(
-            gso_data, 
+        gso_chapter = find_chapter_in_index(
+            gso_index, 
             match_item.get("file", ""), 
             match_item.get("section", ""), 
             match_item.get("chapter_id", "")
@@ -94,7 +129,7 @@ def process_matches():
                 file_name, section_name, chapter_id = chapter_path[0], chapter_path[1], chapter_path[2]
                 
                 # 查找ECE候选章节
-                ece_chapter = find_chapter_by_path(ece_data, file_name, section_name, chapter_id)
+                ece_chapter = find_chapter_in_index(ece_index, file_name, section_name, chapter_id)
                 
                 if ece_chapter:
                     ece_comparison = extract_comparison_fields(ece_chapter)
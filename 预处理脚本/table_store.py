@@ -0,0 +1,177 @@
+"""
+表格后处理与存储：
+- 跨页拼接：大表格在下一页继续时合并成一张表，去掉续页重复的表头行
+- 章节关联：按表格所在行号找到包含它的章节（附件/附录标题行也是边界，标题后第一个章节之前的表格归到该分节）
+- 紧凑存储：每张表一行 JSON（行数组形式）写入 .jsonl，另存偏移索引，表头可以直接从索引读取
+"""
+import json
+import re
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 续表标题：表1（续）、续表 A.2、Table 3 (continued)
+_CONTINUED_TITLE_RE = re.compile(r'续表|[（(]\s*续\s*[)）]|continued', re.I)
+# 没有识别到标题时 _extract_page_tables 生成的兜底编号
+_FALLBACK_TABLE_ID_RE = re.compile(r'^表-页\d+-表\d+$')
+_CELL_SPACE_RE = re.compile(r'\s+')
+
+# 续页首行与表头的单元格一致比例达到该值时视为重复表头
+HEADER_SIMILARITY = 0.8
+
+# link_tables_to_chapters 写入表格的位置字段
+LINK_FIELDS = ("file", "section", "chapter_id", "chapter_path")
+
+
+def _column_count(rows: List[List[str]]) -> int:
+    return max((len(row) for row in rows), default=0)
+
+def _normalize_cells(row: List[str]) -> List[str]:
+    return [_CELL_SPACE_RE.sub('', cell or '') for cell in row]
+
+def header_similarity(header: List[str], row: List[str]) -> float:
+    """两行对应单元格（去空白后）相同的比例，只统计至少一侧非空的单元格"""
+    a, b = _normalize_cells(header), _normalize_cells(row)
+    compared = same = 0
+    for x, y in zip(a, b):
+        if not x and not y:
+            continue
+        compared += 1
+        same += x == y
+    return same / compared if compared else 0.0
+
+def _is_continuation(prev: Dict, table: Dict) -> Tuple[bool, bool]:
+    """
+    判断 table 是否是 prev 的续页
+    - 必须在 prev 最后一页的下一页，且列数相同
+    - 标题标明续表的视为续页
+    - 有自己标题（不是续表）的是新表，即使标题与 prev 相同（文本层可能把不同表的标题截成同一个"表X."）
+    - 没有标题的表格只有从页面顶部开始（上方没有正文行）时才视为续页
+    续页首行与表头重复时去掉该行
+    :return: (是否续页, 首行是否为重复表头)
+    """
+    if table.get("page") != prev["pages"][-1] + 1:
+        return False, False
+    rows, prev_rows = table["table_content"], prev["table_content"]
+    if not rows or _column_count(rows) != _column_count(prev_rows):
+        return False, False
+
+    table_id = table.get("table_id", "")
+    if _CONTINUED_TITLE_RE.search(table_id):
+        continuation = True
+    elif _FALLBACK_TABLE_ID_RE.match(table_id):
+        continuation = bool(table.get("at_page_top"))
+    else:
+        continuation = False
+    if not continuation:
+        return False, False
+    return True, header_similarity(prev_rows[0], rows[0]) >= HEADER_SIMILARITY
+
+def stitch_tables(tables: Iterable[Dict]) -> Iterator[Dict]:
+    """
+    按页顺序拼接跨页表格，逐张产出；任意时刻只持有当前正在拼接的一张表
+    产出的表格在原字段基础上增加 pages（所跨页码列表），table_id / page / bbox / line 取第一页的
+    只用于拼接和定位的 at_page_top / above_bbox 字段不保留
+    """
+    current = None
+    for table in tables:
+        if current is not None:
+            continuation, repeated_header = _is_continuation(current, table)
+            if continuation:
+                rows = table["table_content"]
+                current["table_content"].extend(rows[1:] if repeated_header else rows)
+                current["pages"].append(table["page"])
+                continue
+            yield current
+        current = dict(table, table_content=list(table["table_content"]), pages=[table.get("page")])
+        current.pop("at_page_top", None)
+        current.pop("above_bbox", None)
+    if current is not None:
+        yield current
+
+def link_tables_to_chapters(tables: Iterable[Dict], heading_lines: List[Tuple[int, Dict, Any]]
+                            ) -> Iterator[Tuple[Dict, Any]]:
+    """
+    为每张表写入 LINK_FIELDS：取行号不大于表格行号的最后一个边界（章节标题行或附件/附录标题行）
+    :param heading_lines: 按行号升序的 (行号, 位置字段, 关联对象)，位置字段的键为 LINK_FIELDS
+    :return: 逐张产出 (表格, 关联对象)；表格在所有边界之前时位置字段全为 None、关联对象为 None
+    """
+    starts = [line for line, _, _ in heading_lines]
+    for table in tables:
+        line = table.get("line")
+        pos = bisect_right(starts, line) - 1 if line is not None else -1
+        if pos >= 0:
+            _, fields, target = heading_lines[pos]
+        else:
+            fields, target = {}, None
+        for key in LINK_FIELDS:
+            table[key] = fields.get(key)
+        yield table, target
+
+
+class TableStore:
+    """
+    表格的 JSONL 存储：
+    - <base>.jsonl：每行一张表，紧凑 JSON，table_content 为行数组
+    - <base>.idx.json：每张表的 table_id、页码、关联章节、表头和在 .jsonl 中的字节偏移/长度
+    读取单张表时按偏移 seek，不需要把整个文件读进内存
+    """
+
+    def __init__(self, base_path: str):
+        """
+        :param base_path: 不带扩展名的存储路径，如 output.tables
+        """
+        self.data_path = base_path + ".jsonl"
+        self.index_path = base_path + ".idx.json"
+        self._index = None
+
+    def write(self, tables: Iterable[Dict]) -> int:
+        """逐张写入表格（可以是生成器），返回写入的表格数"""
+        index = []
+        offset = 0
+        with open(self.data_path, "wb") as f:
+            for table in tables:
+                data = (json.dumps(table, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+                f.write(data)
+                rows = table.get("table_content") or [[]]
+                index.append({
+                    "table_id": table.get("table_id"),
+                    "pages": table.get("pages", [table.get("page")]),
+                    "file": table.get("file"),
+                    "section": table.get("section"),
+                    "chapter_id": table.get("chapter_id"),
+                    "chapter_path": table.get("chapter_path"),
+                    "header": rows[0],
+                    "rows": len(table.get("table_content") or []),
+                    "offset": offset,
+                    "length": len(data),
+                })
+                offset += len(data)
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        self._index = index
+        return len(index)
+
+    @property
+    def index(self) -> List[Dict]:
+        if self._index is None:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+        return self._index
+
+    def __len__(self):
+        return len(self.index)
+
+    def headers(self) -> List[Tuple[Optional[str], List[str]]]:
+        """(table_id, 表头行) 列表，只读索引"""
+        return [(entry["table_id"], entry["header"]) for entry in self.index]
+
+    def get(self, i: int) -> Dict:
+        entry = self.index[i]
+        with open(self.data_path, "rb") as f:
+            f.seek(entry["offset"])
+            return json.loads(f.read(entry["length"]))
+
+    def __iter__(self) -> Iterator[Dict]:
+        with open(self.data_path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
@@ -0,0 +1,152 @@
+"""
+术语索引：把术语映射（中文术语、英文术语、缩写）编译成 Aho-Corasick 多模式自动机，
+对每个章节的文本只做一次线性扫描，统计各术语的出现次数
+"""
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# 比缩写更短的模式（单个字母、单个汉字）误命中太多，不进入索引
+MIN_TERM_LENGTH = 2
+
+
+def _is_ascii_alnum(char: str) -> bool:
+    return char.isascii() and char.isalnum()
+
+def _fold(text: str) -> str:
+    """
+    逐字符转小写且长度不变，命中下标与原文本一一对应
+    个别字符（如 "İ"）小写后不止一个字符，这些字符保持原样
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class TermIndex:
+    """
+    Aho-Corasick 自动机
+    - 匹配不区分大小写（模式和文本都按 _fold 逐字符转小写，中文不受影响）
+    - 以 ASCII 字母数字开头/结尾的模式要求命中位置两侧不是 ASCII 字母数字，避免 "HMI" 命中 "HMIS"
+    - 每个命中都归到规范术语（term_map 的中文键）下计数
+    """
+
+    def __init__(self, surfaces: Dict[str, str]):
+        """
+        :param surfaces: 术语写法 -> 规范术语
+        """
+        self.patterns: List[str] = []
+        self.canonical: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        seen = set()
+        for surface, canonical in surfaces.items():
+            pattern = _fold(surface.strip())
+            if len(pattern) < MIN_TERM_LENGTH or pattern in seen:
+                continue
+            seen.add(pattern)
+            self._insert(pattern, len(self.patterns))
+            self.patterns.append(pattern)
+            self.canonical.append(canonical)
+        self._build_failure_links()
+
+    @classmethod
+    def from_term_map(cls, term_map: Dict[str, Dict[str, str]]) -> "TermIndex":
+        """
+        由 extract_terms_with_abbr_from_terms_section / extract_abbr_terms_from_symbols_section 的结果构建，
+        中文术语、英文术语和缩写都指向中文术语；同一写法对应多个术语时保留先出现的
+        """
+        surfaces = {}
+        for cn, info in term_map.items():
+            cn = cn.strip()
+            for surface in (cn, info.get("en", ""), info.get("abbr", "")):
+                if surface and surface.strip() not in surfaces:
+                    surfaces[surface.strip()] = cn
+        return cls(surfaces)
+
+    def __len__(self):
+        return len(self.patterns)
+
+    # ---------------- 构建 ----------------
+
+    def _insert(self, pattern: str, index: int) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = next_state
+        self._out[state] = self._out[state] + (index,)
+
+    def _build_failure_links(self) -> None:
+        """按层次遍历补全失败指针，并把失败链上的输出合并到每个状态，匹配时无需再沿失败链收集"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    # ---------------- 匹配 ----------------
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """
+        线性扫描一遍文本，产出 (起始下标, 模式下标)；下标基于原文本
+        """
+        if not self.patterns or not text:
+            return
+        text = _fold(text)
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        patterns = self.patterns
+        text_len = len(text)
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in out[state]:
+                pattern = patterns[index]
+                start = i - len(pattern) + 1
+                if _is_ascii_alnum(pattern[0]) and start > 0 and _is_ascii_alnum(text[start - 1]):
+                    continue
+                if _is_ascii_alnum(pattern[-1]) and i + 1 < text_len and _is_ascii_alnum(text[i + 1]):
+                    continue
+                yield start, index
+
+    def count_terms(self, text: str) -> Dict[str, int]:
+        """统计文本中各规范术语的出现次数，按首次出现的顺序排列"""
+        counts = {}
+        for _, index in self.iter_matches(text):
+            canonical = self.canonical[index]
+            counts[canonical] = counts.get(canonical, 0) + 1
+        return counts
+
+    def annotate(self, nodes: Iterable, key: str = "term_hits") -> int:
+        """
+        为 ChapterNode 及其全部后代写入术语命中 {规范术语: 次数}，扫描标题和正文，没有命中的章节不写入
+        :return: 有命中的章节数
+        """
+        annotated = 0
+        for root in nodes:
+            for node in root.iter_subtree():
+                hits = self.count_terms(f"{node.chapter_title}\n{node.raw_text}")
+                if not hits:
+                    continue
+                if node.extra is None:
+                    node.extra = {}
+                node.extra[key] = hits
+                annotated += 1
+        return annotated
@@ -2,8 +2,16 @@ import fitz  # PyMuPDF
 import re
 import json
 import os
-from typing import List, Dict, Tuple
-from collections import defaultdict
+import hashlib
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Tuple, NamedTuple, Optional
+from collections import defaultdict, deque
+from chapter_id import ChapterId
+from chapter_node import ChapterNode, document_tree_to_dicts
+from term_index import TermIndex
+from table_store import TableStore, stitch_tables, link_tables_to_chapters
+from chapter_rules import LINE_RULES, CHAIN_RULES, set_rule_timing, dump_rule_stats
+from text_quality import GARBLED_RATIO, garbled_ratio
 
 # chapter_patterns = [
 #     re.compile(r'^(附\s*录\s*[A-Z])\s+(.+)$'),
@@ -42,43 +50,58 @@ chapter_patterns = [
     re.compile(r'^(\d+(?:[.\-]\d+)*[.\-]?)\s+(.+)$'),
 ]
 
+_CJK_CHAR_RE = re.compile(r'[\u4e00-\u9fff]')
+_APPENDIX_CN_ID_RE = re.compile(r'^(附\s*录\s*[A-Z0-9])$')
+
+class TextProfile(NamedTuple):
+    """文档正文的语言统计"""
+    language: str       # 'zh' 或 'en'
+    cjk_ratio: float    # 采样行中中文字符占全部字符的比例
+    cjk_chars: int
+    total_chars: int
+
+def profile_document_text(lines: List[str]) -> TextProfile:
+    """
+    一次遍历采样行得到文档语言和中文字符比例，字符统计交给正则和 len 在 C 层完成
+    """
+    # 采样前1000行或全部行
+    sample_text = "".join(lines[:1000])
+    total_chars = len(sample_text)
+    cjk_chars = len(_CJK_CHAR_RE.findall(sample_text))
+    # 只要有中文字符就认为是中文文档
+    language = 'zh' if cjk_chars > 0 else 'en'
+    return TextProfile(language, cjk_chars / total_chars if total_chars else 0.0, cjk_chars, total_chars)
+
 def detect_document_language(lines: List[str]) -> str:
     """
     检测文档语言：中文或英文
     :param lines: 文档的所有行
     :return: 'zh' 表示中文，'en' 表示英文
     """
-    chinese_char_count = 0
-    total_chars = 0
-    
-    # 采样前1000行或全部行
-    sample_lines = lines[:1000] if len(lines) > 1000 else lines
-    
-    for line in sample_lines:
-        for char in line:
-            total_chars += 1
-            if '\u4e00' <= char <= '\u9fff':  # 中文字符
-                chinese_char_count += 1
-    
-    # 只要有中文字符就认为是中文文档
-    if chinese_char_count > 0:
-        return 'zh'
-    else:
-        return 'en'
+    return profile_document_text(lines).language
 
-# 中文章节max_chapter_num=50
-# 全文首先检测是中文还是英文
-def detect_chapter(line: str, max_chapter_num=1000, language='en', number_analysis=None):
+class ChapterMatch(NamedTuple):
+    """单行的章节匹配结果，每行只计算一次，供两轮章节提取和段落合并复用"""
+    chapter_id: str
+    chapter_title: str
+    pattern_index: int          # 命中的 chapter_patterns 下标
+    first_num: Optional[int]    # 章节编号的首个数字，用于数字范围判断
+
+def match_chapter_line(line: str) -> Optional[ChapterMatch]:
+    """
+    对单行做章节模式匹配和内容特征过滤，不做数字范围判断
+    数字范围判断见 is_chapter_number_in_range，两者组合即 detect_chapter
+    """
     clean_line = line.strip()
     if not clean_line:
         return None
 
-    for pattern in chapter_patterns:
+    for pattern_index, pattern in enumerate(chapter_patterns):
         m = pattern.match(clean_line)
         if m:
             chapter_id = m.group(1).strip()
             chapter_title = m.group(len(m.groups())).strip() if m.group(len(m.groups())) else ""
-            if re.match(r'^(附\s*录\s*[A-Z0-9])$', chapter_id):
+            if _APPENDIX_CN_ID_RE.match(chapter_id):
                 # 去掉中间的空格
                 chapter_id = chapter_id.replace(" ", "")
                 # chapter_id = chapter_id[-1]
@@ -89,86 +112,75 @@ def detect_chapter(line: str, max_chapter_num=1000, language='en', number_analys
                 if suffix.isdigit():
                     first_num = int(suffix)
             else:
-                m_num = re.match(r'^(\d+)', chapter_id)
+                m_num = _LEADING_NUMBER_RE.match(chapter_id)
                 if m_num:
                     first_num = int(m_num.group(1))
 
-            if first_num is not None and number_analysis is not None:
-                # 使用智能数字范围判断
-                min_reasonable = number_analysis.get("min_reasonable", 1)
-                max_reasonable = number_analysis.get("max_reasonable", max_chapter_num)
-                
-                # 特殊处理法规编号模式
-                if number_analysis.get("regulation_mode", False):
-                    regulation_number = number_analysis.get("regulation_number")
-                    if first_num != regulation_number:
-                        return None  # 不是法规编号，过滤掉
-                else:
-                    # 正常章节编号范围检查
-                    if first_num < min_reasonable or first_num > max_reasonable:
-                        return None  # 数字范围不合理
-            elif first_num is not None:
-                # 兜底逻辑：使用传统的max_chapter_num
-                if first_num < 1 or first_num > max_chapter_num:
-                    return None  # 数字范围不合理
-
             # ---- 内容特征过滤 ----
-            # 1) 标题必须包含字母或中文
-            if not re.search(r'[A-Za-z\u4e00-\u9fff]', chapter_title):
+            # 标题无字母、纯数字行、表格数据、坐标行、行太短等，规则见 chapter_rules.LINE_RULES
+            if LINE_RULES.first_rejection(chapter_id, chapter_title, clean_line):
                 return None
 
-            # 2) 去掉纯数字表格行
-            if re.fullmatch(r'[\d\s\.\-]+', chapter_title):
-                return None
+            return ChapterMatch(chapter_id, chapter_title, pattern_index, first_num)
 
-            # 3) 表格内容过滤 - 检测明显的表格数据模式
-            # 如果标题包含大量数字、空格和少量字母的组合，可能是表格数据
-            if re.search(r'^\d+\s+\d+.*[A-Z]\s+\d+\s+\d+', chapter_title):  # 如 "10 0 E 0 16"
-                return None
-            
-            # 检测表格行模式：单个字母 + 数字组合
-            if re.fullmatch(r'[A-Z]\s*\d+.*', chapter_title) and len(chapter_title.split()) >= 3:
-                # 如果标题是 "A 10 0" 这样的格式，很可能是表格数据
-                parts = chapter_title.split()
-                if len(parts) >= 3 and all(part.isdigit() or part in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ' for part in parts[:3]):
-                    return None
-
-            # 4) 检测坐标点或参数表格：如 "A15 0 E 0 3"
-            if re.search(r'^[A-Z]\d+\s+\d+\s+[A-Z]\s+\d+\s+\d+', chapter_title):
-                return None
+    return None
 
-            # 5) 行太短
-            if len(clean_line) < 4 and not chapter_id.upper().startswith("APPENDIX") and not chapter_id.startswith("附录"):
-                return None
+def is_chapter_number_in_range(first_num: Optional[int], max_chapter_num=1000, number_analysis=None) -> bool:
+    """
+    章节编号首数字的范围判断（detect_chapter 的基础过滤部分）
+    """
+    if first_num is None:
+        return True
 
-            # 6) 过滤明显的表格标题组合
-            if len(chapter_id) == 1 and chapter_id.isupper():
-                # 单个大写字母作为章节ID，检查标题是否像表格数据
-                if re.search(r'\d+.*\d+', chapter_title) and len(chapter_title.split()) <= 6:
-                    return None
+    if number_analysis is not None:
+        # 使用智能数字范围判断
+        min_reasonable = number_analysis.get("min_reasonable", 1)
+        max_reasonable = number_analysis.get("max_reasonable", max_chapter_num)
 
-            return {
-                "chapter_id": chapter_id,
-                "chapter_title": chapter_title
-            }
+        # 特殊处理法规编号模式
+        if number_analysis.get("regulation_mode", False):
+            # 不是法规编号，过滤掉
+            return first_num == number_analysis.get("regulation_number")
+        # 正常章节编号范围检查
+        return min_reasonable <= first_num <= max_reasonable
 
-    return None
+    # 兜底逻辑：使用传统的max_chapter_num
+    return 1 <= first_num <= max_chapter_num
 
-def build_tree(chapter_list: List[Dict]) -> List[Dict]:
+# 中文章节max_chapter_num=50
+# 全文首先检测是中文还是英文
+def detect_chapter(line: str, max_chapter_num=1000, language='en', number_analysis=None):
+    chapter_match = match_chapter_line(line)
+    if chapter_match is None:
+        return None
+    if not is_chapter_number_in_range(chapter_match.first_num, max_chapter_num, number_analysis):
+        return None  # 数字范围不合理
+    return {
+        "chapter_id": chapter_match.chapter_id,
+        "chapter_title": chapter_match.chapter_title
+    }
+
+def build_tree(chapter_list: List[Dict]) -> List[ChapterNode]:
+    """
+    按章节编号层级直接建出 ChapterNode 树，点和横线分隔的编号（1.2.3 / 1-2-3-）按同样规则处理
+    所有父子查找都通过编号索引完成，不做列表成员扫描；传入的章节 dict 不被修改
+    :return: 根节点列表，full_path 由父链按需拼出
+    """
     id_map = {}
     root = []
 
+    chapter_ids = [ChapterId.parse(chap["chapter_id"]) for chap in chapter_list]
+    nodes = [ChapterNode.from_chapter(chap) for chap in chapter_list]
+
     # 先注册所有节点
-    for chap in chapter_list:
-        chap["children"] = []
-        # 统一去掉末尾点和横线作为 key
-        key = chap["chapter_id"].rstrip('.-')
-        id_map[key] = chap
-
-    # 为每个节点创建缺失的父节点（只针对三级及以上标题）
-    for chap in chapter_list:
-        cid = chap["chapter_id"].rstrip('.')
-        parts = cid.split('.')
+    for node, cid in zip(nodes, chapter_ids):
+        # 统一去掉末尾点和横线、分隔符统一为点作为 key
+        id_map[cid.key] = node
+
+    # 为每个节点创建缺失的父节点（只针对三级及以上标题），按创建顺序记录
+    created_parents = []
+    for cid in chapter_ids:
+        parts = cid.path
         
         # 只有三级及以上标题才创建中间父节点
         if len(parts) >= 3:
@@ -176,79 +188,46 @@ def build_tree(chapter_list: List[Dict]) -> List[Dict]:
             for i in range(2, len(parts)):  # 从第二级开始创建，跳过顶级
                 parent_key = '.'.join(parts[:i])
                 if parent_key not in id_map:
-                    # 创建缺失的父节点
-                    parent_node = {
-                        "chapter_id": parent_key + ".",
-                        "chapter_title": "",
-                        "raw_text": "",
-                        "children": []
-                    }
+                    # 创建缺失的父节点，编号沿用子节点的分隔符
+                    parent_node = ChapterNode(cid.separator.join(parts[:i]) + cid.separator)
                     id_map[parent_key] = parent_node
+                    created_parents.append((parent_node, parts[:i]))
 
     # 构建树结构
-    for chap in chapter_list:
-        cid = chap["chapter_id"].rstrip('.')
-        parts = cid.split('.')
+    for node, cid in zip(nodes, chapter_ids):
+        parts = cid.path
 
         # 根节点判断
-        if cid.startswith("APPENDIX"):
-            root.append(chap)
-        elif cid.startswith("附录") or len(parts) == 1:
-            root.append(chap)
+        if cid.text.startswith("APPENDIX"):
+            root.append(node)
+        elif cid.text.startswith("附录") or len(parts) == 1:
+            root.append(node)
         else:
             parent_key = '.'.join(parts[:-1])
             parent = id_map.get(parent_key)
             if parent:
-                parent["children"].append(chap)
+                parent.add_child(node)
             else:
                 # 如果父节点不存在，对于二级标题，直接作为根节点
                 if len(parts) == 2:
-                    root.append(chap)
+                    root.append(node)
                 # 三级及以上标题没有父节点时，不做处理（因为前面已经创建了父节点）
 
-
-    # 将创建的中间节点也添加到最终的章节列表中，但只有那些有子节点的
-    created_parents = []
-    for key, node in id_map.items():
-        if node not in chapter_list and len(node["children"]) > 0:
-            created_parents.append(node)
-    
-    # 对创建的父节点也进行树结构构建
-    for parent in created_parents:
-        cid = parent["chapter_id"].rstrip('.')
-        parts = cid.split('.')
-        
-        if len(parts) == 1:
-            root.append(parent)
-        else:
-            parent_key = '.'.join(parts[:-1])
-            grandparent = id_map.get(parent_key)
-            if grandparent and parent not in grandparent["children"]:
-                grandparent["children"].append(parent)
-            elif len(parts) == 1:  # 这是一级章节
-                if parent not in root:
-                    root.append(parent)
+    # 将创建的中间节点也挂到树上，但只有那些此时已有子节点的
+    # 创建的节点只会挂到祖父节点下一次，不需要再检查是否已存在
+    created_parents = [(node, parts) for node, parts in created_parents if node.children]
+    for parent, parts in created_parents:
+        grandparent = id_map.get('.'.join(parts[:-1]))
+        if grandparent:
+            grandparent.add_child(parent)
     
     return root
 
-def build_full_path(chapters: List[Dict], path_prefix=""):
-    for chap in chapters:
-        if path_prefix:
-            chap["full_path"] = f"{path_prefix}/{chap['chapter_id']} {chap['chapter_title']}"
-        else:
-            chap["full_path"] = f"{chap['chapter_id']} {chap['chapter_title']}"
-        if chap.get("children"):
-            build_full_path(chap["children"], chap["full_path"])
+# 全角字符（U+FF01-U+FF5E）到半角的映射表
+_FULLWIDTH_TO_HALFWIDTH = {code: code - 0xFEE0 for code in range(0xFF01, 0xFF5F)}
 
 def fullwidth_to_halfwidth(text: str) -> str:
-    result = []
-    for char in text:
-        code = ord(char)
-        if 0xFF01 <= code <= 0xFF5E:
-            result.append(chr(code - 0xFEE0))
-        else:
-            result.append(char)
-    return ''.join(result)
+    return text.translate(_FULLWIDTH_TO_HALFWIDTH)
 
 def build_term_dict(raw_text: str) -> Dict[str, str]:
     text = re.sub(r'\n+', '\n', raw_text.strip())
@@ -355,16 +334,41 @@ def should_merge_crossline(prev_text, curr_text, prev_bbox, curr_bbox):
 
     return False
 
-def fix_broken_chapters(lines: list[str]) -> list[str]:
-    def normalize_chapter_spaces(s: str) -> str:
-        line = s.strip()
-        
+# 章节编号修复用到的正则，全部预编译；顺序与 normalize_chapter_spaces 中的应用顺序一致
+_DOT_SPACE_RE = re.compile(r'\s\.|\.\s')                     # 点的前后有空白，步骤1-3才可能生效
+_OCR_FIX_GATE_RE = re.compile(r'\.\s*l|\.[OI]|^l\.')           # 步骤4-6可能生效的合并判定
+_SPACE_AFTER_DOT_RE = re.compile(r'\.\s+(?=\d)')
+_SPACE_BEFORE_DOT_RE = re.compile(r'([A-Za-z0-9]+)\s+(\.\d+)')
+_SPACED_DOT_RE = re.compile(r'([A-Za-z0-9]+)\s*\.\s*(\d+)')
+_OCR_FIXES = [
+    # 4. 修复OCR常见错误：数字开头的章节
+    (re.compile(r'(\d+\.\d+)\.\s*l\b'), r'\1.1'),
+    (re.compile(r'([A-Za-z0-9]+)\.l\.(\d+)'), r'\1.1.\2'),
+    (re.compile(r'^l\.(\d+)'), r'1.\1'),
+    # 5. 修复字母开头章节的OCR错误：B.l -> B.1, A.O -> A.0, C.I -> C.1
+    (re.compile(r'^([A-Z])\.l\b'), r'\1.1'),
+    (re.compile(r'^([A-Z])\.l\.(\d+)'), r'\1.1.\2'),
+    (re.compile(r'^([A-Z])\.O\.(\d+)'), r'\1.0.\2'),
+    (re.compile(r'^([A-Z])\.I\.(\d+)'), r'\1.1.\2'),
+    # 6. 修复其他OCR错误：O -> 0, I -> 1
+    (re.compile(r'([A-Za-z0-9]+)\.O\.(\d+)'), r'\1.0.\2'),
+    (re.compile(r'([A-Za-z0-9]+)\.I\.(\d+)'), r'\1.1.\2'),
+]
+
+def normalize_chapter_spaces(s: str) -> str:
+    line = s.strip()
+
+    # 所有修复规则都包含点号，没有点的行（绝大多数正文）直接返回
+    if '.' not in line:
+        return line
+
+    if _DOT_SPACE_RE.search(line):
         # 1. 保留原来的逻辑：修复点后面的空格，适用于所有情况 (A. 1, 7. 1)
-        line = re.sub(r'\.\s+(?=\d)', '.', line)
-        
+        line = _SPACE_AFTER_DOT_RE.sub('.', line)
+
         # 2. 修复数字/字母和点之间的空格：7 .1 -> 7.1, A .1 -> A.1
-        line = re.sub(r'([A-Za-z0-9]+)\s+(\.\d+)', r'\1\2', line)
-        
+        line = _SPACE_BEFORE_DOT_RE.sub(r'\1\2', line)
+
         # 3. 修复复杂的多级空格：7 . 1 . 2 -> 7.1.2
         # 需要循环处理，直到没有更多变化
         max_iterations = 10  # 防止无限循环
@@ -373,26 +377,17 @@ def fix_broken_chapters(lines: list[str]) -> list[str]:
         while prev_line != line and iterations < max_iterations:
             prev_line = line
             # 处理各种空格组合，支持字母和数字开头
-            line = re.sub(r'([A-Za-z0-9]+)\s*\.\s*(\d+)', r'\1.\2', line)
+            line = _SPACED_DOT_RE.sub(r'\1.\2', line)
             iterations += 1
-        
-        # 4. 修复OCR常见错误：数字开头的章节
-        line = re.sub(r'(\d+\.\d+)\.\s*l\b', r'\1.1', line)
-        line = re.sub(r'([A-Za-z0-9]+)\.l\.(\d+)', r'\1.1.\2', line)
-        line = re.sub(r'^l\.(\d+)', r'1.\1', line)
-        
-        # 5. 修复字母开头章节的OCR错误：B.l -> B.1, A.O -> A.0, C.I -> C.1
-        line = re.sub(r'^([A-Z])\.l\b', r'\1.1', line)
-        line = re.sub(r'^([A-Z])\.l\.(\d+)', r'\1.1.\2', line)
-        line = re.sub(r'^([A-Z])\.O\.(\d+)', r'\1.0.\2', line)
-        line = re.sub(r'^([A-Z])\.I\.(\d+)', r'\1.1.\2', line)
-        
-        # 6. 修复其他OCR错误：O -> 0, I -> 1
-        line = re.sub(r'([A-Za-z0-9]+)\.O\.(\d+)', r'\1.0.\2', line)
-        line = re.sub(r'([A-Za-z0-9]+)\.I\.(\d+)', r'\1.1.\2', line)
-        
-        return line
 
+    # 4-6. OCR 错误修复，先用一个合并正则判断是否可能命中
+    if _OCR_FIX_GATE_RE.search(line):
+        for pattern, repl in _OCR_FIXES:
+            line = pattern.sub(repl, line)
+
+    return line
+
+def fix_broken_chapters(lines: list[str]) -> list[str]:
     lines = [normalize_chapter_spaces(line) for line in lines]
 
     return lines
@@ -402,192 +397,556 @@ def process_gb_terms_format(lines: List[str]) -> List[str]:
     处理国标术语定义格式：
     将 "3.1" (下一行) "中文术语 英文术语" 合并为 "3.1 中文术语 英文术语"
     """
-    result = []
-    i = 0
-    
-    while i < len(lines):
-        current_line = lines[i].strip()
-        
+    return list(iter_gb_terms_format(lines))
+
+def iter_gb_terms_format(lines, consumed_out=None):
+    """
+    process_gb_terms_format 的惰性版本：最多向后看两行，逐行产出结果
+    :param consumed_out: 非 None 时为每个产出行记录其合并了多少个输入行，用于换算行号
+    """
+    source = iter(lines)
+    window = deque()
+
+    while True:
+        # 保持窗口内有当前行及其后两行
+        while len(window) < 3:
+            try:
+                window.append(next(source))
+            except StopIteration:
+                break
+        if not window:
+            return
+
+        current_line = window[0].strip()
+
         # 检测是否是术语定义编号：纯数字.数字格式，且下一行包含中文+英文，或者第二行是中文，第三行是英文
-        if (i + 1 < len(lines) and 
+        if (len(window) >= 2 and
             re.match(r'^\d+\.\d+$', current_line) and
             current_line.startswith('3.')):  # 通常术语章节是第3章
-            
-            next_line = lines[i + 1].strip()
-            
+
+            next_line = window[1].strip()
+
             # 检查下一行是否符合: 中文 + 空格 + 英文 的模式
             if re.search(r'[\u4e00-\u9fa5].*[A-Za-z]', next_line):
                 # 合并成标题格式
-                merged_line = f"{current_line} {next_line}"
-                result.append(merged_line)
-                i += 2  # 跳过下一行
+                if consumed_out is not None:
+                    consumed_out.append(2)
+                yield f"{current_line} {next_line}"
+                window.popleft()
+                window.popleft()  # 跳过下一行
                 continue
 
             # 检查第二行是否是中文，第三行是否是英文
-            if (i + 2 < len(lines) and
-                re.search(r'[\u4e00-\u9fa5]', lines[i + 1].strip()) and
-                re.search(r'[A-Za-z]', lines[i + 2].strip())):
-                merged_line = f"{current_line} {lines[i + 1].strip()} {lines[i + 2].strip()}"
-                result.append(merged_line)
-                i += 3  # 跳过后两行
+            if (len(window) >= 3 and
+                re.search(r'[\u4e00-\u9fa5]', window[1].strip()) and
+                re.search(r'[A-Za-z]', window[2].strip())):
+                if consumed_out is not None:
+                    consumed_out.append(3)
+                yield f"{current_line} {window[1].strip()} {window[2].strip()}"
+                window.clear()  # 跳过后两行
                 continue
 
-        result.append(current_line)
-        i += 1
-    
-    return result
+        if consumed_out is not None:
+            consumed_out.append(1)
+        yield current_line
+        window.popleft()
 
-def extract_full_text_with_filter(pdf_path: str, top_crop=0.08, bottom_crop=0.08):
-    doc = fitz.open(pdf_path)
-    all_lines = []
+def _extract_page_raw_lines(page_dict) -> List[Tuple[str, tuple]]:
+    """
+    解析单页文本：按x坐标合并同一行的span，返回 [(行文本, 行bbox), ...]
+    跨行合并不在这里做，由调用方按页顺序统一处理，保证页边界行为一致
+    """
+    page_lines = []
 
-    prev_line_text = None
-    prev_bbox = None
+    for block in page_dict["blocks"]:
+        if block["type"] != 0:  # 只处理文本
+            continue
 
+        for line in block["lines"]:
+            # 按x坐标合并同一行的span
+            spans = sorted(line["spans"], key=lambda s: s["bbox"][0])
+            merged = ""
+            last_x = None
+            for sp in spans:
+                x0, x1 = sp["bbox"][0], sp["bbox"][2]
+                width = max(1.0, x1 - x0)
+                avg_char_w = width / max(len(sp["text"]), 1)
 
+                if last_x is not None:
+                    gap = x0 - last_x
+                    if gap > max(avg_char_w * 0.5, 3.0):
+                        merged += " "
+                merged += sp["text"]
+                last_x = x1
 
-    for page in doc:
+            page_lines.append((merged.strip(), tuple(line["bbox"])))
 
-        h = page.rect.height
-        clip_rect = fitz.Rect(0, h * top_crop, page.rect.width, h * (1 - bottom_crop))
-        page_dict = page.get_text("dict", clip=clip_rect)
+    return page_lines
 
-        for block in page_dict["blocks"]:
-            if block["type"] != 0:  # 只处理文本
-                continue
+# 文本层把"表A.1 标题"拆成"表A."和"1 标题"两行时，前一行只剩标题前缀
+_TABLE_TITLE_PREFIX_RE = re.compile(r'^(?:表|Table)\s*(?:[A-Z]\s*\.)?$')
 
-            for line in block["lines"]:
-                # 1. 按x坐标合并同一行的span
-                spans = sorted(line["spans"], key=lambda s: s["bbox"][0])
-                merged = ""
-                last_x = None
-                for sp in spans:
-                    x0, x1 = sp["bbox"][0], sp["bbox"][2]
-                    width = max(1.0, x1 - x0)
-                    avg_char_w = width / max(len(sp["text"]), 1)
-
-                    if last_x is not None:
-                        gap = x0 - last_x
-                        if gap > max(avg_char_w * 0.5, 3.0):
-                            merged += " "
-                    merged += sp["text"]
-                    last_x = x1
-
-                merged = merged.strip()
-                curr_bbox = line["bbox"]
-
-                # 2. 跨行智能合并判定
-                if prev_line_text is not None:
-                    if should_merge_crossline(prev_line_text, merged, prev_bbox, curr_bbox):
-                        prev_line_text += " " + merged
-                        prev_bbox = (
-                            prev_bbox[0],
-                            prev_bbox[1],
-                            max(prev_bbox[2], curr_bbox[2]),
-                            max(prev_bbox[3], curr_bbox[3])
-                        )
-                        continue
-                    else:
-                        all_lines.append(prev_line_text)
+def _join_table_title_number(page_lines: List[Tuple[str, tuple]], text: str, bbox) -> str:
+    """
+    标题行只有"表X."前缀时，接上同一行右侧以数字开头的编号部分（两行纵向有重叠即视为同一行，
+    文本层给出的两段 bbox 横向可能互相重叠，只要求起点在前缀起点右侧）
+    """
+    if not _TABLE_TITLE_PREFIX_RE.match(text.strip()):
+        return text
+    best = None
+    for other_text, other_bbox in page_lines:
+        if other_bbox[0] <= bbox[0] or not other_text[:1].isdigit():
+            continue
+        if min(bbox[3], other_bbox[3]) - max(bbox[1], other_bbox[1]) <= 0:
+            continue
+        if best is None or other_bbox[0] < best[1][0]:
+            best = (other_text, other_bbox)
+    return text.strip() + best[0] if best else text
+
+def _find_table_title_in_lines(page_lines: List[Tuple[str, tuple]], table_bbox, max_above=60) -> str:
+    """
+    在同一页已解析的文本行中，找表格上方 max_above pt 内最近的包含 "表"/"Table" 的行作为标题
+    """
+    table_top = table_bbox[1]
+    best_line = None
+    min_gap = float('inf')
+    for text, bbox in page_lines:
+        if "表" not in text and "Table" not in text:
+            continue
+        gap = table_top - bbox[1]
+        if 0 < gap < max_above and gap < min_gap:
+            min_gap = gap
+            best_line = _join_table_title_number(page_lines, text, bbox)
+    if best_line:
+        best_line = re.sub(r'\s+', ' ', best_line).strip()
+    return best_line
+
+# 表格预筛：横线/竖线的最短长度（pt），与 pdfplumber 的 edge_min_length 默认值一致
+_RULING_MIN_LENGTH = 3
+
+def page_has_ruling_lines(page) -> bool:
+    """
+    表格预筛：fitz 页面的矢量图形中同时有横向和竖向的框线时才可能识别出表格（默认按框线识别）
+    纯文本页、只有页眉/页脚横线的页面直接跳过 find_tables；曲线、四边形无法快速判断方向，保守地视为有框线
+    """
+    has_horizontal = has_vertical = False
+    for drawing in page.get_drawings():
+        for item in drawing["items"]:
+            kind = item[0]
+            if kind == "l":
+                p1, p2 = item[1], item[2]
+                dx, dy = abs(p1.x - p2.x), abs(p1.y - p2.y)
+                if dy <= 1 and dx >= _RULING_MIN_LENGTH:
+                    has_horizontal = True
+                elif dx <= 1 and dy >= _RULING_MIN_LENGTH:
+                    has_vertical = True
+            elif kind == "re":
+                # 高度或宽度接近 0 的矩形是画成矩形的横线/竖线
+                rect = item[1]
+                if rect.width >= _RULING_MIN_LENGTH:
+                    has_horizontal = True
+                if rect.height >= _RULING_MIN_LENGTH:
+                    has_vertical = True
+            else:
+                return True
+            if has_horizontal and has_vertical:
+                return True
+    return False
 
-                prev_line_text = merged
-                prev_bbox = curr_bbox
+# 裁剪区上下边缘这一高度比例（页高）内的行视为页眉页脚（如 "GB45672—2025"），不作为表格上方的正文行
+RUNNING_BAND_RATIO = 0.025
 
-    # 最后一行
-    if prev_line_text:
-        all_lines.append(prev_line_text)
+def _in_running_band(bbox, clip_rect, page_height) -> bool:
+    band = page_height * RUNNING_BAND_RATIO
+    return bbox[3] <= clip_rect.y0 + band or bbox[1] >= clip_rect.y1 - band
 
-    # 进行全角字符转半角字符
-    all_lines = [fullwidth_to_halfwidth(line.strip()) for line in all_lines]
+def _nearest_line_above(page_lines: List[Tuple[str, tuple]], table_top, regions, clip_rect, page_height):
+    """
+    表格上方最近的正文行：bbox 底边不超过表格顶边、且底边最靠下的行
+    按几何位置而不是文本流顺序选取（fitz 常把页眉排在一页文本流的最后）；跳过页眉页脚和落在表格内的行
+    :return: 该行的 bbox，没有时返回 None
+    """
+    best = None
+    for _, bbox in page_lines:
+        if bbox[3] > table_top + 1 or _in_running_band(bbox, clip_rect, page_height):
+            continue
+        if any(_bbox_center_in(bbox, region) for region in regions):
+            continue
+        if best is None or bbox[3] > best[3]:
+            best = bbox
+    return best
 
-    # 进行章节编号修复
-    normalized = fix_broken_chapters(all_lines)
-    
-    # 🆕 国标术语定义格式处理
-    normalized = process_gb_terms_format(normalized)
+def _extract_page_tables(page, clip_rect, page_lines: List[Tuple[str, tuple]], page_num: int) -> List[Dict]:
+    """
+    用 fitz 的表格识别提取当前页表格，标题从同页文本行中查找
+    返回格式与 extract_tables_from_pdf 一致，另附 page、bbox、above_bbox（表格上方最近一行正文的 bbox，
+    没有时为 None）和 at_page_top（above_bbox 为 None），后两项只用于定位和跨页拼接，拼接后不保留
+    """
+    page_tables = []
+    if not page_has_ruling_lines(page):
+        return page_tables
+    tables = sorted(page.find_tables(clip=clip_rect).tables, key=lambda t: t.bbox[1])
+
+    for table_idx, table in enumerate(tables):
+        # 过滤：只有 1 列的直接丢弃
+        table_data = table.extract()
+        if not table_data:
+            continue
+        if len(table_data[0]) <= 1:
+            continue
+
+        cleaned_data = [
+            [cell.replace('\n', ' ').strip() if cell else "" for cell in row]
+            for row in table_data
+        ]
+
+        best_line = _find_table_title_in_lines(page_lines, table.bbox)
+
+        # 兜底：检查表格第一行的单元格里是否有“表X”样式
+        if best_line is None:
+            joined_first = " ".join(cleaned_data[0]).strip()
+            if re.search(r'表\s*[A-Z0-9]\.?\d*', joined_first) or joined_first.startswith('表'):
+                best_line = joined_first
+
+        if best_line:
+            table_id = re.sub(r'表\s+([A-Za-z0-9])', r'表\1', best_line)
+        else:
+            table_id = f"表-页{page_num + 1}-表{table_idx + 1}"
+
+        page_tables.append({
+            "table_id": table_id,
+            "table_content": cleaned_data,
+            "page": page_num + 1,
+            "bbox": [round(v, 2) for v in table.bbox],
+        })
+
+    regions = [t["bbox"] for t in page_tables]
+    for t in page_tables:
+        t["above_bbox"] = _nearest_line_above(page_lines, t["bbox"][1], regions, clip_rect, page.rect.height)
+        # 上方没有正文行（页眉页脚不算）：可能是上一页表格的续页，供跨页拼接判断
+        t["at_page_top"] = t["above_bbox"] is None
+    return page_tables
+
+def _bbox_center_in(bbox, region) -> bool:
+    cx = (bbox[0] + bbox[2]) / 2
+    cy = (bbox[1] + bbox[3]) / 2
+    return region[0] <= cx <= region[2] and region[1] <= cy <= region[3]
+
+# 下载站和内部文件水印
+_WATERMARK_LINE_RE = re.compile(r'库七七|www\.kqqw\.com|提供下载|上海机动车检测认证技术研究中心有限公司内部文件|下载者：|批准者：')
+
+def classify_page_text(page_lines: List[Tuple[str, tuple]]) -> Optional[str]:
+    """
+    判断一页的文本层能否直接使用
+    :return: None 表示可用；否则返回原因：'empty' 没有文本层，'watermark' 只有水印，'garbled' 乱码
+    """
+    if not page_lines:
+        return 'empty'
+    if all(_WATERMARK_LINE_RE.search(text) for text, _ in page_lines):
+        return 'watermark'
+    if garbled_ratio("".join(text for text, _ in page_lines)) >= GARBLED_RATIO:
+        return 'garbled'
+    return None
+
+_PAGE_TEXT_REASONS = {'empty': '无文本层', 'watermark': '只有水印', 'garbled': '文本层乱码'}
+
+_ocr_unavailable_warned = False
 
-    # 写出文件与返回
-    with open('extracted_full_text.txt', "w", encoding="utf-8") as f:
-        f.write("\n".join(normalized))
+def ocr_available() -> bool:
+    """tesseract 是否可用；不可用时每个进程只提示一次，需要 OCR 的页保留原文本层"""
+    global _ocr_unavailable_warned
+    # OCR 依赖 pytesseract，只在确实需要识别时导入
+    import file_extract_OCR
 
+    available = file_extract_OCR.tesseract_available()
+    if not available and not _ocr_unavailable_warned:
+        _ocr_unavailable_warned = True
+        print("⚠️ 未找到 tesseract，OCR 回退不生效：文本层为空、只有水印或乱码的页将保留原文本层")
+    return available
+
+def _ocr_page_lines(page, clip_rect, reason: str, cache_dir=None) -> Optional[List[Tuple[str, tuple]]]:
+    """
+    对文本层不可用的页做 OCR：识别结果是与 get_text("dict") 相同结构的页面字典，
+    与文本层一样经 _extract_page_raw_lines 按 span 间距拼成行（页眉页脚裁剪区之外的行丢弃）
+    tesseract 不可用或识别失败时返回 None，调用方保留原文本层
+    """
+    # OCR 依赖 pytesseract，只在确实需要识别时导入
+    import file_extract_OCR
+
+    if not file_extract_OCR.tesseract_available():
+        return None
+    try:
+        result = file_extract_OCR.ocr_page(page, cache_dir)
+    except Exception as e:
+        print(f"⚠️ 第 {page.number + 1} 页 OCR 失败，保留文本层: {e}")
+        return None
+    lines = [
+        (text, bbox) for text, bbox in _extract_page_raw_lines(result["page_dict"])
+        if clip_rect.y0 <= (bbox[1] + bbox[3]) / 2 <= clip_rect.y1
+    ]
+    print(f"🔍 第 {page.number + 1} 页{_PAGE_TEXT_REASONS[reason]}，改用 OCR: {len(lines)} 行, "
+          f"dpi={result['dpi']}, 置信度 {result['confidence']}{'（缓存）' if result['cached'] else ''}")
+    return lines
+
+def _scan_page(page, top_crop=0.08, bottom_crop=0.08, with_tables=False, ocr_fallback=False,
+               ocr_cache_dir=None) -> Tuple[List[Tuple[str, tuple]], List[Dict]]:
+    """
+    单次扫描一页：同时得到文本行和表格
+    with_tables=True 时，落在表格区域内的文本行会从正文行中剔除，避免表格单元格被识别成章节
+    ocr_fallback=True 时，文本层为空、只有水印或乱码的页改用 OCR 结果，其余页仍直接读文本层
+    :return: (正文行 [(行文本, 行bbox), ...], 表格列表)
+    """
+    h = page.rect.height
+    clip_rect = fitz.Rect(0, h * top_crop, page.rect.width, h * (1 - bottom_crop))
+    page_dict = page.get_text("dict", clip=clip_rect)
+    page_lines = _extract_page_raw_lines(page_dict)
+
+    if ocr_fallback:
+        reason = classify_page_text(page_lines)
+        if reason is not None:
+            ocr_lines = _ocr_page_lines(page, clip_rect, reason, ocr_cache_dir)
+            if ocr_lines is not None:
+                page_lines = ocr_lines
+
+    if not with_tables:
+        return page_lines, []
+
+    page_tables = _extract_page_tables(page, clip_rect, page_lines, page.number)
+    if page_tables:
+        regions = [t["bbox"] for t in page_tables]
+        page_lines = [
+            (text, bbox) for text, bbox in page_lines
+            if not any(_bbox_center_in(bbox, region) for region in regions)
+        ]
+    return page_lines, page_tables
+
+def _scan_page_range_worker(task: Tuple[str, int, int, float, float, bool, bool, Optional[str]]
+                            ) -> List[Tuple[List[Tuple[str, tuple]], List[Dict]]]:
+    """
+    进程池工作函数：每个进程独立打开文档，扫描 [start, end) 范围内的页
+    :return: 按页顺序排列的 (正文行, 表格) 列表
+    """
+    pdf_path, start, end, top_crop, bottom_crop, with_tables, ocr_fallback, ocr_cache_dir = task
+    doc = fitz.open(pdf_path)
+    try:
+        return [_scan_page(doc[i], top_crop, bottom_crop, with_tables, ocr_fallback, ocr_cache_dir)
+                for i in range(start, end)]
+    finally:
+        doc.close()
+
+def _split_page_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    """
+    把页码切成若干连续区间，区间数为 workers 的数倍，便于进程间负载均衡
+    """
+    chunk_count = min(page_count, workers * 4)
+    if chunk_count <= 0:
+        return []
+    base, extra = divmod(page_count, chunk_count)
+    ranges = []
+    start = 0
+    for i in range(chunk_count):
+        end = start + base + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+def iter_page_scan(pdf_path: str, top_crop=0.08, bottom_crop=0.08, workers=1, with_tables=False,
+                   ocr_fallback=False, ocr_cache_dir=None):
+    """
+    按页顺序产出每页的 (正文行, 表格)，整个文档只打开并遍历一次
+    workers > 1 时按页区间分发到进程池，结果仍按页顺序返回；需要 OCR 的页也在各自的进程中识别
+    :param ocr_fallback: 文本层不可用的页改用 OCR
+    :param ocr_cache_dir: OCR 结果缓存目录，None 表示不缓存
+    """
+    doc = fitz.open(pdf_path)
+    page_count = len(doc)
+
+    if workers is None or workers <= 1 or page_count < 2:
+        try:
+            for page in doc:
+                yield _scan_page(page, top_crop, bottom_crop, with_tables, ocr_fallback, ocr_cache_dir)
+        finally:
+            doc.close()
+        return
+
+    doc.close()
+    from concurrent.futures import ProcessPoolExecutor
+
+    tasks = [(pdf_path, start, end, top_crop, bottom_crop, with_tables, ocr_fallback, ocr_cache_dir)
+             for start, end in _split_page_ranges(page_count, workers)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        # executor.map 保证结果顺序与任务顺序一致
+        for pages in executor.map(_scan_page_range_worker, tasks):
+            for page_result in pages:
+                yield page_result
+
+def extract_full_text_with_filter(pdf_path: str, top_crop=0.08, bottom_crop=0.08, workers=1, debug=False):
+    """
+    提取PDF全文并完成行合并、全角转半角、章节编号修复等预处理
+    :param workers: 解析页面使用的进程数，1 表示单进程顺序解析
+    :param debug: 是否把结果写到 extracted_full_text.txt 便于排查
+    """
+    normalized, _ = extract_text_and_tables(pdf_path, top_crop, bottom_crop, workers, with_tables=False, debug=debug)
     return normalized
 
+def extract_text_and_tables(pdf_path: str, top_crop=0.08, bottom_crop=0.08, workers=1, with_tables=True, debug=False,
+                            page_starts_out=None, ocr_fallback=False, ocr_cache_dir=None):
+    """
+    单次遍历PDF，同时得到预处理后的正文行和表格
+    with_tables=True 时表格区域内的文本不进入正文行
+    :param page_starts_out: 非 None 时填入每页第一行在正文行中的下标（与页码一一对应）
+    :param ocr_fallback: 文本层为空、只有水印或乱码的页改用 OCR，识别结果与文本层行走同样的合并流程
+    :return: (正文行, 表格列表)
+    """
+    if ocr_fallback:
+        ocr_available()
+    all_tables = []
+    normalized = list(_iter_preprocessed_lines(
+        iter_page_scan(pdf_path, top_crop, bottom_crop, workers, with_tables, ocr_fallback, ocr_cache_dir),
+        all_tables, debug, page_starts_out))
+    return normalized, all_tables
+
+def iter_full_text_with_filter(pdf_path: str, top_crop=0.08, bottom_crop=0.08, workers=1, debug=False):
+    """
+    extract_full_text_with_filter 的流式版本：页面边解码边产出预处理后的行，内存占用不随文档增长
+    """
+    return _iter_preprocessed_lines(iter_page_scan(pdf_path, top_crop, bottom_crop, workers), None, debug)
+
+def _iter_preprocessed_lines(page_results, tables_out=None, debug=False, page_starts_out=None):
+    """
+    把逐页扫描结果串成惰性流水线：跨行合并 -> 全角转半角 -> 章节编号修复 -> 国标术语格式处理
+    :param tables_out: 非 None 时收集各页表格，流水线结束后为每张表写入 line（表格上方最近一行的输出行号）
+    :param debug: 是否同时把结果写到 extracted_full_text.txt
+    :param page_starts_out: 非 None 时在流水线结束后填入每页第一行的输出行号
+    """
+    track_lines = page_starts_out is not None or tables_out is not None
+    raw_page_starts = [] if track_lines else None
+    raw_table_lines = [] if tables_out is not None else None
+    lines = _iter_crossline_merged(page_results, tables_out, raw_page_starts, raw_table_lines)
+    # 进行全角字符转半角字符、章节编号修复
+    lines = (normalize_chapter_spaces(fullwidth_to_halfwidth(line.strip())) for line in lines)
+    # 🆕 国标术语定义格式处理
+    consumed = [] if track_lines else None
+    lines = iter_gb_terms_format(lines, consumed)
+    if track_lines:
+        lines = _iter_with_page_starts(lines, raw_page_starts, consumed,
+                                       page_starts_out if page_starts_out is not None else [],
+                                       raw_table_lines, tables_out)
+    if debug:
+        lines = _tee_lines_to_file(lines, 'extracted_full_text.txt')
+    return lines
+
+def _iter_crossline_merged(page_results, tables_out=None, page_starts_out=None, table_lines_out=None):
+    """
+    按页顺序做跨行智能合并，逐行产出
+    :param page_starts_out: 非 None 时记录每页第一行所在的输出行号（跨页合并时为被并入的那一行）
+    :param table_lines_out: 非 None 时按 tables_out 的顺序记录每张表上方最近一行（above_bbox）的输出行号
+                            （本页表格上方没有正文行时为上一页最后一行）
+    """
+    prev_line_text = None
+    prev_bbox = None
+    emitted = 0
+
+    for page_lines, page_tables in page_results:
+        if tables_out is not None:
+            tables_out.extend(page_tables)
+
+        # 未产出的上一行占用 emitted 号，本页第一行默认从下一号开始
+        page_start = emitted if prev_line_text is None else emitted + 1
+        # 本页各行处理完后所在的输出行号（被合并的行与合并目标同号）
+        line_indices = [] if table_lines_out is not None else None
+        before_page = emitted
+        for line_no, (merged, curr_bbox) in enumerate(page_lines):
+            # 跨行智能合并判定
+            if prev_line_text is not None:
+                if should_merge_crossline(prev_line_text, merged, prev_bbox, curr_bbox):
+                    prev_line_text += " " + merged
+                    prev_bbox = (
+                        prev_bbox[0],
+                        prev_bbox[1],
+                        max(prev_bbox[2], curr_bbox[2]),
+                        max(prev_bbox[3], curr_bbox[3])
+                    )
+                    if line_no == 0:
+                        page_start = emitted
+                    if line_indices is not None:
+                        line_indices.append(emitted)
+                    continue
+                else:
+                    yield prev_line_text
+                    emitted += 1
+
+            prev_line_text = merged
+            prev_bbox = curr_bbox
+            if line_indices is not None:
+                line_indices.append(emitted)
+
+        if page_starts_out is not None:
+            page_starts_out.append(page_start)
+        if table_lines_out is not None:
+            for table in page_tables:
+                anchor = table.get("above_bbox")
+                above = [idx for (_, bbox), idx in zip(page_lines, line_indices)
+                         if anchor is not None and list(bbox) == list(anchor)]
+                table_lines_out.append(above[0] if above else before_page)
+
+    # 最后一行
+    if prev_line_text:
+        yield prev_line_text
+
+def _map_raw_line_indices(raw_indices: List[int], consumed: List[int]) -> List[int]:
+    """
+    把跨行合并阶段的行号（升序）换算成国标术语格式处理之后的最终行号
+    :param consumed: iter_gb_terms_format 记录的每个输出行合并的输入行数
+    """
+    mapped = []
+    out_index = 0
+    covered = 0  # out_index 之前的输出行一共覆盖的输入行数
+    for raw_index in raw_indices:
+        while out_index < len(consumed) and covered + consumed[out_index] <= raw_index:
+            covered += consumed[out_index]
+            out_index += 1
+        mapped.append(out_index)
+    return mapped
+
+def _iter_with_page_starts(lines, raw_page_starts, consumed, page_starts_out, raw_table_lines=None, tables=None):
+    """
+    原样产出各行，结束后把跨行合并阶段的每页起始行号换算成最终行号
+    提供 raw_table_lines 时同样换算每张表的行号，写入 tables 中对应表格的 line
+    """
+    yield from lines
+    page_starts_out.extend(_map_raw_line_indices(raw_page_starts, consumed))
+    if raw_table_lines is not None:
+        for table, line in zip(tables, _map_raw_line_indices(raw_table_lines, consumed)):
+            table["line"] = line
+
+def _tee_lines_to_file(lines, path: str):
+    """边产出边写调试文件，文件内容为各行以换行符连接"""
+    with open(path, "w", encoding="utf-8") as f:
+        first = True
+        for line in lines:
+            if not first:
+                f.write("\n")
+            f.write(line)
+            first = False
+            yield line
+
 def detect_chapter_pattern(chapters: List[Dict]) -> str:
     """
     检测文档的章节模式：
     - 'alpha_first': 字母章节在前 (A, A.1, A.2, B, B.1, 1, 2, ...)
     - 'numeric_first': 数字章节在前 (1, 2, ..., A, A.1, A.2, B, B.1, ...)
     """
-    alpha_indices = []
-    numeric_indices = []
-    
-    for i, ch in enumerate(chapters):
-        chapter_id = ch["chapter_id"].strip()
-        if re.match(r'^[A-Z](\.\d+)*\.?$', chapter_id):
-            alpha_indices.append(i)
-        elif re.match(r'^\d+(\.\d+)*\.?$', chapter_id):
-            numeric_indices.append(i)
-    
-    if not alpha_indices or not numeric_indices:
-        return 'numeric_first'  # 默认数字优先
-    
-    # 比较第一个字母章节和第一个数字章节的位置
-    first_alpha = min(alpha_indices)
-    first_numeric = min(numeric_indices)
-    
-    if first_alpha < first_numeric:
-        return 'alpha_first'
-    else:
-        return 'numeric_first'
+    return profile_chapters(chapters).pattern
 
 def parse_chapter_id(chapter_id: str, pattern: str = 'numeric_first') -> List[int]:
     """
     根据文档模式解析章节ID
     :param chapter_id: 章节ID字符串
     :param pattern: 文档模式 ('alpha_first' 或 'numeric_first')
+    新代码请直接使用 ChapterId.parse(chapter_id).sort_key(pattern)，避免重复解析和列表拷贝
     """
-    chapter_id = chapter_id.strip()
-
-    # 字母章节格式 - 支持点和横线分隔符
-    if re.fullmatch(r'[A-Z](?:[.\-]\d+)*[.\-]?', chapter_id):
-        # 统一处理点和横线分隔符
-        normalized = re.sub(r'[.\-]+', '.', chapter_id).rstrip('.')
-        parts = normalized.split('.')
-        letter = parts[0]
-        
-        if pattern == 'alpha_first':
-            # 字母在前模式：A=1, B=2, C=3, ...
-            letter_value = ord(letter) - ord('A') + 1
-        else:
-            # 数字在前模式：字母章节放在数字章节之后
-            # 假设最多有100个数字章节，字母从101开始
-            letter_value = ord(letter) - ord('A') + 101
-        
-        try:
-            rest = [int(p) for p in parts[1:]] if len(parts) > 1 else []
-            return [letter_value] + rest
-        except ValueError:
-            return []
-
-    # 数字章节格式 - 支持点和横线分隔符
-    elif re.fullmatch(r'\d+(?:[.\-]\d+)*[.\-]?', chapter_id):
-        try:
-            # 统一处理点和横线分隔符
-            normalized = re.sub(r'[.\-]+', '.', chapter_id).rstrip('.')
-            parts = normalized.split('.')
-            numeric_parts = [int(p) for p in parts]
-            
-            if pattern == 'alpha_first':
-                # 字母在前模式：数字章节放在字母章节之后
-                # 假设最多有26个字母章节，数字从27开始
-                numeric_parts[0] += 26
-            # 数字在前模式：保持原有数字
-            
-            return numeric_parts
-        except ValueError:
-            return []
-
-    return []
+    return list(ChapterId.parse(chapter_id).sort_key(pattern))
 
 def is_chapter_a_before_b(a: list[int], b: list[int]) -> bool:
     for i in range(min(len(a), len(b))):
@@ -648,35 +1007,39 @@ def analyze_chapter_number_distribution(chapters: List[Dict]) -> Dict[str, int]:
     分析章节编号的数字分布，确定合理的数字范围
     返回: {"min_reasonable": 最小合理数字, "max_reasonable": 最大合理数字, "primary_range": 主要数字范围}
     """
-    first_numbers = []
-    
-    for ch in chapters:
-        chapter_id = ch["chapter_id"].strip()
-        # 提取第一个数字
-        m_num = re.match(r'^(\d+)', chapter_id)
-        if m_num:
-            first_numbers.append(int(m_num.group(1)))
-        # 处理APPENDIX后跟数字的情况
-        elif chapter_id.upper().startswith("APPENDIX"):
-            suffix = chapter_id[len("APPENDIX"):].strip(" ()")
-            if suffix.isdigit():
-                first_numbers.append(int(suffix))
-    
-    if not first_numbers:
+    return profile_chapters(chapters).number_analysis
+
+def _chapter_first_number(chapter_id: str) -> Optional[int]:
+    """章节编号的首个数字（APPENDIX 后跟数字时取该数字），没有则为 None"""
+    # 提取第一个数字
+    m_num = _LEADING_NUMBER_RE.match(chapter_id)
+    if m_num:
+        return int(m_num.group(1))
+    # 处理APPENDIX后跟数字的情况
+    if chapter_id.upper().startswith("APPENDIX"):
+        suffix = chapter_id[len("APPENDIX"):].strip(" ()")
+        if suffix.isdigit():
+            return int(suffix)
+    return None
+
+def number_analysis_from_histogram(first_number_counts: Dict[int, int]) -> Dict[str, int]:
+    """
+    根据章节首数字的直方图确定合理的数字范围，规则见 analyze_chapter_number_distribution
+    """
+    if not first_number_counts:
         return {"min_reasonable": 1, "max_reasonable": 50, "primary_range": (1, 50)}
-    
-    first_numbers.sort()
-    
-    # 分析数字分布模式
-    from collections import Counter
-    counter = Counter(first_numbers)
-    
+
+    # 升序排列的不同数字
+    distinct_numbers = sorted(first_number_counts)
+    total = sum(first_number_counts.values())
+
     # 如果大多数章节都是同一个数字开头（如60.1, 60.2, 60.3...），这可能是法规编号
-    most_common = counter.most_common(1)[0]
-    most_common_num, most_common_count = most_common
+    # 出现次数相同时取较小的数字
+    most_common_count = max(first_number_counts.values())
+    most_common_num = next(num for num in distinct_numbers if first_number_counts[num] == most_common_count)
     
     # 如果某个数字出现次数超过总数的60%，且这个数字大于30，可能是法规编号模式
-    if most_common_count > len(first_numbers) * 0.6 and most_common_num > 30:
+    if most_common_count > total * 0.6 and most_common_num > 30:
         print(f"检测到可能的法规编号模式: {most_common_num}.x (出现{most_common_count}次)")
         # 在这种情况下，允许这个特定的法规编号
         return {
@@ -688,8 +1051,8 @@ def analyze_chapter_number_distribution(chapters: List[Dict]) -> Dict[str, int]:
         }
     
     # 正常的章节编号模式
-    min_num = min(first_numbers)
-    max_num = max(first_numbers)
+    min_num = distinct_numbers[0]
+    max_num = distinct_numbers[-1]
     
     # 如果数字范围很小（<= 50），认为是正常章节
     if max_num <= 50:
@@ -700,21 +1063,17 @@ def analyze_chapter_number_distribution(chapters: List[Dict]) -> Dict[str, int]:
         }
     
     # 如果数字范围很大，可能包含页码等干扰，采用更保守策略
-    # 找到最密集的数字区间
-    gaps = []
-    for i in range(len(first_numbers) - 1):
-        gaps.append(first_numbers[i + 1] - first_numbers[i])
-    
+    # 找到最密集的数字区间：相同数字之间的间隔为 0，只需看相邻的不同数字
     # 如果有明显的大跳跃（>20），可能前面是正常章节，后面是页码等
     large_gap_idx = -1
-    for i, gap in enumerate(gaps):
-        if gap > 20:
+    for i in range(len(distinct_numbers) - 1):
+        if distinct_numbers[i + 1] - distinct_numbers[i] > 20:
             large_gap_idx = i
             break
     
     if large_gap_idx != -1:
         # 取跳跃前的数字作为合理范围
-        reasonable_max = first_numbers[large_gap_idx]
+        reasonable_max = distinct_numbers[large_gap_idx]
         return {
             "min_reasonable": max(1, min_num), 
             "max_reasonable": reasonable_max,
@@ -724,41 +1083,65 @@ def analyze_chapter_number_distribution(chapters: List[Dict]) -> Dict[str, int]:
     # 默认保守策略
     return {"min_reasonable": 1, "max_reasonable": 50, "primary_range": (1, 50)}
 
-def evaluate_content_richness_and_decide_abandonment(chapters: List[Dict], chain_indices: List[int]) -> bool:
-    """评估章节链的内容丰度，并决定是否放弃当前链"""
-    ############## 内容丰度评估逻辑 #################
-    def evaluate_content_richness(chain_chapters: List[Dict]) -> Dict:
-        """评估章节链的内容丰度"""
-        total_chars = 0
-        chapters_with_content = 0
-        total_chapters = len(chain_chapters)
-        
-        # 计算平均标题长度
-        title_lengths = [len(ch.get('chapter_title', '').strip()) for ch in chain_chapters]
-        avg_title_length = sum(title_lengths) / len(title_lengths) if title_lengths else 0
-        
-        # 统计有实质内容的章节
-        for ch in chain_chapters:
-            raw_text = ch.get('raw_text', '').strip()
-            title = ch.get('chapter_title', '').strip()
-            
-            # 计算总字符数（标题+正文）
-            total_chars += len(title) + len(raw_text)
-            
-            # 判断是否有实质内容
-            if (len(raw_text) > 20 or  # 正文超过20字符
-                len(title) > 30 or     # 标题超过30字符（可能是段落）
-                '.' in title or ',' in title or '；' in title or '。' in title):  # 包含标点符号
-                chapters_with_content += 1
-        
+def evaluate_content_richness_and_decide_abandonment(chapters: List[Dict], chain_indices: List[int],
+                                                     profile: "ChapterProfile" = None) -> bool:
+    """
+    评估章节链的内容丰度，并决定是否放弃当前链
+    :param profile: chapters 的 profile_chapters 结果，提供时直接用其中的逐章节统计
+    """
+    if profile is None:
+        profile = profile_chapters(chapters)
+
+    # 评估当前最长链的内容丰度
+    richness_metrics = profile.richness(chain_indices)
+    
+    print(f"内容丰度评估: {richness_metrics}")
+    # 决策逻辑：如果章节数量多但内容贫乏，放弃当前链
+    should_abandon_chain = (
+        richness_metrics['total_chapters'] > 10 and (  # 章节数量多的情况下
+            (richness_metrics['avg_chars_per_chapter'] < 30 and  # 平均字符数很少
+                richness_metrics['content_ratio'] < 0.4) or         # 且有实质内容比例低
+                
+            (richness_metrics['short_title_ratio'] > 0.6 and     # 或者短标题比例很高
+                richness_metrics['avg_chars_per_chapter'] < 50)     # 且平均字符数不多
+        )
+    )
+    
+    return should_abandon_chain
+
+_LEADING_NUMBER_RE = re.compile(r'^(\d+)')
+_PATTERN_ALPHA_ID_RE = re.compile(r'^[A-Z](\.\d+)*\.?$')
+_PATTERN_NUMERIC_ID_RE = re.compile(r'^\d+(\.\d+)*\.?$')
+
+class ChapterProfile(NamedTuple):
+    """
+    一次遍历章节列表得到的统计结果，章节模式、数字分布、字母章节校验和内容丰度评估都复用它
+    逐章节的列表与 chapters 一一对应
+    """
+    pattern: str                        # 'alpha_first' / 'numeric_first'
+    alpha_indices: List[int]            # 形如 A / A.1 / A.1. 的字母章节下标
+    first_number_counts: Dict[int, int] # 章节首数字直方图
+    number_analysis: Dict[str, int]
+    title_lengths: List[int]            # 去空白后的标题长度
+    text_lengths: List[int]             # 标题 + 正文（均去空白）的字符数
+    has_content: List[bool]             # 是否有实质内容
+
+    def richness(self, indices: List[int]) -> Dict:
+        """按下标子集汇总内容丰度指标，不再扫描章节文本"""
+        total_chapters = len(indices)
+        title_lengths = [self.title_lengths[i] for i in indices]
+        total_chars = sum(self.text_lengths[i] for i in indices)
+        chapters_with_content = sum(1 for i in indices if self.has_content[i])
+
         # 计算各种指标
+        avg_title_length = sum(title_lengths) / len(title_lengths) if title_lengths else 0
         avg_chars_per_chapter = total_chars / total_chapters if total_chapters > 0 else 0
         content_ratio = chapters_with_content / total_chapters if total_chapters > 0 else 0
-        
+
         # 检测是否为表格/表单结构（大量短标题，无实质内容）
         short_titles = sum(1 for length in title_lengths if length <= 20)
         short_title_ratio = short_titles / total_chapters if total_chapters > 0 else 0
-        
+
         return {
             'total_chars': total_chars,
             'avg_chars_per_chapter': avg_chars_per_chapter,
@@ -768,36 +1151,213 @@ def evaluate_content_richness_and_decide_abandonment(chapters: List[Dict], chain
             'total_chapters': total_chapters,
             'chapters_with_content': chapters_with_content
         }
-    
-    # 评估当前最长链的内容丰度
-    chain_chapters = [chapters[i] for i in chain_indices]
-    richness_metrics = evaluate_content_richness(chain_chapters)
-    
-    print(f"内容丰度评估: {richness_metrics}")
-    # 决策逻辑：如果章节数量多但内容贫乏，放弃当前链
-    should_abandon_chain = (
-        richness_metrics['total_chapters'] > 10 and (  # 章节数量多的情况下
-            (richness_metrics['avg_chars_per_chapter'] < 30 and  # 平均字符数很少
-                richness_metrics['content_ratio'] < 0.4) or         # 且有实质内容比例低
-                
-            (richness_metrics['short_title_ratio'] > 0.6 and     # 或者短标题比例很高
-                richness_metrics['avg_chars_per_chapter'] < 50)     # 且平均字符数不多
+
+def profile_chapters(chapters: List[Dict]) -> ChapterProfile:
+    """
+    单次遍历章节列表，同时计算章节模式、首数字直方图、数字分布分析和逐章节内容丰度统计
+    每个分节只需计算一次，结果传给 find_longest_chapter_chain_with_append 等函数复用
+    """
+    first_alpha = first_numeric = None
+    alpha_indices = []
+    first_number_counts = defaultdict(int)
+    title_lengths = []
+    text_lengths = []
+    has_content = []
+
+    for i, ch in enumerate(chapters):
+        chapter_id = ch["chapter_id"].strip()
+        if _PATTERN_ALPHA_ID_RE.match(chapter_id):
+            alpha_indices.append(i)
+            if first_alpha is None:
+                first_alpha = i
+        elif _PATTERN_NUMERIC_ID_RE.match(chapter_id) and first_numeric is None:
+            first_numeric = i
+
+        first_num = _chapter_first_number(chapter_id)
+        if first_num is not None:
+            first_number_counts[first_num] += 1
+
+        title = ch.get('chapter_title', '').strip()
+        raw_text = ch.get('raw_text', '').strip()
+        title_lengths.append(len(title))
+        # 计算总字符数（标题+正文）
+        text_lengths.append(len(title) + len(raw_text))
+        # 判断是否有实质内容
+        has_content.append(
+            len(raw_text) > 20 or  # 正文超过20字符
+            len(title) > 30 or     # 标题超过30字符（可能是段落）
+            '.' in title or ',' in title or '；' in title or '。' in title  # 包含标点符号
         )
-    )
-    
-    return should_abandon_chain
 
-def find_longest_chapter_chain_with_append(chapters: List[Dict], language: str = 'en') -> Tuple[List[Dict], str]:
+    # 比较第一个字母章节和第一个数字章节的位置，没有其中一种时默认数字优先
+    if first_alpha is not None and first_numeric is not None and first_alpha < first_numeric:
+        pattern = 'alpha_first'
+    else:
+        pattern = 'numeric_first'
+
+    first_number_counts = dict(first_number_counts)
+    return ChapterProfile(pattern, alpha_indices, first_number_counts,
+                          number_analysis_from_histogram(first_number_counts),
+                          title_lengths, text_lengths, has_content)
+
+class _MaxSegmentTree:
+    """
+    点更新、区间求最大值的线段树，值为 (链长, -位置)，比较时链长优先、位置靠前优先
+    """
+    def __init__(self, size: int):
+        self.size = 1
+        while self.size < max(size, 1):
+            self.size *= 2
+        self.tree = [None] * (2 * self.size)
+
+    def update(self, pos: int, value: tuple):
+        pos += self.size
+        if self.tree[pos] is None or value > self.tree[pos]:
+            self.tree[pos] = value
+        pos //= 2
+        while pos:
+            left, right = self.tree[2 * pos], self.tree[2 * pos + 1]
+            self.tree[pos] = left if right is None or (left is not None and left > right) else right
+            pos //= 2
+
+    def query(self, lo: int, hi: int):
+        """返回 [lo, hi) 区间内的最大值，区间为空或无值时返回 None"""
+        best = None
+        lo += self.size
+        hi += self.size
+        while lo < hi:
+            if lo & 1:
+                if self.tree[lo] is not None and (best is None or self.tree[lo] > best):
+                    best = self.tree[lo]
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                if self.tree[hi] is not None and (best is None or self.tree[hi] > best):
+                    best = self.tree[hi]
+            lo //= 2
+            hi //= 2
+        return best
+
+def longest_chapter_chain(keys: List[tuple]) -> List[int]:
+    """
+    求满足 is_chapter_a_before_b 且 is_reasonable_chapter_jump 的最长章节链，O(n log n)
+    等价于原先从后往前的二次 DP（含相同的并列取舍：后继取位置最靠前者，起点取位置最靠后者）
+
+    跳跃约束只作用于同层级的一级章节和同父的二级章节，其余情况只要求字典序递增，
+    因此按编号层级（一级/二级/三级及以上）分别建线段树，每个候选的合法后继都是若干个连续的键区间
+    :param keys: 解析后的章节编号元组，顺序与文档顺序一致
+    :return: 最长链在 keys 中的位置列表（从前往后）
+    """
+    from bisect import bisect_left, bisect_right
+
+    n = len(keys)
+    if n == 0:
+        return []
+
+    def level_of(key):
+        return min(len(key), 3) - 1
+
+    # 每个层级各自的有序键表和线段树
+    level_keys = [sorted({key for key in keys if level_of(key) == level}) for level in range(3)]
+    trees = [_MaxSegmentTree(len(level_keys[level])) for level in range(3)]
+
+    def successor_ranges(key):
+        """返回 (层级, 起, 止) 列表：key 之后可以直接接上的键区间"""
+        ranges = []
+        for level in range(3):
+            sorted_keys = level_keys[level]
+            if len(key) == 1 and level == 0:
+                # 一级章节之间：字母章节最多跳 2，数字章节最多跳 5
+                max_jump = 2 if key[0] >= 101 else 5
+                ranges.append((level, bisect_right(sorted_keys, key), bisect_right(sorted_keys, (key[0] + max_jump,))))
+            elif len(key) == 2 and level == 1:
+                # 同一父章节下的二级章节：字母章节子级最多跳 5，数字章节子级最多跳 10
+                max_jump = 5 if key[0] >= 101 else 10
+                ranges.append((level, bisect_right(sorted_keys, key),
+                               bisect_right(sorted_keys, (key[0], key[1] + max_jump))))
+                # 不同父章节的二级章节不限制跳跃
+                ranges.append((level, bisect_left(sorted_keys, (key[0] + 1,)), len(sorted_keys)))
+            else:
+                ranges.append((level, bisect_right(sorted_keys, key), len(sorted_keys)))
+        return ranges
+
+    chain_len = [1] * n
+    next_link = [-1] * n
+    max_len = 0
+    max_pos = -1
+
+    # 从后往前遍历
+    for i in range(n - 1, -1, -1):
+        best = None
+        for level, lo, hi in successor_ranges(keys[i]):
+            if lo < hi:
+                found = trees[level].query(lo, hi)
+                if found is not None and (best is None or found > best):
+                    best = found
+        if best is not None:
+            chain_len[i] = best[0] + 1
+            next_link[i] = -best[1]
+
+        key = keys[i]
+        level = level_of(key)
+        trees[level].update(bisect_left(level_keys[level], key), (chain_len[i], -i))
+
+        if chain_len[i] > max_len:
+            max_len = chain_len[i]
+            max_pos = i
+
+    chain = []
+    pos = max_pos
+    while pos != -1:
+        chain.append(pos)
+        pos = next_link[pos]
+    return chain
+
+class RawTextBuilder:
+    """
+    收集要追加到章节 raw_text 末尾的片段，flush 时每个章节只拼接一次
+    避免长串被拒绝的标题（表格行、列表项）连续 += 到同一章节时的二次方拷贝
+    """
+    __slots__ = ("_pending",)
+
+    def __init__(self):
+        self._pending = {}  # id(章节) -> (章节, [片段, ...])
+
+    def append(self, target: Dict, text: str):
+        entry = self._pending.get(id(target))
+        if entry is None:
+            entry = self._pending[id(target)] = (target, [])
+        entry[1].append(text)
+
+    def append_chapter(self, target: Dict, chap: Dict):
+        """把一个未入选的章节（编号+标题+正文）折叠进 target"""
+        self.append(target, "\n" + chap["chapter_id"] + chap["chapter_title"])
+        if chap.get("raw_text"):
+            self.append(target, " " + chap["raw_text"])
+
+    def flush(self):
+        for target, fragments in self._pending.values():
+            fragments.insert(0, target["raw_text"])
+            target["raw_text"] = "".join(fragments)
+        self._pending.clear()
+
+def find_longest_chapter_chain_with_append(chapters: List[Dict], language: str = 'en',
+                                           profile: Optional[ChapterProfile] = None) -> Tuple[List[Dict], str]:
+    """
+    :param profile: chapters 的 profile_chapters 结果，不提供时在这里计算一次
+    """
+    if profile is None:
+        profile = profile_chapters(chapters)
+
     # 先检测章节模式
-    pattern = detect_chapter_pattern(chapters)
+    pattern = profile.pattern
     print(f"检测到章节模式: {pattern}")
     
     # 🆕 分析章节数字分布
-    number_analysis = analyze_chapter_number_distribution(chapters)
-    print(f"章节数字分析结果: {number_analysis}")
+    print(f"章节数字分析结果: {profile.number_analysis}")
     
     # 用检测到的模式重新解析章节ID
-    parsed_ids = [parse_chapter_id(ch["chapter_id"], pattern) for ch in chapters]
+    parsed_ids = [ChapterId.parse(ch["chapter_id"]).sort_key(pattern) for ch in chapters]
     # print(f'第一个章节: {chapters[0]}')
     n = len(chapters)
 
@@ -807,55 +1367,22 @@ def find_longest_chapter_chain_with_append(chapters: List[Dict], language: str =
         if not parsed_ids[i]:
             continue
             
-        # 检查是否是明显的误识别
+        # 检查是否是明显的误识别：测量单位、频率范围、纯数字标题、表格数据、图表标注等，规则见 chapter_rules.CHAIN_RULES
         chapter_text = chapters[i]["chapter_id"] + " " + chapters[i]["chapter_title"]
-        
-        # 过滤明显的测量单位、频率范围、纯数字等
-        if re.search(r'\b\d+\s*(MHz|GHz|Hz|kHz|dB|V|mV|µV|A|mA|µA|W|mW|Ω|%|°C|°F|mm|cm|m|km|kg|g|mg|ms|s|min|h|rpm|bar|Pa|kPa|MPa)\b', chapter_text, re.I):
-            continue
-        if re.search(r'\d+\s*MHz\s*[~-]\s*\d+\s*MHz', chapter_text, re.I):
-            continue
-        if re.match(r'^\d+\s*$', chapters[i]["chapter_title"].strip()):  # 标题是纯数字
-            continue
-        if len(chapters[i]["chapter_title"].strip()) < 2:  # 标题太短
-            continue
-            
-        # 🆕 表格数据特征过滤
-        chapter_title = chapters[i]["chapter_title"].strip()
-        chapter_id = chapters[i]["chapter_id"].strip()
-        
-        # 检测表格行模式：单个字母 + 主要是数字的标题
-        if (len(chapter_id) == 1 and chapter_id.isupper() and 
-            re.search(r'^\d+.*\d+', chapter_title) and 
-            len([x for x in chapter_title.split() if x.isdigit()]) >= 2):
-            continue
-            
-        # 检测坐标点格式：如 "10 0 E 0 16"
-        if re.match(r'^\d+\s+\d+\s+[A-Z]\s+\d+\s+\d+', chapter_title):
-            continue
-            
-        # 检测参数表格格式：如 "34 65 F 25 77"
-        title_parts = chapter_title.split()
-        if (len(title_parts) >= 4 and 
-            sum(1 for part in title_parts if part.isdigit()) >= 3 and
-            sum(1 for part in title_parts if len(part) == 1 and part.isupper()) >= 1):
-            continue
-            
-        # 检测图表标注说明：单个字母 + 以破折号开头的标题
-        if (len(chapter_id) == 1 and chapter_id.isupper() and 
-            chapter_title.startswith('———')):
+        if CHAIN_RULES.first_rejection(chapter_text, chapters[i]["chapter_id"].strip(),
+                                       chapters[i]["chapter_title"].strip()):
             continue
-            
+
         valid_indices.append(i)
     
     # 第二步：验证字母章节的合理性（针对中英文差异化处理）
     if valid_indices:
         # 检查是否包含字母章节
+        alpha_index_set = set(profile.alpha_indices)
         alpha_chapters = []
         for i, idx in enumerate(valid_indices):
-            chapter_id = chapters[idx]["chapter_id"].strip()
-            if re.match(r'^[A-Z](?:\.\d+)*\.?$', chapter_id):
-                alpha_chapters.append((i, idx, chapter_id[0]))  # (在valid_indices中的位置, 原始索引, 首字母)
+            if idx in alpha_index_set:
+                alpha_chapters.append((i, idx, chapters[idx]["chapter_id"].strip()[0]))  # (在valid_indices中的位置, 原始索引, 首字母)
         
         # 如果有字母章节，进行合理性验证
         if alpha_chapters:
@@ -890,36 +1417,13 @@ def find_longest_chapter_chain_with_append(chapters: List[Dict], language: str =
                     # 不做特殊处理，保留所有字母章节
 
     # 第三步：从后往前构建最长链
-    dp = [1] * len(valid_indices)
-    next_link = [-1] * len(valid_indices)  # 改为记录下一个节点
-    max_len = 0
-    max_idx = -1
-
-    # 从后往前遍历
-    for i in range(len(valid_indices) - 1, -1, -1):
-        curr_idx = valid_indices[i]
-        curr_parsed = parsed_ids[curr_idx]
-        
-        # 找在当前节点之后的所有节点
-        for j in range(i + 1, len(valid_indices)):
-            next_idx = valid_indices[j]
-            next_parsed = parsed_ids[next_idx]
-            
-            # 检查当前节点是否可以连到下一个节点
-            if (is_chapter_a_before_b(curr_parsed, next_parsed) and 
-                is_reasonable_chapter_jump(curr_parsed, next_parsed)):
-                if dp[j] + 1 > dp[i]:
-                    dp[i] = dp[j] + 1
-                    next_link[i] = j
-        
-        if dp[i] > max_len:
-            max_len = dp[i]
-            max_idx = i
+    chain_positions = longest_chapter_chain([parsed_ids[idx] for idx in valid_indices])
+    max_len = len(chain_positions)
 
     # 第四步：如果没有找到合理的链，退回到简单的顺序过滤
     if max_len < 2:
         # 简单按章节编号顺序过滤
-        filtered_chapters = simple_chapter_filter(chapters)
+        filtered_chapters = simple_chapter_filter(chapters, pattern)
         
         # 如果过滤后还是没有章节，将所有内容放入跳过的内容中
         if not filtered_chapters:
@@ -934,26 +1438,13 @@ def find_longest_chapter_chain_with_append(chapters: List[Dict], language: str =
         
         return filtered_chapters, ""
 
-    # 回溯出主链索引（从前往后的正确顺序）
-    chain_indices = []
-    idx = max_idx
-    while idx != -1:
-        chain_indices.append(valid_indices[idx])
-        idx = next_link[idx]
+    # 主链索引（从前往后的正确顺序）
+    chain_indices = [valid_indices[pos] for pos in chain_positions]
     
     print(f"从后往前生成的最长链: 长度={len(chain_indices)}, 位置={chain_indices[:5]}{'...' if len(chain_indices)>5 else ''}")
     
-    # 最长链的第一个章节索引
-    first_chain_idx = chain_indices[0]
-    
-    # 生成跳过的内容（最长链第一个章节之前的所有内容）
-    skipped_chapters = chapters[:first_chain_idx]
-    skipped_text = "\n".join([f"{ch['chapter_id']} {ch['chapter_title']} {ch.get('raw_text','')}" for ch in skipped_chapters])
-    
-    chain_set = set(chain_indices)
-    
     # 🆕 添加内容丰度检查
-    if language == 'en' and evaluate_content_richness_and_decide_abandonment(chapters, chain_indices):
+    if language == 'en' and evaluate_content_richness_and_decide_abandonment(chapters, chain_indices, profile):
         # 将所有章节内容合并为跳过的内容
         print("=====================================")
         print("内容丰度评估决定放弃当前链，返回空结果")
@@ -967,20 +1458,37 @@ def find_longest_chapter_chain_with_append(chapters: List[Dict], language: str =
         skipped_text = "\n".join(all_content)
         
         return [], skipped_text
+
+    return assemble_chain_result(chapters, chain_indices)
+
+def assemble_chain_result(chapters: List[Dict], chain_indices: List[int]) -> Tuple[List[Dict], str]:
+    """
+    按选定的章节链构建结果：链首之前的章节作为跳过内容，链上其余未入选章节折叠进前一个入选章节，
+    再把像正文句子的标题并入正文
+    :param chain_indices: 入选章节在 chapters 中的下标（升序）
+    :return: (入选章节列表, 跳过的内容)
+    """
+    # 最长链的第一个章节索引
+    first_chain_idx = chain_indices[0]
+    
+    # 生成跳过的内容（最长链第一个章节之前的所有内容）
+    skipped_chapters = chapters[:first_chain_idx]
+    skipped_text = "\n".join([f"{ch['chapter_id']} {ch['chapter_title']} {ch.get('raw_text','')}" for ch in skipped_chapters])
     
+    chain_set = set(chain_indices)
+
     # 最终结果构建
     result = []
     last_valid = None
+    raw_text_builder = RawTextBuilder()
     for i, chap in enumerate(chapters):
         if i in chain_set:
             result.append(chap)
             last_valid = chap
         elif i >= first_chain_idx:  # 只处理最长链开始之后的章节
             if last_valid:
-                content_to_add = "\n" + chap["chapter_id"] + chap["chapter_title"]
-                if chap.get("raw_text"):
-                    content_to_add += " " + chap["raw_text"]
-                last_valid["raw_text"] += content_to_add
+                raw_text_builder.append_chapter(last_valid, chap)
+    raw_text_builder.flush()
 
     # 判断章节标题是否应该合并到正文中
     for chap in result:
@@ -1020,15 +1528,18 @@ def find_longest_chapter_chain_with_append(chapters: List[Dict], language: str =
 
     return result, skipped_text
 
-def simple_chapter_filter(chapters: List[Dict]) -> List[Dict]:
+def simple_chapter_filter(chapters: List[Dict], pattern: Optional[str] = None) -> List[Dict]:
     """
     简单的章节过滤策略：当最长链算法失效时的备用方案
+    :param pattern: 已检测出的章节模式，不提供时重新检测
     """
     # 检测章节模式
-    pattern = detect_chapter_pattern(chapters)
+    if pattern is None:
+        pattern = detect_chapter_pattern(chapters)
     
     result = []
-    parsed_ids = [parse_chapter_id(ch["chapter_id"], pattern) for ch in chapters]
+    raw_text_builder = RawTextBuilder()
+    parsed_ids = [ChapterId.parse(ch["chapter_id"]).sort_key(pattern) for ch in chapters]
     
     for i, chap in enumerate(chapters):
         parsed_id = parsed_ids[i]
@@ -1037,10 +1548,7 @@ def simple_chapter_filter(chapters: List[Dict]) -> List[Dict]:
         if not parsed_id:
             # 无法解析的章节，追加到上一个有效章节
             if result:
-                content_to_add = "\n" + chap["chapter_id"] + chap["chapter_title"]
-                if chap.get("raw_text"):
-                    content_to_add += " " + chap["raw_text"]
-                result[-1]["raw_text"] += content_to_add
+                raw_text_builder.append_chapter(result[-1], chap)
             continue
         
         # 检查章节编号是否在合理范围内
@@ -1054,10 +1562,7 @@ def simple_chapter_filter(chapters: List[Dict]) -> List[Dict]:
             else:
                 # 不合理的章节，追加到上一个有效章节
                 if result:
-                    content_to_add = "\n" + chap["chapter_id"] + chap["chapter_title"]
-                    if chap.get("raw_text"):
-                        content_to_add += " " + chap["raw_text"]
-                    result[-1]["raw_text"] += content_to_add
+                    raw_text_builder.append_chapter(result[-1], chap)
         else:
             # 数字在前：1, 2, ..., A=101, B=102, ...
             if (1 <= first_num <= 20) or (101 <= first_num <= 126):  # 数字章节或字母章节
@@ -1065,13 +1570,9 @@ def simple_chapter_filter(chapters: List[Dict]) -> List[Dict]:
             else:
                 # 不合理的章节，追加到上一个有效章节
                 if result:
-                    content_to_add = "\n" + chap["chapter_id"] + chap["chapter_title"]
-                    if chap.get("raw_text"):
-                        content_to_add += " " + chap["raw_text"]
-                    result[-1]["raw_text"] += content_to_add
-    
-    return result
-    
+                    raw_text_builder.append_chapter(result[-1], chap)
+
+    raw_text_builder.flush()
     return result
 
 def split_sections_by_attachment(chapters: List[Dict]) -> List[Dict]:
@@ -1162,6 +1663,70 @@ def split_sections_by_appendix(chapters):
 
     return sections
 
+_ATTACHMENT_HEADING_RE = re.compile(r'^(ANNEX|ATTACHMENT)\s+([A-Z0-9]+)', re.I)
+_APPENDIX_HEADING_RE = re.compile(r'^(APPENDIX\s+(?:[A-Z0-9]+|\([A-Z0-9]+\)))$', re.IGNORECASE)
+
+def _has_content(chap: Dict) -> bool:
+    return bool(chap.get('chapter_title') or chap.get('raw_text', '').strip())
+
+def split_document_sections(chapters: List[Dict]) -> List[Dict]:
+    """
+    一次遍历同时完成 split_sections_by_attachment 和 split_sections_by_appendix 的两级切分，结果与二者嵌套调用一致
+    :return: [{"file": regulation 或 ANNEX n, "sections": [{"section": MAIN / APPENDIX n / 附录X, "chapters": [...]}]}]
+    """
+    files = []
+    file_name = "regulation"  # 默认主文档
+    file_chapter_count = 0
+    sections = []
+    section = {"section": "MAIN", "chapters": []}
+
+    def add_to_file(ch):
+        # 附录级切分：与 split_sections_by_appendix 相同
+        nonlocal file_chapter_count, section
+        file_chapter_count += 1
+        appendix_match = _APPENDIX_HEADING_RE.match(ch['chapter_id'])
+        if appendix_match or ch["chapter_id"].startswith("附录"):
+            appendix_name = appendix_match.group(1).upper() if appendix_match else ch['chapter_id'].strip()
+            if section["section"] != "MAIN" and section["section"].upper() == appendix_name:
+                # 相同的附录，只保留有实际内容的重复标题章节
+                if _has_content(ch):
+                    section["chapters"].append(ch)
+            else:
+                if section["chapters"]:
+                    sections.append(section)
+                section = {"section": appendix_name, "chapters": [ch] if _has_content(ch) else []}
+        else:
+            section["chapters"].append(ch)
+
+    def close_file():
+        nonlocal file_chapter_count, sections, section
+        if section["chapters"]:
+            sections.append(section)
+        if file_chapter_count:
+            files.append({"file": file_name, "sections": sections})
+        file_chapter_count = 0
+        sections = []
+        section = {"section": "MAIN", "chapters": []}
+
+    for chap in chapters:
+        # 附件级切分：与 split_sections_by_attachment 相同，合并连续的相同附件标题
+        match = _ATTACHMENT_HEADING_RE.match(chap['chapter_id'])
+        if match:
+            annex_name = match.group(1).upper() + " " + match.group(2)  # 标准化名称，如 "ANNEX 1"
+            if file_name != "regulation" and file_name.upper() == annex_name:
+                if _has_content(chap):
+                    add_to_file(chap)
+            else:
+                close_file()
+                file_name = annex_name
+                if _has_content(chap):
+                    add_to_file(chap)
+        else:
+            add_to_file(chap)
+
+    close_file()
+    return files
+
 def process_sections_with_lis(chapters, language='en'):
     # 先拆分成正文和多个附录
     sections = split_sections_by_appendix(chapters)
@@ -1208,9 +1773,10 @@ def filter_start_of_main(chapters: List[Dict]) -> Tuple[List[Dict], str]:
     return filtered_chapters, skipped_text
 
 
-def smart_paragraph_join(lines: List[str]) -> str:
+def smart_paragraph_join(lines: List[str], chapter_matches: List[Optional[ChapterMatch]] = None) -> str:
     """
     智能段落合并：只在段落结束时换行
+    :param chapter_matches: 与 lines 一一对应的 match_chapter_line 结果，提供时不再对下一行重复做章节匹配
     """
     if not lines:
         return ""
@@ -1234,7 +1800,12 @@ def smart_paragraph_join(lines: List[str]) -> str:
         if i + 1 < len(lines):
             next_line = lines[i + 1].strip()
             # 下一行是章节标题、列表项、或明显的段落开始
-            if (detect_chapter(next_line) or
+            if chapter_matches is not None:
+                next_match = chapter_matches[i + 1]
+                next_is_chapter = next_match is not None and is_chapter_number_in_range(next_match.first_num)
+            else:
+                next_is_chapter = detect_chapter(next_line) is not None
+            if (next_is_chapter or
                 re.match(r'^[一二三四五六七八九十\d]+[、\.\)]', next_line) or  # 列表项
                 re.match(r'^[（(]\d+[）)]', next_line) or  # 编号项
                 re.match(r'^[——\-—]+', next_line)):  # 破折号开头
@@ -1264,167 +1835,629 @@ def smart_paragraph_join(lines: List[str]) -> str:
     
     return '\n'.join(result)
 
-def parse_pdf_to_chapter_tree(pdf_path: str) -> Tuple[List[Dict], Dict[str, str]]:
+def segment_chapters(lines: List[str], line_matches: List[Optional[ChapterMatch]],
+                     max_chapter_num=1000, number_analysis=None, materialize=True,
+                     boundary_lines: Optional[List[int]] = None, line_offset: int = 0) -> List[Dict]:
     """
-    从 PDF 中提取章节树和术语映射
-    :param pdf_path: PDF 文件路径
-    :return: (章节树, 术语映射)
+    按章节标题行切分全文，标题之间的正文行用智能段落合并
+    每个章节记录标题行号 line（加上 line_offset，切分全文片段时换算成全文行号），第一个标题之前的内容没有 line
+    :param line_matches: 与 lines 一一对应的 match_chapter_line 结果，这里只做数字范围过滤
+    :param materialize: False 时不做段落合并，章节只记录正文在 lines 中的行区间 line_start/line_end，
+                        需要正文时对 lines[line_start:line_end] 调用 smart_paragraph_join 即可
+    :param boundary_lines: 指定作为章节起点的标题行号（升序），提供时只在这些行切分，不做数字范围过滤
     """
-    cleaned_lines = extract_full_text_with_filter(pdf_path)
-
-    # 🆕 检测文档语言
-    language = detect_document_language(cleaned_lines)
-    max_chapter_num = 50 if language == 'zh' else 1000
-    print(f"检测到文档语言: {'中文' if language == 'zh' else '英文'}, max_chapter_num={max_chapter_num}")
-
-    # 🆕 第一轮：粗略提取所有可能的章节，用于分析数字分布
-    preliminary_chapters = []
+    chapters = []
     current = {
         "chapter_id": "",
         "chapter_title": "",
-        "raw_text": ""
     }
-    buffer = []
-
-    for line in cleaned_lines:
-        # 第一轮使用宽松的数字范围进行粗提取
-        chapter_info = detect_chapter(line, max_chapter_num=1000, language=language, number_analysis=None)
-
-        if chapter_info:
-            if current:
-                current["raw_text"] = smart_paragraph_join(buffer)
-                preliminary_chapters.append(current)
-                buffer = []
-            current = {
-                "chapter_id": chapter_info["chapter_id"],
-                "chapter_title": chapter_info["chapter_title"],
-                "raw_text": ""
-            }
+    buffer_start = 0
+
+    def close_current(end):
+        if materialize:
+            # 使用智能段落合并而不是简单的 \n 连接
+            current["raw_text"] = smart_paragraph_join(lines[buffer_start:end], line_matches[buffer_start:end])
         else:
-            buffer.append(line)
+            current["line_start"] = buffer_start
+            current["line_end"] = end
+        chapters.append(current)
 
-    if current:
-        current["raw_text"] = smart_paragraph_join(buffer)
-        preliminary_chapters.append(current)
+    if boundary_lines is None:
+        boundary_lines = (
+            i for i, chapter_match in enumerate(line_matches)
+            if chapter_match is not None and is_chapter_number_in_range(
+                chapter_match.first_num, max_chapter_num, number_analysis)
+        )
 
-    # 🆕 分析章节数字分布
-    number_analysis = analyze_chapter_number_distribution(preliminary_chapters)
-    print(f"数字分布分析: {number_analysis}")
+    for i in boundary_lines:
+        chapter_match = line_matches[i]
+        close_current(i)
+        current = {
+            "chapter_id": chapter_match.chapter_id,
+            "chapter_title": chapter_match.chapter_title,
+            "line": i + line_offset,
+        }
+        buffer_start = i + 1
 
-    # 🆕 第二轮：使用分析结果重新精确提取章节
-    chapters = []
-    current = {
-        "chapter_id": "",
-        "chapter_title": "",
-        "raw_text": ""
+    close_current(len(lines))
+
+    return chapters
+
+def build_section_entry(section: str, chapters: List[Dict], language: str = 'en') -> Dict:
+    """
+    启发式处理一个分节：最长章节链筛选 -> 建树 -> 生成完整路径
+    :return: {"section", "context", "chapters"}，chapters 为 ChapterNode 列表
+    """
+    # filtered_chapters, skipped_text = filter_start_of_main(sec["chapters"])
+    # 3️⃣ 对每个部分内部保留最长链，分节统计只计算一次
+    profile = profile_chapters(chapters)
+    valid_chaps_in_sec, skipped_text = find_longest_chapter_chain_with_append(chapters, language, profile)
+    
+    # 🆕 如果最长链提取结果为空，创建虚拟的ALL章节
+    if not valid_chaps_in_sec:
+        # 将context内容作为虚拟章节的rawtext
+        virtual_chapter = ChapterNode("ALL", "", skipped_text, full_path="ALL")
+        tree_in_sec = [virtual_chapter]
+        # 清空context，因为内容已经放入虚拟章节
+        skipped_text = ""
+    else:
+        # 完整路径由节点的父链按需拼出，输出 JSON 时再一次性生成
+        tree_in_sec = build_tree(valid_chaps_in_sec)
+    
+    # 插入键值对 section
+    return {
+        "section": section,
+        "context": skipped_text,
+        "chapters": tree_in_sec,
     }
-    buffer = []
-
-    for line in cleaned_lines:
-        chapter_info = detect_chapter(line, max_chapter_num=max_chapter_num, language=language, number_analysis=number_analysis)
-
-        if chapter_info:
-            if current:
-                # 使用智能段落合并而不是简单的 \n 连接
-                current["raw_text"] = smart_paragraph_join(buffer)
-                chapters.append(current)
-                buffer = []
-            current = {
-                "chapter_id": chapter_info["chapter_id"],
-                "chapter_title": chapter_info["chapter_title"],
-                "raw_text": ""
-            }
-        else:
-            buffer.append(line)
 
-    if current:
-        current["raw_text"] = smart_paragraph_join(buffer)
-        chapters.append(current)
+def _run_section_job(job: Tuple[str, List[Dict], str]) -> Dict:
+    """进程池任务：启发式处理一个分节"""
+    section, chapters, language = job
+    return build_section_entry(section, chapters, language)
 
-    # 1️⃣ 先按附件切分顶层
-    attachment_sections = split_sections_by_attachment(chapters)
+def run_section_jobs(jobs: List[Tuple[str, List[Dict], str]], workers: int = 1) -> List[Dict]:
+    """
+    执行分节任务 (section, chapters, language)，结果顺序与任务顺序一致
+    workers > 1 且分节不止一个时分发到进程池；各分节互不依赖，结果与顺序执行相同
+    """
+    if workers is None or workers <= 1 or len(jobs) < 2:
+        return [_run_section_job(job) for job in jobs]
 
-    tree = []
+    from concurrent.futures import ProcessPoolExecutor
 
-    for top_sec in attachment_sections:
-        
-        # 2️⃣ 每个顶层块再按附录切分
-        sections = split_sections_by_appendix(top_sec["chapters"])
-        section_tree_list = []
-
-        for sec in sections:
-            # filtered_chapters, skipped_text = filter_start_of_main(sec["chapters"])
-            # 3️⃣ 对每个部分内部保留最长链
-            valid_chaps_in_sec, skipped_text = find_longest_chapter_chain_with_append(sec["chapters"], language)
-            
-            # 🆕 如果最长链提取结果为空，创建虚拟的ALL章节
-            if not valid_chaps_in_sec:
-                # 将context内容作为虚拟章节的rawtext
-                virtual_chapter = {
-                    "chapter_id": "ALL",
-                    "chapter_title": "",
-                    "raw_text": skipped_text,
-                    "full_path": "ALL",
-                    "children": []
-                }
-                tree_in_sec = [virtual_chapter]
-                # 清空context，因为内容已经放入虚拟章节
-                skipped_text = ""
-            else:
-                tree_in_sec = build_tree(valid_chaps_in_sec)
-                build_full_path(tree_in_sec)
-            
-            # 插入键值对 section
-            section_tree_list.append({
-                "section": sec["section"],
-                "context": skipped_text,
-                "chapters": tree_in_sec,
-            })
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        # executor.map 保证结果顺序与任务顺序一致
+        return list(executor.map(_run_section_job, jobs))
+
+def build_sections_tree(chapters: List[Dict], language: str = 'en', workers: int = 1) -> List[Dict]:
+    """
+    按附件、附录两级切分章节，每个分节独立做启发式处理
+    :param workers: 分节处理的进程数，1 表示顺序处理
+    :return: 章节树 [{"file": regulation 或 ANNEX n, "sections": [...]}]，章节为 ChapterNode
+    """
+    # 1️⃣ 2️⃣ 一次遍历同时按附件和附录切分
+    files = split_document_sections(chapters)
+    jobs = [(sec["section"], sec["chapters"], language) for file_sec in files for sec in file_sec["sections"]]
+    results = iter(run_section_jobs(jobs, workers))
+
+    tree = []
+    for file_sec in files:
+        section_tree_list = [next(results) for _ in file_sec["sections"]]
 
         # 4️⃣ 构建顶层树
         tree.append({
-            "file": top_sec["section"],  # regulation 或 ANNEX n
+            "file": file_sec["file"],  # regulation 或 ANNEX n
             "sections": section_tree_list,
         })
 
+    return tree
+
+# 书签目录至少要锚定这么多条带编号的条目，才认为它可以替代启发式章节识别
+OUTLINE_MIN_ANCHORS = 3
+
+def read_pdf_outline(pdf_path: str) -> List[Dict]:
+    """
+    读取 PDF 书签目录，只保留标题以章节编号开头的条目（附录、ANNEX 等分节标题仍由正文识别）
+    :return: [{"level", "chapter_id", "page"}]，page 为从 1 开始的目标页码，无目标页时为 -1
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        toc = doc.get_toc(simple=True)
+    finally:
+        doc.close()
+
+    entries = []
+    for level, title, page in toc:
+        line = normalize_chapter_spaces(fullwidth_to_halfwidth(title.replace('\u3000', ' ').strip()))
+        chapter_match = match_chapter_line(line)
+        if chapter_match is None or chapter_match.pattern_index < 2:
+            continue
+        entries.append({"level": level, "chapter_id": chapter_match.chapter_id, "page": page})
+    return entries
+
+def anchor_outline_entries(entries: List[Dict], line_matches: List[Optional[ChapterMatch]],
+                           page_starts: List[int]) -> List[Optional[int]]:
+    """
+    按书签顺序把条目锚定到正文标题行：编号相同，位于书签目标页或其下一页，且在上一个锚点之后
+    页码限制可以跳过正文前面印刷的目次页
+    :param page_starts: 每页第一行的行号，为空时只按顺序锚定
+    :return: 与 entries 一一对应的标题行号，锚定失败为 None
+    """
+    positions = defaultdict(list)
+    for i, chapter_match in enumerate(line_matches):
+        if chapter_match is not None:
+            positions[ChapterId.parse(chapter_match.chapter_id).key].append(i)
+
+    anchors = []
+    prev = -1
+    page_count = len(page_starts)
+    for entry in entries:
+        candidates = positions.get(ChapterId.parse(entry["chapter_id"]).key, [])
+        lo = prev + 1
+        hi = len(line_matches)
+        page = entry["page"]
+        if 1 <= page <= page_count:
+            lo = max(lo, page_starts[page - 1])
+            if page + 1 < page_count:
+                hi = page_starts[page + 1]
+        k = bisect_left(candidates, lo)
+        if k < len(candidates) and candidates[k] < hi:
+            prev = candidates[k]
+            anchors.append(prev)
+        else:
+            anchors.append(None)
+    return anchors
+
+def _is_outline_section_complete(lo: int, hi: int, has_anchor: bool, missing_lines: List[int],
+                                 line_matches: List[Optional[ChapterMatch]], boundaries: set,
+                                 anchored_keys: set, max_chapter_num, number_analysis) -> bool:
+    """
+    书签目录是否完整覆盖行区间 [lo, hi) 对应的分节：
+    - 分节内至少有一个锚定的书签条目
+    - 没有落在本分节的书签条目锚定失败
+    - 正文中没有书签未列出、但父章节在书签里的标题行（例如书签只列到二级，正文还有三级标题）
+    """
+    if not has_anchor:
+        return False
+    k = bisect_left(missing_lines, lo)
+    if k < len(missing_lines) and missing_lines[k] < hi:
+        return False
+    for i in range(lo, hi):
+        chapter_match = line_matches[i]
+        if chapter_match is None or i in boundaries:
+            continue
+        if not is_chapter_number_in_range(chapter_match.first_num, max_chapter_num, number_analysis):
+            continue
+        cid = ChapterId.parse(chapter_match.chapter_id)
+        if cid.key in anchored_keys or len(cid.path) < 2:
+            continue
+        if '.'.join(cid.path[:-1]) in anchored_keys:
+            return False
+    return True
+
+def build_sections_tree_from_outline(lines: List[str], line_matches: List[Optional[ChapterMatch]],
+                                     outline_entries: List[Dict], page_starts: List[int],
+                                     max_chapter_num, number_analysis, language: str = 'en', workers: int = 1):
+    """
+    书签目录驱动的分节建树：章节边界直接取书签锚定的标题行，附录、ANNEX 等分节标题仍按正文识别
+    书签完整覆盖的分节跳过最长章节链，不完整的分节回退到启发式处理（workers > 1 时并行）
+    :return: 章节树；书签可锚定的条目太少时返回 None
+    """
+    anchors = anchor_outline_entries(outline_entries, line_matches, page_starts)
+    anchor_set = {i for i in anchors if i is not None}
+    print(f"📑 书签目录锚定 {len(anchor_set)}/{len(outline_entries)} 个带编号条目")
+    if len(anchor_set) < OUTLINE_MIN_ANCHORS:
+        return None
+
+    # 分节标题行始终作为边界，分节结果与启发式流程一致
+    boundaries = set(anchor_set)
+    # 按全部候选标题行切分（与启发式流程相同），未锚定的候选行由 assemble_chain_result 并回正文，空白拼接保持一致
+    split_lines = set(anchor_set)
+    for i, chapter_match in enumerate(line_matches):
+        if (chapter_match is not None and
+                is_chapter_number_in_range(chapter_match.first_num, max_chapter_num, number_analysis)):
+            split_lines.add(i)
+            if chapter_match.pattern_index < 2:
+                boundaries.add(i)
+    boundary_lines = sorted(split_lines)
+
+    chapters = segment_chapters(lines, line_matches, boundary_lines=boundary_lines)
+    # 第一个章节是首个标题之前的内容，从第 0 行开始
+    chapter_lines = {id(chap): line for chap, line in zip(chapters, [0] + boundary_lines)}
+    anchored_chapters = {id(chap) for chap, line in zip(chapters[1:], boundary_lines) if line in anchor_set}
+    anchored_keys = {ChapterId.parse(line_matches[i].chapter_id).key for i in anchor_set}
+    missing_lines = sorted(
+        page_starts[entry["page"] - 1]
+        for entry, anchor in zip(outline_entries, anchors)
+        if anchor is None and 1 <= entry["page"] <= len(page_starts)
+    )
+
+    # 先切好全部分节，才能确定每个分节的行区间
+    tree = []
+    split = []
+    for file_sec in split_document_sections(chapters):
+        file_entry = {"file": file_sec["file"], "sections": []}  # regulation 或 ANNEX n
+        tree.append(file_entry)
+        for sec in file_sec["sections"]:
+            split.append((file_entry, sec, chapter_lines[id(sec["chapters"][0])]))
+
+    # 每个分节先占位，回退启发式的分节统一交给 run_section_jobs 处理
+    section_results = []
+    fallback_jobs = []
+    for k, (file_entry, sec, lo) in enumerate(split):
+        hi = split[k + 1][2] if k + 1 < len(split) else len(lines)
+        sec_chapters = sec["chapters"]
+        chain_indices = [j for j, chap in enumerate(sec_chapters) if id(chap) in anchored_chapters]
+
+        # 只有一个锚定章节时启发式流程不组装章节链（分节上下文为空），同样回退以保持输出一致
+        if len(chain_indices) >= 2 and _is_outline_section_complete(
+                lo, hi, True, missing_lines, line_matches, boundaries,
+                anchored_keys, max_chapter_num, number_analysis):
+            valid_chaps_in_sec, skipped_text = assemble_chain_result(sec_chapters, chain_indices)
+            tree_in_sec = build_tree(valid_chaps_in_sec)
+            section_results.append({"section": sec["section"], "context": skipped_text, "chapters": tree_in_sec})
+        else:
+            # 书签不完整：对本分节的行区间重新按标题行切分，走启发式流程
+            sec_chapters = segment_chapters(lines[lo:hi], line_matches[lo:hi], max_chapter_num=max_chapter_num,
+                                            number_analysis=number_analysis, line_offset=lo)
+            if lo > 0 and not sec_chapters[0]["chapter_id"] and not sec_chapters[0]["raw_text"]:
+                # 分节从标题行开始，去掉切分产生的空前置块
+                sec_chapters = sec_chapters[1:]
+            fallback_jobs.append((sec["section"], sec_chapters, language))
+            section_results.append(None)
+
+    fallback_results = iter(run_section_jobs(fallback_jobs, workers))
+    for (file_entry, _, _), entry in zip(split, section_results):
+        file_entry["sections"].append(entry if entry is not None else next(fallback_results))
+
+    print(f"📑 书签目录建树: {len(split) - len(fallback_jobs)} 个分节直接使用书签，{len(fallback_jobs)} 个分节回退启发式")
+    return tree
+
+def _section_heading_key(chapter_id: str) -> Optional[Tuple[str, str]]:
+    """
+    按 split_document_sections 的规则判断一行是否是附件/附录标题
+    :return: ("file", 附件名) / ("section", 附录名)，名称统一大写；不是分节标题时返回 None
+    """
+    match = _ATTACHMENT_HEADING_RE.match(chapter_id)
+    if match:
+        return "file", (match.group(1) + " " + match.group(2)).upper()
+    match = _APPENDIX_HEADING_RE.match(chapter_id)
+    if match:
+        return "section", match.group(1).upper()
+    if chapter_id.startswith("附录"):
+        return "section", chapter_id.strip().upper()
+    return None
+
+def locate_heading_lines(tree: List[Dict], line_matches: List[Optional[ChapterMatch]]
+                         ) -> List[Tuple[int, Dict, Optional[ChapterNode]]]:
+    """
+    找出章节树中每个章节的标题所在行号，用于把表格等按行号定位的内容关联到章节
+    行号取切分章节时记录的 node.line，并核对该行识别出的编号；标题被并入正文（chapter_title 为空）的章节同样有效，
+    补建的父节点和虚拟 ALL 章节没有标题行
+    附件/附录的标题行也作为边界：关联到该分节的虚拟 ALL 章节，没有 ALL 时只关联到分节本身（chapter_id 为 None），
+    避免标题后、第一个章节前的表格落到上一个分节的最后一个章节
+    :return: 按行号升序的 (行号, 位置字段 {file, section, chapter_id, chapter_path}, 章节节点或 None)
+    """
+    entries = []
+    boundaries = []
+    for file_sec in tree:
+        for k, sec in enumerate(file_sec["sections"]):
+            for root in sec["chapters"]:
+                for node in root.iter_subtree():
+                    if node.line is None or not 0 <= node.line < len(line_matches):
+                        continue
+                    chapter_match = line_matches[node.line]
+                    if chapter_match is None or chapter_match.chapter_id != node.chapter_id:
+                        continue
+                    fields = {"file": file_sec["file"], "section": sec["section"],
+                              "chapter_id": node.chapter_id, "chapter_path": node.full_path}
+                    entries.append((node.line, 1, fields, node))
+            if sec["section"] != "MAIN":
+                key = ("section", sec["section"].upper())
+            elif k == 0 and file_sec["file"] != "regulation":
+                key = ("file", file_sec["file"].upper())
+            else:
+                continue
+            roots = sec["chapters"]
+            virtual = roots[0] if len(roots) == 1 and roots[0].chapter_id == "ALL" else None
+            boundaries.append((key, file_sec["file"], sec["section"], virtual))
+
+    section_headings = []
+    for line_no, chapter_match in enumerate(line_matches):
+        if chapter_match is None:
+            continue
+        key = _section_heading_key(chapter_match.chapter_id)
+        if key is not None:
+            section_headings.append((line_no, key))
+
+    # 分节标题从后往前找：目录里也会出现同名标题，取下一个分节之前最后一次出现的那一行
+    pos = len(section_headings)
+    for key, file_name, section, virtual in reversed(boundaries):
+        i = pos
+        while i > 0 and section_headings[i - 1][1] != key:
+            i -= 1
+        if i == 0:
+            continue
+        pos = i - 1
+        fields = {"file": file_name, "section": section,
+                  "chapter_id": virtual.chapter_id if virtual else None,
+                  "chapter_path": virtual.full_path if virtual else None}
+        entries.append((section_headings[pos][0], 0, fields, virtual))
+
+    # 同一行既是分节边界又是章节标题时，章节排在后面，优先生效
+    entries.sort(key=lambda entry: entry[:2])
+    return [(line_no, fields, node) for line_no, _, fields, node in entries]
+
+def _add_table_headers(node: ChapterNode, table: Dict) -> None:
+    """把表格的表头行（非空单元格）追加到章节的 table_headers，去重并保持顺序"""
+    rows = table.get("table_content")
+    if not rows:
+        return
+    if node.extra is None:
+        node.extra = {}
+    headers = node.extra.setdefault("table_headers", [])
+    for cell in rows[0]:
+        if cell and cell not in headers:
+            headers.append(cell)
+
+# 解析缓存格式版本号，缓存结构变化时递增
+PARSE_CACHE_VERSION = "7"
+
+_code_version_cache = None
+
+# 解析结果依赖的其他模块（与本文件同目录），任一改动都要让缓存失效
+_PIPELINE_MODULES = ("chapter_id.py", "chapter_node.py", "chapter_rules.py", "term_index.py", "table_store.py",
+                     "text_quality.py", "file_extract_OCR.py", "file_repair.py")
+
+def _code_version() -> str:
+    """
+    当前解析代码的版本标识：缓存格式版本 + 本文件及 _PIPELINE_MODULES 的内容哈希，代码改动后缓存自动失效
+    """
+    global _code_version_cache
+    if _code_version_cache is None:
+        h = hashlib.sha1(PARSE_CACHE_VERSION.encode("utf-8"))
+        try:
+            source_path = os.path.abspath(__file__)
+        except NameError:
+            # 在 Dify 代码节点等无源文件的环境中只使用格式版本号
+            source_path = None
+        if source_path is not None:
+            source_dir = os.path.dirname(source_path)
+            for path in (source_path, *(os.path.join(source_dir, name) for name in _PIPELINE_MODULES)):
+                try:
+                    with open(path, "rb") as f:
+                        content = f.read()
+                except OSError:
+                    continue
+                h.update(os.path.basename(path).encode("utf-8"))
+                h.update(hashlib.sha1(content).digest())
+        _code_version_cache = h.hexdigest()
+    return _code_version_cache
+
+def compute_pdf_cache_key(pdf_path: str, top_crop=0.08, bottom_crop=0.08, max_chapter_num=None,
+                          with_tables=False, use_outline=True, ocr_fallback=False) -> str:
+    """
+    计算解析缓存键：PDF 字节内容 + 提取参数 + 代码版本（OCR 回退时加上 tesseract 是否可用）的 sha256
+    """
+    h = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    params = {
+        "top_crop": top_crop,
+        "bottom_crop": bottom_crop,
+        "max_chapter_num": max_chapter_num,
+        "with_tables": with_tables,
+        "use_outline": use_outline,
+        "ocr_fallback": ocr_fallback,
+        "code_version": _code_version(),
+    }
+    if ocr_fallback:
+        # tesseract 不可用时需要 OCR 的页保留了文本层，这样的结果不能在装好 tesseract 之后继续命中
+        params["ocr_available"] = ocr_available()
+    h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+def _load_parse_cache(cache_dir: str, cache_key: str, name: str):
+    """读取缓存项，不存在或损坏时返回 None"""
+    path = os.path.join(cache_dir, cache_key, f"{name}.json")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 缓存文件读取失败，将重新解析: {path}, {e}")
+        return None
+
+def _save_parse_cache(cache_dir: str, cache_key: str, name: str, data) -> None:
+    """写入缓存项，先写临时文件再原子替换，避免并发运行读到半截文件"""
+    entry_dir = os.path.join(cache_dir, cache_key)
+    os.makedirs(entry_dir, exist_ok=True)
+    path = os.path.join(entry_dir, f"{name}.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def parse_pdf_to_chapter_tree(pdf_path: str, workers: int = 1, top_crop=0.08, bottom_crop=0.08,
+                              max_chapter_num=None, cache_dir=None, debug=False,
+                              use_outline=True, ocr_fallback=False, repair=False) -> Tuple[List[Dict], Dict[str, str]]:
+    """
+    从 PDF 中提取章节树和术语映射
+    :param pdf_path: PDF 文件路径
+    :return: (章节树, 术语映射)，其余参数见 parse_pdf_to_chapter_tree_and_tables
+    """
+    tree, term_map, _ = parse_pdf_to_chapter_tree_and_tables(
+        pdf_path, workers, top_crop, bottom_crop, max_chapter_num, cache_dir, with_tables=False, debug=debug,
+        use_outline=use_outline, ocr_fallback=ocr_fallback, repair=repair)
+    return tree, term_map
+
+def parse_pdf_to_chapter_tree_and_tables(pdf_path: str, workers: int = 1, top_crop=0.08, bottom_crop=0.08,
+                                         max_chapter_num=None, cache_dir=None,
+                                         with_tables=True, debug=False,
+                                         use_outline=True, ocr_fallback=False,
+                                         repair=False) -> Tuple[List[Dict], Dict[str, str], List[Dict]]:
+    """
+    从 PDF 中提取章节树、术语映射和表格（单次遍历页面）
+    :param pdf_path: PDF 文件路径
+    :param workers: 页面文本解析和分节处理的进程数
+    :param top_crop: 页眉裁剪比例
+    :param bottom_crop: 页脚裁剪比例
+    :param max_chapter_num: 章节编号上限，None 表示按语言自动选择（中文50，英文1000）
+    :param cache_dir: 解析缓存目录，None 表示不使用缓存
+    :param with_tables: 是否同时提取表格，并把表格区域从正文行中剔除
+    :param debug: 是否写出 extracted_full_text.txt 调试文件
+    :param use_outline: PDF 带书签目录时按书签确定章节边界，书签不完整的分节回退启发式识别
+    :param ocr_fallback: 逐页判断文本层是否可用（为空、只有水印或乱码），不可用的页改用 OCR；
+                         OCR 结果缓存在 cache_dir/ocr 下
+    :param repair: 解析前抽查文件，结构损坏或无法解码的字符过多时先用 pikepdf 修复；
+                   修复结果按源文件哈希缓存在 cache_dir/repair 下（未指定 cache_dir 时在系统临时目录）
+    :return: (章节树, 术语映射, 表格列表)；跨页表格已拼接，每张表带 pages、line 和所属章节 chapter_id / chapter_path
+    """
+    if repair:
+        # 修复依赖 pikepdf，只在需要时导入
+        from file_repair import ensure_repaired
+        pdf_path = ensure_repaired(pdf_path, os.path.join(cache_dir, "repair") if cache_dir else None)
+
+    cache_key = None
+    cleaned_lines = None
+    tables = []
+    page_starts = []
+    outline_entries = []
+    if cache_dir:
+        cache_key = compute_pdf_cache_key(pdf_path, top_crop, bottom_crop, max_chapter_num, with_tables, use_outline,
+                                          ocr_fallback)
+        cached_tree = _load_parse_cache(cache_dir, cache_key, "tree")
+        if cached_tree is not None:
+            print(f"♻️ 命中解析缓存: {cache_key[:12]}")
+            return cached_tree["tree"], cached_tree["term_map"], cached_tree.get("tables", [])
+        cached_lines = _load_parse_cache(cache_dir, cache_key, "lines")
+        if cached_lines is not None:
+            cleaned_lines = cached_lines["lines"]
+            tables = cached_lines.get("tables", [])
+            page_starts = cached_lines.get("page_starts", [])
+            outline_entries = cached_lines.get("outline", [])
+
+    if cleaned_lines is None:
+        ocr_cache_dir = os.path.join(cache_dir, "ocr") if cache_dir and ocr_fallback else None
+        cleaned_lines, tables = extract_text_and_tables(pdf_path, top_crop, bottom_crop, workers, with_tables, debug,
+                                                        page_starts_out=page_starts, ocr_fallback=ocr_fallback,
+                                                        ocr_cache_dir=ocr_cache_dir)
+        if use_outline:
+            outline_entries = read_pdf_outline(pdf_path)
+        if cache_key:
+            _save_parse_cache(cache_dir, cache_key, "lines", {"lines": cleaned_lines, "tables": tables,
+                                                              "page_starts": page_starts, "outline": outline_entries})
+
+    # 🆕 检测文档语言
+    text_profile = profile_document_text(cleaned_lines)
+    language = text_profile.language
+    if max_chapter_num is None:
+        max_chapter_num = 50 if language == 'zh' else 1000
+    print(f"检测到文档语言: {'中文' if language == 'zh' else '英文'} (中文字符占比 {text_profile.cjk_ratio:.1%}), "
+          f"max_chapter_num={max_chapter_num}")
+
+    # 每行只做一次章节模式匹配，两轮提取和段落合并都复用这份结果
+    line_matches = [match_chapter_line(line) for line in cleaned_lines]
+
+    # 🆕 第一轮：粗略提取所有可能的章节，用于分析数字分布
+    # 第一轮使用宽松的数字范围进行粗提取；数字分布分析只看章节编号，因此只记录行区间，不做段落合并
+    preliminary_chapters = segment_chapters(cleaned_lines, line_matches, max_chapter_num=1000,
+                                            number_analysis=None, materialize=False)
+
+    # 🆕 分析章节数字分布
+    number_analysis = analyze_chapter_number_distribution(preliminary_chapters)
+    print(f"数字分布分析: {number_analysis}")
+
+    tree = None
+    if outline_entries:
+        # 书签目录驱动：跳过第二轮提取和最长章节链
+        outline_result = build_sections_tree_from_outline(cleaned_lines, line_matches, outline_entries, page_starts,
+                                                          max_chapter_num, number_analysis, language, workers)
+        if outline_result is not None:
+            tree = outline_result
+
+    if tree is None:
+        # 🆕 第二轮：使用分析结果重新精确提取章节
+        chapters = segment_chapters(cleaned_lines, line_matches, max_chapter_num=max_chapter_num,
+                                    number_analysis=number_analysis)
+        tree = build_sections_tree(chapters, language, workers)
+
+    # 术语从章节树中提取
     term_map = {}
 
-    for chap in chapters:
-        title = chap.get("chapter_title", "")
+    for chap in (node for file_sec in tree for sec in file_sec["sections"]
+                 for root in sec["chapters"] for node in root.iter_subtree()):
+        title = chap.chapter_title
         if "术语" in title:
             # 提取术语
-            terms = extract_terms_with_abbr_from_terms_section(chap["chapter_title"])
+            terms = extract_terms_with_abbr_from_terms_section(chap.chapter_title)
             term_map.update(terms)
-            for child in chap.get("children", []):
-                terms = extract_terms_with_abbr_from_terms_section(child["chapter_title"])
+            for child in chap.children:
+                terms = extract_terms_with_abbr_from_terms_section(child.chapter_title)
                 term_map.update(terms)
         elif "缩略" in title:
             # 提取缩略语
-            abbr_terms = extract_abbr_terms_from_symbols_section(chap["chapter_title"] + chap["raw_text"])
+            abbr_terms = extract_abbr_terms_from_symbols_section(chap.chapter_title + chap.raw_text)
             term_map.update(abbr_terms)
-            for child in chap.get("children", []):
-                abbr_terms = extract_abbr_terms_from_symbols_section(child["chapter_title"] + child["raw_text"])
+            for child in chap.children:
+                abbr_terms = extract_abbr_terms_from_symbols_section(child.chapter_title + child.raw_text)
                 term_map.update(abbr_terms)
 
-    return tree, term_map
+    # 术语命中标注：所有术语写法编译成一个自动机，每个章节只扫描一遍
+    term_index = TermIndex.from_term_map(term_map)
+    if len(term_index):
+        annotated = term_index.annotate(chap for file_sec in tree for sec in file_sec["sections"]
+                                        for chap in sec["chapters"])
+        print(f"🏷️ 术语索引: {len(term_index)} 个写法，{annotated} 个章节有术语命中")
+
+    # 跨页表格拼接，并按表格所在行号关联到章节
+    # 关联到章节的表格表头写入该章节的 table_headers
+    if tables:
+        heading_lines = locate_heading_lines(tree, line_matches)
+        linked = []
+        for table, node in link_tables_to_chapters(stitch_tables(tables), heading_lines):
+            linked.append(table)
+            if node is not None:
+                _add_table_headers(node, table)
+        tables = linked
+
+    # 章节节点转换为现有 JSON 结构，full_path 在这里自顶向下生成
+    tree = document_tree_to_dicts(tree)
+
+    if cache_key:
+        _save_parse_cache(cache_dir, cache_key, "tree", {"tree": tree, "term_map": term_map, "tables": tables})
+
+    return tree, term_map, tables
 
 import re
 from collections import defaultdict
 from typing import List, Dict
 import pdfplumber
 
-def _build_page_lines_from_words(page, y_tol=3):
+class PageWords(NamedTuple):
     """
-    用 page.extract_words() 构建行：按 top 分桶（y_tol 容差），每行按 x0 排序并合并文本，
-    返回列表：{'text', 'y', 'x0', 'x1'}
+    一页的 words 索引：page.extract_words() 每页只调用一次，按 (top, x0) 排序，
+    tops 与 words 一一对应，垂直带查询用二分定位
     """
-    words = page.extract_words()  # 返回每个 word 带 x0,x1,top,bottom,text
-    if not words:
-        return []
+    words: List[Dict]
+    tops: List[float]
 
-    # 按 top, x0 排序
-    words = sorted(words, key=lambda w: (w['top'], w['x0']))
+    def band(self, top_min: float, top_max: float) -> List[Dict]:
+        """top 落在 [top_min, top_max] 内的 words，保持 (top, x0) 顺序"""
+        return self.words[bisect_left(self.tops, top_min):bisect_right(self.tops, top_max)]
 
+def index_page_words(page) -> PageWords:
+    words = sorted(page.extract_words(), key=lambda w: (w['top'], w['x0']))  # 每个 word 带 x0,x1,top,bottom,text
+    return PageWords(words, [float(w['top']) for w in words])
+
+def _merge_words_into_lines(words: List[Dict], y_tol) -> List[Dict]:
+    """
+    已按 (top, x0) 排序的 words 按 top 分桶（y_tol 容差）合并成行，
+    返回列表：{'text', 'y', 'x0', 'x1'}
+    """
     lines = []
     cur = None
     for w in words:
@@ -1438,12 +2471,8 @@ def _build_page_lines_from_words(page, y_tol=3):
             continue
 
         if abs(top - cur['y']) <= y_tol:
-            # 同一行，按 x 顺序连接（extract_words 已按 x 排序，但仍做保险）
-            if x0 < cur['x1'] + 1:
-                # 重叠或紧邻，直接用空格隔开（避免把词粘在一起）
-                cur['text'] = cur['text'] + ' ' + text
-            else:
-                cur['text'] = cur['text'] + ' ' + text
+            # 同一行，按 x 顺序用空格连接（避免把词粘在一起）
+            cur['text'] = cur['text'] + ' ' + text
             cur['x1'] = max(cur['x1'], x1)
             cur['x0'] = min(cur['x0'], x0)
             # keep y as average to be robust
@@ -1455,26 +2484,33 @@ def _build_page_lines_from_words(page, y_tol=3):
         lines.append(cur)
     return lines
 
-def _find_table_title_near_bbox(page, table_bbox, max_above=60, y_tol=4):
+def _build_page_lines_from_words(page, y_tol=3, page_words: Optional[PageWords] = None):
+    """
+    用 page.extract_words() 构建行：按 top 分桶（y_tol 容差），每行按 x0 排序并合并文本，
+    返回列表：{'text', 'y', 'x0', 'x1'}
+    :param page_words: 同一页已建好的 words 索引，不提供时在这里提取
+    """
+    if page_words is None:
+        page_words = index_page_words(page)
+    return _merge_words_into_lines(page_words.words, y_tol)
+
+def _find_table_title_near_bbox(page, table_bbox, max_above=60, y_tol=4, page_words: Optional[PageWords] = None):
     """
     在表格上方 max_above pt 的范围内找可能的标题：
-    - 先从 page.extract_words() 中筛选出该垂直带内并且与表格水平有重叠的 words
+    - 从 words 索引中二分取出该垂直带内的 words，再筛选与表格水平有重叠的
     - 按 top/x0 分组成行并拼接，返回拼完的字符串（可能包含编号）
+    :param page_words: 同一页已建好的 words 索引，不提供时在这里提取
     """
     table_top = float(table_bbox[1])
     table_x0, table_x1 = float(table_bbox[0]), float(table_bbox[2])
-    words = page.extract_words()
-    if not words:
-        return None
+    if page_words is None:
+        page_words = index_page_words(page)
 
     # 筛选：垂直在 (table_top - max_above, table_top + 10) 范围内，
     # 同时水平上至少与表格左右扩展 50pt 有重叠（防止完全靠左的标题被忽略）
     relevant = []
     margin_x = 60
-    for w in words:
-        w_top = float(w['top'])
-        if not (table_top - max_above <= w_top <= table_top + 10):
-            continue
+    for w in page_words.band(table_top - max_above, table_top + 10):
         w_x0 = float(w['x0']); w_x1 = float(w['x1'])
         # 与表格水平投影有重叠 或 在表格左侧接近位置
         if (w_x1 >= table_x0 - margin_x and w_x0 <= table_x1 + margin_x) or w_x0 < table_x0:
@@ -1483,25 +2519,8 @@ def _find_table_title_near_bbox(page, table_bbox, max_above=60, y_tol=4):
     if not relevant:
         return None
 
-    # 将这些 words 按 top/x0 排序，分行并合并
-    relevant = sorted(relevant, key=lambda w: (w['top'], w['x0']))
-    lines = []
-    cur = None
-    for w in relevant:
-        top = w['top']; x0 = float(w['x0']); x1 = float(w['x1']); txt = w['text']
-        if cur is None:
-            cur = {'text': txt, 'y': top, 'x0': x0, 'x1': x1}
-        else:
-            if abs(top - cur['y']) <= y_tol:
-                cur['text'] = cur['text'] + ' ' + txt
-                cur['x1'] = max(cur['x1'], x1)
-                cur['x0'] = min(cur['x0'], x0)
-                cur['y'] = (cur['y'] + top) / 2.0
-            else:
-                lines.append(cur)
-                cur = {'text': txt, 'y': top, 'x0': x0, 'x1': x1}
-    if cur:
-        lines.append(cur)
+    # 带内 words 已按 top/x0 排序，直接分行并合并
+    lines = _merge_words_into_lines(relevant, y_tol)
 
     # 现在把这些行拼成最终标题：按 y 从上到下、按 x0 从左到右连接
     # 但优先选择包含 "表" 的行或以 "表" 开头的行及其相邻行
@@ -1531,79 +2550,114 @@ def _find_table_title_near_bbox(page, table_bbox, max_above=60, y_tol=4):
         cand = re.sub(r'\s*([，,：:；;])\s*', r'\1 ', cand)
     return cand
 
-def extract_tables_from_pdf(pdf_path: str) -> List[Dict]:
+def _extract_pdfplumber_page_tables(page, page_num: int) -> List[Dict]:
     """
-    改进版：从PDF中提取所有表格及其标识，尽量恢复 '表F.1' 这类编号
-    返回格式: [{"table_id": "表X.x 标题", "table_content": 二维数组}, ...]
+    用 pdfplumber 提取一页的表格，尽量恢复 '表F.1' 这类编号，找不到时用 "表-页N-表M" 兜底
     """
-    all_tables = []
+    page_tables = []
+    # 提取并排序表格
+    tables = page.find_tables()
+    if not tables:
+        return page_tables
+    tables = sorted(tables, key=lambda t: t.bbox[1])
+
+    # 每页只提取一次 words，标题查找和页面行都从这份索引取
+    page_words = index_page_words(page)
+    page_lines = _build_page_lines_from_words(page, y_tol=3, page_words=page_words)
+
+    for table_idx, table in enumerate(tables):
+        # 过滤：只有 1 列的直接丢弃
+        table_data = table.extract()
+        if not table_data:
+            continue
+        sample_row = table_data[0]
+        if len(sample_row) <= 1:
+            continue
 
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_num, page in enumerate(pdf.pages):
-            # 使用 extract_words 构建页面行（也保留原始 words 用于更精细判断）
-            page_lines = _build_page_lines_from_words(page, y_tol=3)
+        cleaned_data = [
+            [cell.replace('\n', ' ').strip() if cell else "" for cell in row]
+            for row in table_data
+        ]
 
-            # 提取并排序表格
-            tables = page.find_tables()
-            if not tables:
-                continue
-            tables = sorted(tables, key=lambda t: t.bbox[1])
+        # 优先通过 page_lines 找标题
+        table_top = table.bbox[1]
+        best_line = None
+        min_gap = float('inf')
 
-            for table_idx, table in enumerate(tables):
-                # 过滤：只有 1 列的直接丢弃
-                table_data = table.extract()
-                if not table_data:
-                    continue
-                sample_row = table_data[0]
-                if len(sample_row) <= 1:
-                    continue
+        # 先尝试更稳健的方式：从 words 区域收集并拼接标题
+        cand = _find_table_title_near_bbox(page, table.bbox, max_above=60, y_tol=4, page_words=page_words)
+        if cand:
+            best_line = cand
+        else:
+            # 退回到原先逻辑：在 page_lines 中找包含 "表" 的行（距离最近的）
+            for item in page_lines:
+                if ("表" in item['text'] or 'Table' in item['text']) and 0 < (table_top - item['y']) < 60:
+                    gap = table_top - item['y']
+                    if gap < min_gap:
+                        min_gap = gap
+                        best_line = item['text']
+
+        # 兜底：如果还是没有编号，检查表格第一行的单元格里是否有“表X”样式
+        if best_line is None:
+            first_row = cleaned_data[0]
+            # 把第一行所有单元格拼起来查找“表”关键词
+            joined_first = " ".join(first_row).strip()
+            if re.search(r'表\s*[A-Z0-9]\.?\d*', joined_first) or joined_first.startswith('表'):
+                best_line = joined_first
+
+        # 如果找到了标题则新增，否则用兜底 id
+        if best_line:
+            # 进一步做小清洗：将 "表  F.1" 等中间多余空格去掉（保留表字和编号）
+            best_line = re.sub(r'表\s+([A-Za-z0-9])', r'表\1', best_line)
+            page_tables.append({
+                "table_id": best_line,
+                "table_content": cleaned_data
+            })
+        else:
+            table_id = f"表-页{page_num + 1}-表{table_idx + 1}"
+            page_tables.append({
+                "table_id": table_id,
+                "table_content": cleaned_data
+            })
 
-                cleaned_data = [
-                    [cell.replace('\n', ' ').strip() if cell else "" for cell in row]
-                    for row in table_data
-                ]
+    return page_tables
 
-                # 优先通过 page_lines 找标题
-                table_top = table.bbox[1]
-                best_line = None
-                min_gap = float('inf')
+def _extract_tables_from_pages_worker(task: Tuple[str, List[int]]) -> List[Dict]:
+    """
+    进程池工作函数：每个进程独立打开文档，按顺序提取给定页的表格
+    """
+    pdf_path, page_numbers = task
+    page_tables = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_num in page_numbers:
+            page_tables.extend(_extract_pdfplumber_page_tables(pdf.pages[page_num], page_num))
+    return page_tables
 
-                # 先尝试更稳健的方式：从 words 区域收集并拼接标题
-                cand = _find_table_title_near_bbox(page, table.bbox, max_above=60, y_tol=4)
-                if cand:
-                    best_line = cand
-                else:
-                    # 退回到原先逻辑：在 page_lines 中找包含 "表" 的行（距离最近的）
-                    for item in page_lines:
-                        if ("表" in item['text'] or 'Table' in item['text']) and 0 < (table_top - item['y']) < 60:
-                            gap = table_top - item['y']
-                            if gap < min_gap:
-                                min_gap = gap
-                                best_line = item['text']
-
-                # 兜底：如果还是没有编号，检查表格第一行的单元格里是否有“表X”样式
-                if best_line is None:
-                    first_row = cleaned_data[0]
-                    # 把第一行所有单元格拼起来查找“表”关键词
-                    joined_first = " ".join(first_row).strip()
-                    if re.search(r'表\s*[A-Z0-9]\.?\d*', joined_first) or joined_first.startswith('表'):
-                        best_line = joined_first
-
-                # 如果找到了标题则新增，否则用兜底 id
-                if best_line:
-                    # 进一步做小清洗：将 "表  F.1" 等中间多余空格去掉（保留表字和编号）
-                    best_line = re.sub(r'表\s+([A-Za-z0-9])', r'表\1', best_line)
-                    all_tables.append({
-                        "table_id": best_line,
-                        "table_content": cleaned_data
-                    })
-                else:
-                    table_id = f"表-页{page_num + 1}-表{table_idx + 1}"
-                    all_tables.append({
-                        "table_id": table_id,
-                        "table_content": cleaned_data
-                    })
+def extract_tables_from_pdf(pdf_path: str, workers: int = 1) -> List[Dict]:
+    """
+    改进版：从PDF中提取所有表格及其标识，尽量恢复 '表F.1' 这类编号
+    先用 fitz 的矢量图形预筛，没有框线的页面不做 find_tables
+    :param workers: 表格提取的进程数，workers > 1 时按页区间分发到进程池，结果仍按页顺序返回
+    返回格式: [{"table_id": "表X.x 标题", "table_content": 二维数组}, ...]
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        candidate_pages = [page.number for page in doc if page_has_ruling_lines(page)]
+    finally:
+        doc.close()
+
+    if workers is None or workers <= 1 or len(candidate_pages) < 2:
+        return _extract_tables_from_pages_worker((pdf_path, candidate_pages))
 
+    from concurrent.futures import ProcessPoolExecutor
+
+    tasks = [(pdf_path, candidate_pages[start:end])
+             for start, end in _split_page_ranges(len(candidate_pages), workers)]
+    all_tables = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        # executor.map 保证结果顺序与任务顺序一致
+        for page_tables in executor.map(_extract_tables_from_pages_worker, tasks):
+            all_tables.extend(page_tables)
     return all_tables
 
 
@@ -1639,9 +2693,27 @@ def main():
 
 
     parser.add_argument("--output", help="输出 JSON 文件路径", default="output.json")
+    parser.add_argument("--workers", type=int, default=1, help="页面文本解析和分节处理的进程数（1 为单进程）")
+    parser.add_argument("--cache_dir", default=None, help="解析缓存目录，不指定则不使用缓存")
+    parser.add_argument("--with_tables", action="store_true", help="同一次页面扫描中提取表格，并从正文中剔除表格区域；表格写入 <output>.tables.jsonl")
+    parser.add_argument("--debug", action="store_true", help="写出 extracted_full_text.txt 等调试文件")
+    parser.add_argument("--no_outline", action="store_true", help="忽略 PDF 书签目录，始终使用启发式章节识别")
+    parser.add_argument("--ocr", action="store_true",
+                        help="文本层为空、只有水印或乱码的页改用 OCR（需要 tesseract），其余页仍读取文本层；扫描件直接得到章节树")
+    parser.add_argument("--repair", action="store_true", help="解析前抽查 PDF，需要时自动修复（结果按文件哈希缓存）")
+    parser.add_argument("--rule_stats", action="store_true",
+                        help="输出章节过滤规则的命中次数和耗时（进程池中的分节不计入，统计时建议 --workers 1）")
     args = parser.parse_args()
 
-    chapter_tree, term_map = parse_pdf_to_chapter_tree(args.pdf_path)
+    if args.rule_stats:
+        set_rule_timing(True)
+
+    chapter_tree, term_map, tables = parse_pdf_to_chapter_tree_and_tables(
+        args.pdf_path, workers=args.workers, cache_dir=args.cache_dir, with_tables=args.with_tables,
+        debug=args.debug, use_outline=not args.no_outline, ocr_fallback=args.ocr, repair=args.repair)
+
+    if args.rule_stats:
+        dump_rule_stats()
 
     # # 提取表格
     # tables = extract_tables_from_pdf(args.pdf_path)
@@ -1653,6 +2725,11 @@ def main():
     # }
 
     output_data = chapter_tree
+    if args.with_tables:
+        # 表格写入 JSONL 存储（每张表一行 + 偏移索引），不再与章节树放进同一个 JSON
+        table_store = TableStore(os.path.splitext(args.output)[0] + ".tables")
+        table_count = table_store.write(tables)
+        print(f"📊 {table_count} 张表格已写入 {table_store.data_path}（索引 {table_store.index_path}）")
     # # output_data["terms"] = term_map
     # output_data["tables"] = tables
 
@@ -1677,7 +2754,8 @@ def main():
     
     print(f"✅ 提取完成，章节和表格已保存至 {args.output}")
     print(f"   - 共提取 {len(chapter_tree)} 个章节")
-    # print(f"   - 共提取 {len(tables)} 个表格")
+    if args.with_tables:
+        print(f"   - 共提取 {len(tables)} 个表格")
 
 if __name__ == "__main__":
     main()
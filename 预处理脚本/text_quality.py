@@ -0,0 +1,28 @@
+"""
+文本层质量判定：统计乱码字符占比，test_en.py 的 OCR 回退和 file_repair.py 的抽查共用同一判定
+"""
+import re
+
+# 文本层乱码字符：
+# - 私用区
+# - "犌犅"一类错位字形：字体把 A-Z 映射到 犃…犣，a-z 映射到其后跳过常用字（犬、犯、状、狂等）的生僻字
+# - Latin-1 补充区的控制符和字母，不含正文常见的 ° ± × ÷ · µ ² ³ ¹ ¼ ½ ¾ § © ® 和不换行空格
+# - ASCII 符号（. - / 在正文中常见，不计入）
+_GARBLED_CHAR_RE = re.compile(
+    r'[\ue000-\uf8ff\u7283-\u72a3犪犫犮犱犲犳犵犺犻犼犽犾犿狀狅狆狇狉狊狋狌狏狑狓狔'
+    r'\u0080-\u009f\u00a1-\u00a6\u00a8\u00aa-\u00ad\u00af\u00b4\u00b6\u00b8\u00ba\u00bb\u00bf-\u00d6\u00d8-\u00f6\u00f8-\u00ff'
+    r'!"#$%&\'()*+,:;<=>?@\[\\\]^_`{|}~]')
+# 目录引导点、分隔线等连续重复字符只计一次，避免正常页被误判
+_REPEATED_CHAR_RE = re.compile(r'(.)\1{2,}')
+_PAGE_SPACE_RE = re.compile(r'\s+')
+
+# 乱码字符占比达到该值时认为文本层不可用（正常页不超过 0.1，乱码页通常在 0.25 以上）
+GARBLED_RATIO = 0.2
+
+
+def garbled_ratio(text: str) -> float:
+    """文本中乱码字符占非空白字符的比例"""
+    text = _PAGE_SPACE_RE.sub('', _REPEATED_CHAR_RE.sub(r'\1', text))
+    if not text:
+        return 0.0
+    return len(_GARBLED_CHAR_RE.findall(text)) / len(text)